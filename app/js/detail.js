@@ -205,30 +205,37 @@ rgApp.controller('DetailController', function DetailController(
         $scope.chart.update();
     }
 
-    function bestRanking(rankings, rankingType) {
-        rankingType = rankingType || 'bgg';
-        return _(rankings)
-            .filter({'ranking_type': rankingType})
-            .orderBy(['rank', 'date'], ['asc', 'desc'])
-            .head();
+    function bestRanking(summaries, rankingType) {
+        var summary = summaries[rankingType || 'bgg'];
+        return _.isEmpty(summary) ? null : {
+            'rank': summary.best_rank,
+            'date': summary.best_date
+        };
     }
 
+    rankingsService.getSummaries($routeParams.id, true)
+        .then(function (summaries) {
+            $scope.bestRankingBGG = bestRanking(summaries, 'bgg');
+            $scope.bestRankingRG = bestRanking(summaries, 'fac');
+        })
+        .catch(function (reason) {
+            $log.error(reason);
+            $scope.bestRankingBGG = null;
+            $scope.bestRankingRG = null;
+        });
+
     rankingsService.getRankings($routeParams.id, true)
         .then(function (rankings) {
             if (_.isEmpty(rankings)) {
                 $scope.chart = null;
                 $scope.chartVisible = false;
                 $scope.rankings = null;
-                $scope.bestRankingBGG = null;
-                $scope.bestRankingRG = null;
 
                 return $q.reject('unable to load rankings');
             }
 
             $scope.chartVisible = true;
             $scope.rankings = rankings;
-            $scope.bestRankingBGG = bestRanking(rankings, 'bgg');
-            $scope.bestRankingRG = bestRanking(rankings, 'fac');
 
             return findElement('#ranking-history-container');
         })
@@ -28,7 +28,8 @@ rgApp.controller('HistoryController', function HistoryController(
             'ranking_type': rankingType,
             'date__gte': startDate.format('YYYY-MM-DD'),
             'date__lte': endDate.format('YYYY-MM-DD'),
-            'top': top
+            'top': top,
+            'compact': true
         },
         options = {
             responsive: false,
@@ -129,10 +130,31 @@ rgApp.controller('HistoryController', function HistoryController(
         });
     }
 
+    function expandHistory(history) {
+        var dates = _.get(history, 'dates'),
+            ranks = _.get(history, 'ranks');
+        return _.map(_.get(history, 'games'), function (game, index) {
+            var rankings = _(dates)
+                .map(function (date, pos) {
+                    return {
+                        'ranking_type': history.ranking_type,
+                        'rank': _.get(ranks, [index, pos]),
+                        'date': date
+                    };
+                })
+                .reject(function (ranking) {
+                    return _.isNil(ranking.rank);
+                })
+                .value();
+            return {'game': game, 'rankings': rankings};
+        });
+    }
+
     $http.get(API_URL + 'games/history/', {'params': params})
         .then(function (response) {
-            $scope.data = response.data;
-            $scope.datasets = makeDataSets(response.data, rankingType, startDate, endDate);
+            var data = expandHistory(response.data);
+            $scope.data = data;
+            $scope.datasets = makeDataSets(data, rankingType, startDate, endDate);
             return findElement('#rg-history');
         })
         .then(function (container) {
@@ -1252,7 +1252,8 @@ rgApp.factory('rankingsService', function rankingsService(
     API_URL
 ) {
     var service = {},
-        cache = {};
+        cache = {},
+        summaries = {};
 
     service.getRankings = function getRankings(id, noblock) {
         id = _.parseInt(id);
@@ -1262,7 +1263,10 @@ rgApp.factory('rankingsService', function rankingsService(
             return $q.resolve(cached);
         }
 
-        return $http.get(API_URL + 'games/' + id + '/rankings/', {'noblock': !!noblock})
+        return $http.get(API_URL + 'games/' + id + '/rankings/', {
+            'params': {'ranking_type': 'bgg,fac', 'resolution': 'week'},
+            'noblock': !!noblock
+        })
             .then(function (response) {
                 var rankings = response.data;
 
@@ -1286,6 +1290,37 @@ rgApp.factory('rankingsService', function rankingsService(
             });
     };
 
+    service.getSummaries = function getSummaries(id, noblock) {
+        id = _.parseInt(id);
+        var cached = summaries[id];
+
+        if (!_.isEmpty(cached)) {
+            return $q.resolve(cached);
+        }
+
+        return $http.get(API_URL + 'games/' + id + '/ranking_summary/', {'noblock': !!noblock})
+            .then(function (response) {
+                var result = _(response.data)
+                    .map(function (item) {
+                        item.best_date = moment(item.best_date);
+                        item.first_date = moment(item.first_date);
+                        item.last_date = moment(item.last_date);
+                        return item;
+                    })
+                    .keyBy('ranking_type')
+                    .value();
+
+                summaries[id] = result;
+                return result;
+            })
+            .catch(function (reason) {
+                $log.error('There has been an error', reason);
+                var response = _.get(reason, 'data.detail') || reason;
+                response = _.isString(response) ? response : 'Unable to load ranking summaries.';
+                return $q.reject(response);
+            });
+    };
+
     return service;
 });
 
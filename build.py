@@ -19,13 +19,16 @@ Non-Python dependencies:
 * `npm install --global htmlhint jslint jshint csslint`
 """
 
+import inspect
+import json
 import logging
 import os
 import shutil
 import sys
+import threading
 
 from datetime import timedelta, timezone
-from functools import lru_cache
+from functools import lru_cache, wraps
 from pathlib import Path
 
 import django
@@ -64,6 +67,30 @@ URL_LIVE = "https://recommend.games/"
 GC_PROJECT = os.getenv("GC_PROJECT") or "recommend-games"
 GC_DATA_BUCKET = os.getenv("GC_DATA_BUCKET") or f"{GC_PROJECT}-data"
 
+# completion markers of the build stages; resume an interrupted build with
+# BUILD_RESUME=1 pynt builddb
+CHECKPOINT_DIR = os.getenv("BUILD_CHECKPOINT_DIR") or os.path.join(
+    BASE_DIR, ".cache", "build"
+)
+
+
+class _BuildState(threading.local):
+    """Resume state of the build, per thread so parallel tasks track their own."""
+
+    def __init__(self):
+        super().__init__()
+        self.resume = parse_bool(os.getenv("BUILD_RESUME"))
+        self.resume_from = None
+        self.ran = False
+
+
+BUILD_STATE = _BuildState()
+
+# content addressed results of build tasks, see games.buildcache
+BUILD_CACHE_DIR = os.getenv("BUILD_CACHE_DIR") or os.path.join(
+    BASE_DIR, ".cache", "tasks"
+)
+
 GAMES_CSV_COLUMNS = (
     "bgg_id",
     "name",
@@ -129,6 +156,120 @@ def _remove(path):
         shutil.rmtree(path, ignore_errors=True)
 
 
+def _checkpoint(inputs=None, start=False):
+    """Record a completion marker for a build stage, keyed by a fingerprint of
+    its arguments and input paths (inputs is called with the arguments). When
+    resuming, stages with a matching marker are skipped until the first one
+    that needs to run again; every stage after that (or in a task graph:
+    depending on it) runs as well. A start stage begins a new build and
+    discards all markers."""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            from games.utils import fingerprint
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            paths = inputs(**bound.arguments) if inputs else ()
+            key = fingerprint(*arg_to_iter(paths), **bound.arguments)
+            marker = Path(CHECKPOINT_DIR) / f"{func.__name__}-{key[:16]}.json"
+
+            if BUILD_STATE.resume:
+                if marker.exists():
+                    LOGGER.info("Stage <%s> is complete, skipping...", func.__name__)
+                    return None
+                LOGGER.info("Resuming the build at stage <%s>...", func.__name__)
+                BUILD_STATE.resume = False
+                BUILD_STATE.resume_from = func.__name__
+
+            BUILD_STATE.ran = True
+
+            if start:
+                LOGGER.info("Starting a new build, removing old checkpoints...")
+                shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+
+            result = func(*args, **kwargs)
+
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            with marker.open("w") as file:
+                json.dump(
+                    {
+                        "stage": func.__name__,
+                        "key": key,
+                        "completed_at": django.utils.timezone.now().isoformat(),
+                    },
+                    file,
+                    indent=4,
+                )
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _resuming(stage):
+    """Whether a resumed build restarted at the given stage, so it should pick
+    up where it left off itself."""
+    return BUILD_STATE.resume_from == stage
+
+
+def _defaults(task):
+    """Default arguments of a task."""
+    return {
+        name: param.default
+        for name, param in inspect.signature(task.func).parameters.items()
+        if param.default is not param.empty
+    }
+
+
+def _add(graph, task, inputs=None, outputs=None, cache=False, params=None, **kwargs):
+    """Add a task to the graph. When resuming, its stages are only skipped if
+    no task it depends on ran again; the result tells whether it did. With
+    cache, the task is skipped if its inputs, default arguments, and params
+    did not change and its outputs are still as it left them."""
+
+    resume = BUILD_STATE.resume
+
+    def run():
+        upstream = any(graph.results.get(dep) for dep in graph.ancestors(task.name))
+        BUILD_STATE.resume = resume and not upstream
+        BUILD_STATE.resume_from = None
+        BUILD_STATE.ran = False
+        try:
+            task()
+        finally:
+            django.db.connections.close_all()
+        return BUILD_STATE.ran
+
+    graph.add(
+        task.name,
+        run,
+        inputs=inputs,
+        outputs=outputs,
+        cache=cache,
+        params={**_defaults(task), **(params or {})} if cache else None,
+        code=task.func,
+        **kwargs,
+    )
+
+
+def _run_graph(graph, jobs=0, dry_run=False, force=False):
+    from games.buildcache import BuildCache
+
+    if parse_bool(dry_run):
+        graph.plan()
+        return
+    cache = BuildCache(BUILD_CACHE_DIR, force=parse_bool(force))
+    results = graph.run(jobs=parse_int(jobs) or 0, cache=cache)
+    if any(results.values()):
+        BUILD_STATE.resume = False
+
+
 @task()
 def gitprepare(repo=SCRAPED_DATA_DIR):
     """ check Git repo is clean and up-to-date """
@@ -748,30 +889,44 @@ def mergenews(
     )
 
 
-@task(
-    mergebga,
-    mergebgg,
-    mergedbpedia,
-    mergeluding,
-    mergespielen,
-    mergewikidata,
-    mergenews,
-    mergebgaratings,
-    mergebggusers,
-    mergebggratings,
-    mergebggrankings,
-    mergebgghotness,
-    mergebggabstract,
-    mergebggchildren,
-    mergebggcustomizable,
-    mergebggfamily,
-    mergebggparty,
-    mergebggstrategy,
-    mergebggthematic,
-    mergebggwar,
-)
-def mergeall():
+def _merge_graph(graph):
+    for task, site, item in (
+        (mergebga, "bga", "GameItem"),
+        (mergebgg, "bgg", "GameItem"),
+        (mergedbpedia, "dbpedia", "GameItem"),
+        (mergeluding, "luding", "GameItem"),
+        (mergespielen, "spielen", "GameItem"),
+        (mergewikidata, "wikidata", "GameItem"),
+        (mergenews, "news", "ArticleItem"),
+        (mergebgaratings, "bga", "RatingItem"),
+        (mergebggusers, "bgg", "UserItem"),
+        (mergebggratings, "bgg", "RatingItem"),
+        (mergebggrankings, "bgg_rankings", "GameItem"),
+        (mergebgghotness, "bgg_hotness", "GameItem"),
+        (mergebggabstract, "bgg_rankings_abstract", "GameItem"),
+        (mergebggchildren, "bgg_rankings_children", "GameItem"),
+        (mergebggcustomizable, "bgg_rankings_customizable", "GameItem"),
+        (mergebggfamily, "bgg_rankings_family", "GameItem"),
+        (mergebggparty, "bgg_rankings_party", "GameItem"),
+        (mergebggstrategy, "bgg_rankings_strategy", "GameItem"),
+        (mergebggthematic, "bgg_rankings_thematic", "GameItem"),
+        (mergebggwar, "bgg_rankings_war", "GameItem"),
+    ):
+        _add(
+            graph,
+            task,
+            inputs=os.path.join(SCRAPER_DIR, "feeds", site),
+            outputs=os.path.join(SCRAPED_DATA_DIR, "scraped", f"{site}_{item}.jl"),
+        )
+    return graph
+
+
+@task()
+def mergeall(jobs=0, dry_run=False):
     """ merge all sites and items """
+    from games.taskgraph import TaskGraph
+
+    _run_graph(_merge_graph(TaskGraph("mergeall")), jobs=jobs, dry_run=dry_run)
 
 
 @task()
@@ -1060,6 +1215,7 @@ def saverankings():
 
 
 @task()
+@_checkpoint(inputs=lambda src_file, **_: src_file)
 def weeklycharts(
     src_file=Path(SCRAPED_DATA_DIR) / "scraped" / "bgg_RatingItem.jl",
     dst_dir=Path(SCRAPED_DATA_DIR) / "rankings" / "bgg" / "charts",
@@ -1092,6 +1248,7 @@ def weeklycharts(
 
 
 @task()
+@_checkpoint(start=True)
 def cleandata(src_dir=DATA_DIR, bk_dir=f"{DATA_DIR}.bk"):
     """ clean data file """
     LOGGER.info(
@@ -1114,8 +1271,36 @@ def migrate():
     django.core.management.call_command("migrate")
 
 
+@task()
+@_checkpoint(
+    inputs=lambda paths, src_dir, **_: paths
+    or os.path.join(src_dir, "scraped", "bgg_RatingItem.jl")
+)
+def cachejl(*paths, src_dir=SCRAPED_DATA_DIR, jobs=0):
+    """ build the columnar cache of the scraped ratings for the charts """
+    paths = paths or (os.path.join(src_dir, "scraped", "bgg_RatingItem.jl"),)
+    django.core.management.call_command("cachejl", *paths, jobs=parse_int(jobs))
+
+
+def _filldb_inputs(src_dir, rec_dir, **_):
+    srp_dir = os.path.join(src_dir, "scraped")
+    return (
+        os.path.join(srp_dir, "bgg_GameItem.jl"),
+        os.path.join(srp_dir, "bgg_RatingItem.jl"),
+        os.path.join(srp_dir, "bgg_UserItem.jl"),
+        os.path.join(src_dir, "links.json"),
+        rec_dir,
+    )
+
+
 @task(cleandata, migrate)
-def filldb(src_dir=SCRAPED_DATA_DIR, rec_dir=os.path.join(RECOMMENDER_DIR, ".bgg")):
+@_checkpoint(inputs=_filldb_inputs)
+def filldb(
+    src_dir=SCRAPED_DATA_DIR,
+    rec_dir=os.path.join(RECOMMENDER_DIR, ".bgg"),
+    bulk_load=True,
+    incremental=False,
+):
     """ fill database """
     LOGGER.info(
         "Uploading games and other data from <%s>, and recommendations from <%s> to database...",
@@ -1132,16 +1317,36 @@ def filldb(src_dir=SCRAPED_DATA_DIR, rec_dir=os.path.join(RECOMMENDER_DIR, ".bgg
         batch=100000,
         recommender=rec_dir,
         links=os.path.join(src_dir, "links.json"),
+        bulk_load=parse_bool(bulk_load),
+        incremental=parse_bool(incremental),
+        resume=_resuming("filldb"),
     )
 
 
 @task()
-def compressdb(db_file=os.path.join(DATA_DIR, "db.sqlite3")):
-    """ compress SQLite database file """
-    execute("sqlite3", db_file, "VACUUM;")
+def fillrecdb(rec_dir=os.path.join(RECOMMENDER_DIR, ".bgg")):
+    """ refresh only the recommender scores in the database """
+    LOGGER.info("Updating recommender scores from <%s> in database...", rec_dir)
+    django.core.management.call_command("filldb", recommender=rec_dir, rec_only=True)
+
+
+@task()
+def indexadvisor(*logs, dst=SETTINGS.INDEXES_FILE):
+    """ propose indexes for the game list query shapes, applied by compressdb """
+    django.core.management.call_command("indexadvisor", log=logs or None, output=dst)
+
+
+@task()
+@_checkpoint()
+def compressdb(page_size=None, report=None, indexes=SETTINGS.INDEXES_FILE):
+    """ finalize and compress SQLite database file """
+    django.core.management.call_command(
+        "finalizedb", page_size=parse_int(page_size), report=report, indexes=indexes
+    )
 
 
 @task()
+@_checkpoint(inputs=lambda src_dir, **_: src_dir)
 def cpdirs(
     src_dir=os.path.join(RECOMMENDER_DIR, ".bgg"),
     dst_dir=os.path.join(DATA_DIR, "recommender_bgg"),
@@ -1153,6 +1358,7 @@ def cpdirs(
         src_path = os.path.join(src_dir, sub_dir)
         dst_path = os.path.join(dst_dir, sub_dir)
         LOGGER.info("Copying <%s> to <%s>...", src_path, dst_path)
+        _remove(dst_path)
         shutil.copytree(src_path, dst_path)
 
 
@@ -1167,6 +1373,7 @@ def cpdirsbga(
 
 
 @task()
+@_checkpoint()
 def dateflag(dst=SETTINGS.MODEL_UPDATED_FILE, date=None):
     """ write date to file """
     from games.utils import serialize_date
@@ -1191,6 +1398,7 @@ def bggranking(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitrankings(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg"),
@@ -1208,6 +1416,7 @@ def splitrankings(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splithotness(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_hotness_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "hotness"),
@@ -1226,6 +1435,7 @@ def splithotness(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitabstract(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_abstract_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_abstract"),
@@ -1243,6 +1453,7 @@ def splitabstract(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitchildren(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_children_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_children"),
@@ -1260,6 +1471,7 @@ def splitchildren(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitcustomizable(
     src=os.path.join(
         SCRAPED_DATA_DIR, "scraped", "bgg_rankings_customizable_GameItem.jl"
@@ -1279,6 +1491,7 @@ def splitcustomizable(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitfamily(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_family_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_family"),
@@ -1296,6 +1509,7 @@ def splitfamily(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitparty(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_party_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_party"),
@@ -1313,6 +1527,7 @@ def splitparty(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitstrategy(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_strategy_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_strategy"),
@@ -1330,6 +1545,7 @@ def splitstrategy(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitthematic(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_thematic_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_thematic"),
@@ -1347,6 +1563,7 @@ def splitthematic(
 
 
 @task()
+@_checkpoint(inputs=lambda src, **_: src)
 def splitwar(
     src=os.path.join(SCRAPED_DATA_DIR, "scraped", "bgg_rankings_war_GameItem.jl"),
     dst_dir=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg_war"),
@@ -1363,23 +1580,43 @@ def splitwar(
     )
 
 
-@task(
-    splitrankings,
-    splithotness,
-    splitabstract,
-    splitchildren,
-    splitcustomizable,
-    splitfamily,
-    splitparty,
-    splitstrategy,
-    splitthematic,
-    splitwar,
-)
-def splitall():
+def _split_graph(graph, **kwargs):
+    for task in (
+        splitrankings,
+        splithotness,
+        splitabstract,
+        splitchildren,
+        splitcustomizable,
+        splitfamily,
+        splitparty,
+        splitstrategy,
+        splitthematic,
+        splitwar,
+    ):
+        args = _defaults(task)
+        _add(
+            graph,
+            task,
+            inputs=args["src"],
+            outputs=args["dst_dir"],
+            cache=True,
+            **kwargs,
+        )
+    return graph
+
+
+@task()
+def splitall(jobs=0, dry_run=False, force=False):
     """Split all rankings data."""
+    from games.taskgraph import TaskGraph
+
+    _run_graph(
+        _split_graph(TaskGraph("splitall")), jobs=jobs, dry_run=dry_run, force=force
+    )
 
 
 @task()
+@_checkpoint()
 def historicalbggrankings(
     repo=os.path.abspath(os.path.join(BASE_DIR, "..", "bgg-ranking-historicals")),
     dst=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg", "bgg", "%Y%m%d-%H%M%S.csv"),
@@ -1394,41 +1631,64 @@ def historicalbggrankings(
 
     overwrite = parse_bool(overwrite)
 
-    with safe_cd(repo):
-        execute("git", "checkout", "master")
-        execute("git", "pull", "--ff-only")
-
-        for root, _, files in os.walk("."):
-            for file in files:
-                if format_from_path(file) != "csv":
-                    continue
-
-                date_str, _ = os.path.splitext(file)
-                date = parse_date(date_str, tzinfo=timezone.utc)
-                if date is None:
-                    continue
-
-                in_path = os.path.abspath(os.path.join(root, file))
-                dst_path = date.strftime(dst)
-
-                if not overwrite and os.path.exists(dst_path):
-                    LOGGER.debug(
-                        "Output file <%s> already exists, skipping <%s>...",
-                        dst_path,
-                        in_path,
-                    )
-                    continue
-
-                LOGGER.info(
-                    "Reading from file <%s> and writing to <%s>...", in_path, dst_path
+    execute("git", "-C", repo, "checkout", "master")
+    execute("git", "-C", repo, "pull", "--ff-only")
+
+    for root, _, files in os.walk(repo):
+        for file in files:
+            if format_from_path(file) != "csv":
+                continue
+
+            date_str, _ = os.path.splitext(file)
+            date = parse_date(date_str, tzinfo=timezone.utc)
+            if date is None:
+                continue
+
+            in_path = os.path.abspath(os.path.join(root, file))
+            dst_path = date.strftime(dst)
+
+            if not overwrite and os.path.exists(dst_path):
+                LOGGER.debug(
+                    "Output file <%s> already exists, skipping <%s>...",
+                    dst_path,
+                    in_path,
                 )
-                execute("bash", script, in_path, dst_path)
+                continue
+
+            LOGGER.info(
+                "Reading from file <%s> and writing to <%s>...", in_path, dst_path
+            )
+            execute("bash", script, in_path, dst_path)
 
 
 @task()
-def fillrankingdb(path=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg")):
+@_checkpoint(inputs=lambda path, **_: path)
+def fillrankingdb(
+    path=os.path.join(SCRAPED_DATA_DIR, "rankings", "bgg"), bulk_load=True
+):
     """Parses the ranking CSVs and writes them to the database."""
-    django.core.management.call_command("fillrankingdb", path)
+    django.core.management.call_command(
+        "fillrankingdb",
+        path,
+        bulk_load=parse_bool(bulk_load),
+        resume=_resuming("fillrankingdb"),
+    )
+
+
+@task()
+@_checkpoint()
+def stats(dst=SETTINGS.STATS_FILE):
+    """Precompute the default games and user stats."""
+    LOGGER.info("Precomputing stats, writing games stats to <%s>...", dst)
+    django.core.management.call_command("stats", output=dst)
+
+
+@task()
+@_checkpoint()
+def rankinghistory(dst=SETTINGS.HISTORY_FILE):
+    """Precompute the top rankings history."""
+    LOGGER.info("Precomputing the top rankings history, writing to <%s>...", dst)
+    django.core.management.call_command("rankinghistory", output=dst)
 
 
 @task()
@@ -1505,6 +1765,7 @@ def makecsvs(
 
 
 @task()
+@_checkpoint()
 def sitemap(url=URL_LIVE, dst=os.path.join(DATA_DIR, "sitemap.xml"), limit=50_000):
     """Generate sitemap.xml."""
     limit = parse_int(limit) or 50_000
@@ -1514,36 +1775,162 @@ def sitemap(url=URL_LIVE, dst=os.path.join(DATA_DIR, "sitemap.xml"), limit=50_00
     django.core.management.call_command("sitemap", url=url, limit=limit, output=dst)
 
 
-@task(
-    cleandata,
-    filldb,
-    dateflag,
-    splitall,
-    historicalbggrankings,
-    weeklycharts,
-    fillrankingdb,
-    compressdb,
-    cpdirs,
-    cpdirsbga,
-    sitemap,
-)
-def builddb():
+def _builddb_graph(graph):
+    from games.jlcache import cache_path
+
+    database = SETTINGS.DATABASES["default"]["NAME"]
+    srp_dir = os.path.join(SCRAPED_DATA_DIR, "scraped")
+    ratings_file = os.path.join(srp_dir, "bgg_RatingItem.jl")
+
+    # every stage waits for cleandata, as it starts a new build
+    _add(graph, cleandata, outputs=_defaults(cleandata)["src_dir"])
+    after = "cleandata"
+    _add(
+        graph, cachejl, inputs=ratings_file, outputs=SETTINGS.JL_CACHE_DIR, after=after
+    )
+    _add(graph, migrate, outputs=database, after=after)
+    _add(
+        graph,
+        filldb,
+        inputs=_filldb_inputs(**_defaults(filldb)),
+        outputs=database,
+        after=after,
+    )
+    _add(graph, dateflag, outputs=_defaults(dateflag)["dst"], after=after)
+    _split_graph(graph, after=after)
+    args = _defaults(historicalbggrankings)
+    _add(
+        graph,
+        historicalbggrankings,
+        inputs=args["repo"],
+        outputs=os.path.dirname(args["dst"]),
+        after=after,
+    )
+    args = _defaults(weeklycharts)
+    _add(
+        graph,
+        weeklycharts,
+        # reads the ratings through their columnar cache, written by cachejl
+        inputs=[args["src_file"], cache_path(args["src_file"])],
+        outputs=args["dst_dir"],
+        after=after,
+        cache=True,
+        # a new chart is due every week
+        params={"week": snap(django.utils.timezone.now(), "@week5@week1")},
+    )
+    _add(
+        graph,
+        fillrankingdb,
+        inputs=[_defaults(fillrankingdb)["path"], database],
+        outputs=database,
+        after=after,
+    )
+    for stage in (stats, rankinghistory):
+        _add(
+            graph, stage, inputs=database, outputs=_defaults(stage)["dst"], after=after
+        )
+    _add(
+        graph,
+        sitemap,
+        inputs=database,
+        outputs=_defaults(sitemap)["dst"],
+        after=after,
+        cache=True,
+    )
+    _add(
+        graph,
+        compressdb,
+        inputs=_defaults(compressdb)["indexes"],
+        outputs=database,
+        after=after,
+    )
+    for stage in (cpdirs, cpdirsbga):
+        args = _defaults(stage)
+        _add(graph, stage, inputs=args["src_dir"], outputs=args["dst_dir"], after=after)
+
+    return graph
+
+
+@task()
+def builddb(jobs=0, dry_run=False, force=False):
     """ build a new database """
+    from games.taskgraph import TaskGraph
 
+    _run_graph(
+        _builddb_graph(TaskGraph("builddb")), jobs=jobs, dry_run=dry_run, force=force
+    )
 
-@task(
-    gitprepare,
-    mergeall,
-    makecsvs,
-    link,
-    train,
-    saverankings,
-    builddb,
-    updatecount,
-    gitupdate,
-)
-def builddbfull():
+
+def _builddbfull_graph(graph):
+    srp_dir = os.path.join(SCRAPED_DATA_DIR, "scraped")
+    game_files = [
+        os.path.join(srp_dir, f"{site}_GameItem.jl")
+        for site in ("bga", "bgg", "dbpedia", "luding", "spielen", "wikidata")
+    ]
+
+    # Git tasks change the working directory
+    _add(graph, gitprepare, outputs=SCRAPED_DATA_DIR, exclusive=True)
+    _merge_graph(graph)
+    _add(
+        graph,
+        makecsvs,
+        inputs=game_files,
+        outputs=[os.path.splitext(path)[0] + ".csv" for path in game_files],
+        cache=True,
+    )
+    args = _defaults(link)
+    _add(
+        graph,
+        link,
+        inputs=[*args["paths"], args["gazetteer"]],
+        outputs=args["output"],
+        cache=True,
+    )
+    for stage in (trainbgg, trainbga):
+        args = _defaults(stage)
+        _add(
+            graph,
+            stage,
+            inputs=[args["games_file"], args["ratings_file"]],
+            outputs=args["out_path"],
+            # the vote threshold of trainbgg changes over time
+            cache=stage is trainbga,
+        )
+    for stage in (savebggrankings, savebgarankings):
+        args = _defaults(stage)
+        _add(
+            graph,
+            stage,
+            inputs=args["recommender_path"],
+            outputs=[
+                os.path.join(args["dst_dir"], "factor"),
+                os.path.join(args["dst_dir"], "similarity"),
+            ],
+        )
+    _builddb_graph(graph)
+    args = _defaults(updatecount)
+    _add(
+        graph,
+        updatecount,
+        inputs=[args["paths_lines"], args["paths_files"], args["template"]],
+        outputs=args["dst"],
+    )
+    _add(graph, gitupdate, inputs=SCRAPED_DATA_DIR, exclusive=True)
+
+    return graph
+
+
+@task()
+def builddbfull(jobs=0, dry_run=False, force=False):
     """ merge, link, train, and build, all relevant files """
+    from games.taskgraph import TaskGraph
+
+    _run_graph(
+        _builddbfull_graph(TaskGraph("builddbfull")),
+        jobs=jobs,
+        dry_run=dry_run,
+        force=force,
+    )
 
 
 def _sync_data(src, dst, retries=0):
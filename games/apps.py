@@ -3,9 +3,26 @@
 """ app config """
 
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Enable memory-mapped I/O and a large page cache on immutable databases."""
+
+    # pylint: disable=unused-argument
+    if connection.vendor != "sqlite" or not settings.DATABASE_IMMUTABLE:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.DATABASE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size = {-int(settings.DATABASE_CACHE_SIZE)}")
 
 
 class GamesConfig(AppConfig):
     """ games config """
 
     name = "games"
+
+    def ready(self):
+        connection_created.connect(configure_sqlite)
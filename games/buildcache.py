@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""Content addressed cache of build task results.
+
+A task is keyed by its name, parameters, source code, and the content digests
+of its input files. After it ran, the digests of all files in its outputs are
+recorded under that key. If the same key comes up again and the recorded files
+are still there with the same content, the task can be skipped. Outputs of
+tasks that are small enough are kept in an object store, so they can be
+restored if they were removed (e.g., by cleandata) or overwritten since.
+
+File digests are remembered along with size and modification time, so only
+files that changed are hashed again."""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import threading
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pytility import arg_to_iter
+
+LOGGER = logging.getLogger(__name__)
+CACHE_VERSION = 1
+CHUNK_SIZE = 1 << 20
+
+
+def _files(path):
+    path = Path(path)
+    if path.is_file():
+        yield path
+    elif path.is_dir():
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file in sorted(files):
+                yield Path(root) / file
+
+
+def _suffix():
+    return f"{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _dump(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{_suffix()}")
+    with tmp_path.open("w") as file:
+        json.dump(data, file, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _load(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+class BuildCache:
+    """Cache of task results in cache_dir. With force, every task is reported
+    as out of date, but the results are still recorded. Outputs are only kept
+    for restoring if they add up to at most max_object_size bytes."""
+
+    def __init__(self, cache_dir, force=False, max_object_size=64 << 20, logger=None):
+        self.cache_dir = Path(cache_dir)
+        self.force = force
+        self.max_object_size = max_object_size
+        self.logger = logger or LOGGER
+        self._lock = threading.Lock()
+        self._digests_file = self.cache_dir / "digests.json"
+        self._digests = _load(self._digests_file) or {}
+
+    def digest(self, path):
+        """SHA-256 of the file's content."""
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            size, mtime, digest = self._digests.get(path) or (None, None, None)
+        if size == stat.st_size and mtime == stat.st_mtime_ns:
+            return digest
+
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def digests(self, paths):
+        """Digests of all files in the given paths (recursing into directories)."""
+        return {
+            str(file): self.digest(file)
+            for path in arg_to_iter(paths)
+            for file in _files(path)
+        }
+
+    def key(self, name, func=None, params=None, inputs=None):
+        """Key of a task run with the given parameters on the given inputs."""
+
+        try:
+            source = inspect.getsource(inspect.unwrap(func)) if func else None
+        except (OSError, TypeError):
+            source = None
+
+        data = {
+            "version": CACHE_VERSION,
+            "task": name,
+            "source": source,
+            "params": params,
+            "inputs": {
+                os.path.abspath(path): self.digests(path) or None
+                for path in arg_to_iter(inputs)
+            },
+        }
+        payload = json.dumps(data, sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record_file(self, key):
+        return self.cache_dir / "records" / key[:2] / f"{key}.json"
+
+    def _object_file(self, digest):
+        return self.cache_dir / "objects" / digest[:2] / digest
+
+    def lookup(self, key):
+        """The recorded result if the outputs are still up to date or can be
+        restored from the object store, else None."""
+
+        if self.force:
+            return None
+
+        record = _load(self._record_file(key))
+        if not record:
+            return None
+
+        stale = {
+            path: digest
+            for path, digest in record["outputs"].items()
+            if not os.path.isfile(path) or self.digest(path) != digest
+        }
+
+        if any(not self._object_file(digest).is_file() for digest in stale.values()):
+            return None
+
+        for path, digest in stale.items():
+            self.logger.debug("Restoring <%s> from the build cache...", path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copy2(self._object_file(digest), path)
+            self.digest(path)
+
+        return record
+
+    def store(self, key, name, outputs, duration):
+        """Record the outputs of a task run."""
+
+        outputs = self.digests(outputs)
+        size = sum(os.path.getsize(path) for path in outputs)
+
+        if size <= self.max_object_size:
+            for path, digest in outputs.items():
+                object_file = self._object_file(digest)
+                if not object_file.exists():
+                    object_file.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_file = object_file.with_name(f".{digest}.{_suffix()}")
+                    shutil.copy2(path, tmp_file)
+                    os.replace(tmp_file, object_file)
+
+        _dump(
+            self._record_file(key),
+            {
+                "task": name,
+                "key": key,
+                "duration": duration,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "outputs": outputs,
+            },
+        )
+
+    def save(self):
+        """Persist the file digests for the next run."""
+        with self._lock:
+            digests = {
+                path: value
+                for path, value in self._digests.items()
+                if os.path.exists(path)
+            }
+        _dump(self._digests_file, digests)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""Batch level checkpoints of long running loads.
+
+The progress is stored in the database that is being filled and committed in
+the same transaction as the batches it counts, so it can never claim more than
+what was actually written. A rerun with resume enabled skips the batches and
+stages that were completed already."""
+
+import logging
+
+from contextlib import contextmanager, nullcontext
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.transaction import atomic
+
+from .models import LoadCheckpoint
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CheckpointMismatch(Exception):
+    """The inputs changed since the interrupted load, so it cannot resume."""
+
+
+class LoadProgress:
+    """Progress of a load identified by its command, keyed by a fingerprint of
+    its inputs and options (see utils.fingerprint). Without resume any earlier
+    progress is discarded.
+
+    progress = LoadProgress("filldb", key=key, resume=True)
+    for count, batch in enumerate(batches):
+        if progress.skip("games", count):
+            continue
+        with progress.batch("games", count):
+            write(batch)
+    progress.finish("games")
+    """
+
+    def __init__(
+        self, command, key="", resume=False, using=DEFAULT_DB_ALIAS, logger=None
+    ):
+        self.command = command
+        self.key = key
+        self.using = using
+        self.logger = logger or LOGGER
+        self.stages = {}
+
+        # pylint: disable=no-member
+        checkpoints = LoadCheckpoint.objects.using(using).filter(command=command)
+
+        if not resume:
+            checkpoints.delete()
+            return
+
+        self.stages = {
+            checkpoint.stage: checkpoint for checkpoint in checkpoints.iterator()
+        }
+        keys = {checkpoint.key for checkpoint in self.stages.values()}
+        if keys - {key}:
+            raise CheckpointMismatch(
+                f"inputs or options of <{command}> changed since the interrupted "
+                "load, start from scratch instead"
+            )
+
+        for stage, checkpoint in self.stages.items():
+            self.logger.info(
+                "Resuming <%s>: stage <%s> %s",
+                command,
+                stage,
+                "done" if checkpoint.done else f"{checkpoint.batches} batches done",
+            )
+
+    def done(self, stage):
+        """Whether the stage was completed."""
+        checkpoint = self.stages.get(stage)
+        return checkpoint is not None and checkpoint.done
+
+    def batches(self, stage):
+        """Number of batches of the stage that were written."""
+        checkpoint = self.stages.get(stage)
+        return checkpoint.batches if checkpoint is not None else 0
+
+    def skip(self, stage, count):
+        """Whether batch number count (starting at 0) was written already."""
+        return self.done(stage) or count < self.batches(stage)
+
+    def _save(self, stage, **kwargs):
+        # pylint: disable=no-member
+        checkpoint, _ = LoadCheckpoint.objects.using(self.using).update_or_create(
+            command=self.command,
+            stage=stage,
+            defaults={"key": self.key, **kwargs},
+        )
+        self.stages[stage] = checkpoint
+
+    @contextmanager
+    def batch(self, stage, count):
+        """Write batch number count (starting at 0) and record it atomically."""
+        with atomic(using=self.using):
+            yield
+            self._save(stage, batches=count + 1)
+
+    def finish(self, stage):
+        """Mark the stage as completed."""
+        with atomic(using=self.using):
+            self._save(stage, batches=self.batches(stage), done=True)
+
+    def clear(self):
+        """Remove the progress after the load completed."""
+        # pylint: disable=no-member
+        LoadCheckpoint.objects.using(self.using).filter(command=self.command).delete()
+        self.stages = {}
+
+
+class NoProgress:
+    """Stand-in for LoadProgress that never skips and records nothing."""
+
+    def done(self, stage):  # pylint: disable=unused-argument,no-self-use
+        """Never done."""
+        return False
+
+    def batches(self, stage):  # pylint: disable=unused-argument,no-self-use
+        """Always zero."""
+        return 0
+
+    def skip(self, stage, count):  # pylint: disable=unused-argument,no-self-use
+        """Never skip."""
+        return False
+
+    def batch(self, stage, count):  # pylint: disable=unused-argument,no-self-use
+        """A no-op context."""
+        return nullcontext()
+
+    def finish(self, stage):
+        """Nothing to record."""
+
+    def clear(self):
+        """Nothing to clear."""
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+"""Columnar cache of scraped JSON lines files.
+
+Every source file is converted once into typed, columnar parts (Parquet if
+pyarrow is installed, pickled DataFrames otherwise). The cache is keyed by
+the source path, size, modification time and content hash, and is rebuilt
+only if the source changed."""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+
+from datetime import timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from pytility import arg_to_iter, batchify, parse_date
+
+from .utils import file_hash, iter_jl
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+DATE_COLUMNS = ("published_at", "updated_at")
+META_FILE = "meta.json"
+# keys missing from a row (as opposed to explicit nulls), only stored if any
+ABSENT_COLUMN = "__absent__"
+
+
+def _pyarrow():
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.parquet  # pylint: disable=unused-import
+
+        return pyarrow
+    except ImportError:
+        pass
+    return None
+
+
+def cache_path(path, cache_dir=None, date_columns=DATE_COLUMNS):
+    """Directory holding the columnar parts of the given JSON lines file."""
+    cache_dir = cache_dir or settings.JL_CACHE_DIR
+    path = Path(path).resolve()
+    key = f"{path}|{','.join(sorted(date_columns))}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return Path(cache_dir) / f"{path.stem}-{digest}"
+
+
+def _load_meta(path_dir):
+    try:
+        with open(path_dir / META_FILE) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(path_dir, meta):
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path_dir, prefix=f".{META_FILE}.", delete=False
+    ) as file:
+        json.dump(meta, file, indent=4)
+    os.replace(file.name, path_dir / META_FILE)
+
+
+def _replace_dir(src, dst):
+    """Move the directory src to dst, replacing an existing dst. Returns False
+    if a concurrent build created dst in the meantime, its result is used."""
+
+    old = Path(tempfile.mkdtemp(prefix=f".{dst.name}.", suffix=".old", dir=dst.parent))
+    try:
+        try:
+            # renaming onto the empty directory is atomic
+            os.replace(dst, old)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(src, dst)
+        except OSError:
+            return False
+        return True
+    finally:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def is_fresh(path, cache_dir=None, date_columns=DATE_COLUMNS):
+    """Whether the cache of the given file is up to date. The content hash is
+    only computed if size or modification time don't match anymore."""
+
+    path_dir = cache_path(path, cache_dir, date_columns)
+    meta = _load_meta(path_dir)
+    if not meta or meta.get("version") != CACHE_VERSION:
+        return False
+
+    stat = os.stat(path)
+    if stat.st_size != meta["size"]:
+        return False
+    if stat.st_mtime_ns == meta["mtime_ns"]:
+        return True
+
+    if file_hash(path) != meta["sha256"]:
+        return False
+
+    LOGGER.info("Source <%s> was touched, but its content is unchanged", path)
+    meta["mtime_ns"] = stat.st_mtime_ns
+    _save_meta(path_dir, meta)
+    return True
+
+
+def _column_array(values, date_column=False):
+    if date_column:
+        return pd.to_datetime(
+            [parse_date(value, tzinfo=timezone.utc) for value in values], utc=True
+        )
+    try:
+        return pd.array(values)
+    except (TypeError, ValueError):
+        return pd.array(values, dtype=object)
+
+
+def _data_frame(rows, date_columns=DATE_COLUMNS):
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    data = {
+        column: _column_array(
+            [row.get(column) for row in rows],
+            date_column=column in date_columns,
+        )
+        for column in columns
+    }
+    absent = [
+        [column for column in columns if column not in row] or None for row in rows
+    ]
+    if any(absent):
+        data[ABSENT_COLUMN] = pd.array(absent, dtype=object)
+    return pd.DataFrame(data, index=pd.RangeIndex(len(rows)))
+
+
+def _to_json(value):
+    return None if value is None else json.dumps(value)
+
+
+def _from_json(value):
+    return None if _python_value(value) is None else json.loads(value)
+
+
+def _write_part(data_frame, path_file, pyarrow=None):
+    """Write a part, returns the columns that had to be stored as JSON."""
+
+    if pyarrow is None:
+        data_frame.to_pickle(path_file)
+        return []
+
+    json_columns = []
+    for column in data_frame.columns:
+        if data_frame[column].dtype != object:
+            continue
+        try:
+            pyarrow.array(data_frame[column], from_pandas=True)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            # mixed types, e.g., strings and lists in the same column
+            data_frame[column] = data_frame[column].map(_to_json)
+            json_columns.append(column)
+
+    data_frame.to_parquet(path_file, index=False)
+    return json_columns
+
+
+def _build_parts(
+    path, path_dir, date_columns=DATE_COLUMNS, chunk_size=1_000_000, jobs=1
+):
+    pyarrow = _pyarrow()
+    file_format = "parquet" if pyarrow is not None else "pickle"
+    stat = os.stat(path)
+
+    LOGGER.info("Converting <%s> into %s parts...", path, file_format)
+
+    parts = []
+    for count, rows in enumerate(batchify(iter_jl(path, jobs=jobs), chunk_size)):
+        data_frame = _data_frame(list(rows), date_columns)
+        file_name = f"part-{count:05d}.{file_format}"
+        json_columns = _write_part(data_frame, path_dir / file_name, pyarrow)
+        parts.append(
+            {
+                "file": file_name,
+                "rows": len(data_frame),
+                "columns": [
+                    column for column in data_frame.columns if column != ABSENT_COLUMN
+                ],
+                "absent": ABSENT_COLUMN in data_frame,
+                "json_columns": json_columns,
+            }
+        )
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": str(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(path),
+        "date_columns": sorted(date_columns),
+        "format": file_format,
+        "rows": sum(part["rows"] for part in parts),
+        "parts": parts,
+    }
+    _save_meta(path_dir, meta)
+    return meta
+
+
+def build_cache(
+    path,
+    cache_dir=None,
+    date_columns=DATE_COLUMNS,
+    chunk_size=1_000_000,
+    jobs=1,
+):
+    """Convert a JSON lines file into columnar parts of chunk_size rows."""
+
+    path = Path(path).resolve()
+    path_dir = cache_path(path, cache_dir, date_columns)
+    path_dir.parent.mkdir(parents=True, exist_ok=True)
+    # unique per build, so concurrent builds of the same file don't collide
+    tmp_dir = Path(
+        tempfile.mkdtemp(
+            prefix=f".{path_dir.name}.", suffix=".tmp", dir=path_dir.parent
+        )
+    )
+    LOGGER.info("Building the cache of <%s> in <%s>...", path, path_dir)
+
+    try:
+        meta = _build_parts(path, tmp_dir, date_columns, chunk_size, jobs)
+        if not _replace_dir(tmp_dir, path_dir):
+            LOGGER.info("<%s> was rebuilt concurrently, using that cache", path_dir)
+            return _load_meta(path_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    LOGGER.info("Wrote %d rows in %d parts", meta["rows"], len(meta["parts"]))
+    return meta
+
+
+def ensure_cache(
+    path, cache_dir=None, date_columns=DATE_COLUMNS, rebuild=False, **kwargs
+):
+    """Build the cache of the given file unless it is fresh already."""
+    if not rebuild and is_fresh(path, cache_dir, date_columns):
+        LOGGER.info("Using the cache of <%s>", path)
+        return _load_meta(cache_path(path, cache_dir, date_columns))
+    return build_cache(path, cache_dir=cache_dir, date_columns=date_columns, **kwargs)
+
+
+def _read_part(path_dir, meta, part, columns=None, absent=False):
+    """Read a part projected onto the given columns, with absent also the
+    column of keys missing from each row (if the part has any)."""
+
+    path_file = path_dir / part["file"]
+    columns = list(part["columns"] if columns is None else columns)
+    available = [column for column in columns if column in part["columns"]]
+    if absent and part.get("absent"):
+        columns.append(ABSENT_COLUMN)
+        available.append(ABSENT_COLUMN)
+
+    if meta["format"] == "parquet":
+        data_frame = pd.read_parquet(path_file, columns=available)
+    else:
+        data_frame = pd.read_pickle(path_file)[available]
+
+    for column in part["json_columns"]:
+        if column in data_frame:
+            data_frame[column] = data_frame[column].map(_from_json)
+
+    return data_frame.reindex(columns=columns)
+
+
+def _iter_parts(path, cache_dir=None, date_columns=DATE_COLUMNS, **kwargs):
+    meta = ensure_cache(path, cache_dir=cache_dir, date_columns=date_columns, **kwargs)
+    path_dir = cache_path(path, cache_dir, date_columns)
+    for part in meta["parts"]:
+        yield path_dir, meta, part
+
+
+def iter_frames(
+    path, columns=None, cache_dir=None, date_columns=DATE_COLUMNS, **kwargs
+):
+    """DataFrames of a JSON lines file, one per cached part, projected onto
+    the given columns. Builds the cache first if needed."""
+
+    columns = list(arg_to_iter(columns)) or None
+    for path_dir, meta, part in _iter_parts(
+        path, cache_dir=cache_dir, date_columns=date_columns, **kwargs
+    ):
+        yield _read_part(path_dir, meta, part, columns)
+
+
+def read_jl(path, columns=None, cache_dir=None, date_columns=DATE_COLUMNS, **kwargs):
+    """A JSON lines file as a single typed DataFrame, see iter_frames."""
+    frames = list(
+        iter_frames(
+            path,
+            columns=columns,
+            cache_dir=cache_dir,
+            date_columns=date_columns,
+            **kwargs,
+        )
+    )
+    if not frames:
+        return pd.DataFrame(columns=list(arg_to_iter(columns)))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def _python_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, np.ndarray):
+        return [_python_value(v) for v in value]
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def iter_records(
+    path, columns=None, cache_dir=None, date_columns=DATE_COLUMNS, **kwargs
+):
+    """Items of a JSON lines file as dicts with plain Python values, read
+    from the cache. Like iter_jl, explicit nulls are kept as None, while keys
+    that were missing from an item are left out."""
+
+    columns = list(arg_to_iter(columns)) or None
+    for path_dir, meta, part in _iter_parts(
+        path, cache_dir=cache_dir, date_columns=date_columns, **kwargs
+    ):
+        data_frame = _read_part(path_dir, meta, part, columns, absent=True)
+        # columns requested, but missing from the whole part are left out
+        keys = [
+            (index, column)
+            for index, column in enumerate(data_frame.columns)
+            if column in part["columns"]
+        ]
+        absent_index = (
+            data_frame.columns.get_loc(ABSENT_COLUMN) if part.get("absent") else None
+        )
+
+        for row in data_frame.itertuples(index=False, name=None):
+            absent = row[absent_index] if absent_index is not None else None
+            absent = frozenset(_python_value(absent) or ())
+            yield {
+                column: _python_value(row[index])
+                for index, column in keys
+                if column not in absent
+            }
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark database queries per second under concurrent requests, opening
+the database regularly and read-only and immutable."""
+
+import logging
+import random
+import sys
+import timeit
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test import override_settings
+
+from ...models import Game, Ranking
+
+LOGGER = logging.getLogger(__name__)
+MODES = ("regular", "immutable")
+
+
+def _request(game_ids, page_size=25):
+    """Mimic the queries of a typical request, return the number of queries."""
+
+    # like Django does at the start and end of every request
+    close_old_connections()
+
+    game_id = random.choice(game_ids)
+    try:
+        # pylint: disable=no-member,protected-access
+        Game.objects.filter(bgg_id=game_id).values("bgg_id", "name", "year").first()
+        list(
+            Game.objects.order_by(*Game._meta.ordering).values_list("bgg_id", "name")[
+                :page_size
+            ]
+        )
+        list(
+            Ranking.objects.filter(game=game_id, ranking_type=Ranking.BGG)
+            .order_by("date")
+            .values_list("rank", "date")
+        )
+    finally:
+        close_old_connections()
+
+    return 3
+
+
+def _settings_dict(immutable=False, database_file=None):
+    """Connection settings for the given database file, like in settings.py."""
+
+    database_file = database_file or settings.DATABASE_FILE
+    result = dict(settings.DATABASES[DEFAULT_DB_ALIAS])
+    if immutable:
+        result.update(
+            NAME=f"file:{quote(database_file)}?mode=ro&immutable=1",
+            CONN_MAX_AGE=None,
+        )
+    else:
+        result.update(NAME=database_file, CONN_MAX_AGE=0)
+    return result
+
+
+def _benchmark(game_ids, immutable=False, threads=16, number=10_000):
+    """Make the requests with every thread connecting in the given mode, return
+    the number of queries and the seconds it took."""
+
+    connections.close_all()
+    connections.databases[DEFAULT_DB_ALIAS] = _settings_dict(immutable)
+    LOGGER.info(
+        "Making %d requests in %d threads to <%s>, connection max age: %s...",
+        number,
+        threads,
+        connections.databases[DEFAULT_DB_ALIAS]["NAME"],
+        connections.databases[DEFAULT_DB_ALIAS]["CONN_MAX_AGE"],
+    )
+
+    # the pragmas of immutable databases are set on connecting, see apps.py
+    with override_settings(DATABASE_IMMUTABLE=immutable):
+        start = timeit.default_timer()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            queries = sum(executor.map(lambda _: _request(game_ids), range(number)))
+        total = timeit.default_timer() - start
+
+    LOGGER.info(
+        "Done with %d queries after %.1f seconds (%.0f queries/s, %.0f requests/s)",
+        queries,
+        total,
+        queries / total,
+        number / total,
+    )
+
+    return queries, total
+
+
+class Command(BaseCommand):
+    """Benchmark database queries per second under concurrent requests."""
+
+    help = "Benchmark database queries per second under concurrent requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", "-t", type=int, default=16, help="number of threads"
+        )
+        parser.add_argument(
+            "--number", "-n", type=int, default=10_000, help="number of requests"
+        )
+        parser.add_argument(
+            "--modes",
+            "-m",
+            nargs="+",
+            choices=MODES,
+            default=MODES,
+            help="how to open the database",
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+        LOGGER.info("Benchmarking database <%s>", settings.DATABASE_FILE)
+
+        # pylint: disable=no-member
+        game_ids = tuple(Game.objects.values_list("bgg_id", flat=True))
+        if not game_ids:
+            LOGGER.error("No games in the database, nothing to benchmark")
+            return
+
+        results = {
+            mode: _benchmark(
+                game_ids=game_ids,
+                immutable=mode == "immutable",
+                threads=kwargs["threads"],
+                number=kwargs["number"],
+            )
+            for mode in dict.fromkeys(kwargs["modes"])
+        }
+
+        connections.close_all()
+        connections.databases[DEFAULT_DB_ALIAS] = settings.DATABASES[DEFAULT_DB_ALIAS]
+
+        for mode, (queries, total) in results.items():
+            LOGGER.info(
+                "%-9s %8.0f queries/s, %6.0f requests/s",
+                mode,
+                queries / total,
+                kwargs["number"] / total,
+            )
+        if len(results) == len(MODES):
+            LOGGER.info(
+                "Immutable connections are %.2fx as fast as regular ones",
+                results["regular"][1] / results["immutable"][1],
+            )
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark decoding JSON lines with the shared reader against the stdlib and
+the columnar cache."""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from ...jlcache import build_cache, iter_records
+from ...utils import iter_jl, json_decoder
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _stdlib(path, **_):
+    with open(path) as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def _iter_records(path, fields=None, **kwargs):
+    return iter_records(path, columns=fields, **kwargs)
+
+
+def _build_cache(path, **kwargs):
+    meta = build_cache(path, **kwargs)
+    return range(meta["rows"])
+
+
+class Command(BaseCommand):
+    """Benchmark decoding JSON lines with the shared reader against the stdlib
+    and the columnar cache."""
+
+    help = (
+        "Benchmark decoding JSON lines with the shared reader against the stdlib "
+        "and the columnar cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSON lines file")
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            nargs="+",
+            default=(1, 0),
+            help="numbers of processes to compare (0: one per CPU)",
+        )
+        parser.add_argument(
+            "--fields", "-f", nargs="+", help="also compare projecting onto fields"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            "-c",
+            type=int,
+            default=10_000,
+            help="number of lines per chunk",
+        )
+        parser.add_argument(
+            "--repeat", "-r", type=int, default=1, help="number of runs per method"
+        )
+        parser.add_argument(
+            "--cache-dir",
+            help="directory for the columnar cache (default: a temporary one)",
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+        LOGGER.info("Using the JSON decoder from <%s>", json_decoder().__module__)
+
+        methods = [("stdlib", _stdlib, {})]
+        for jobs in kwargs["jobs"]:
+            jobs = os.cpu_count() if jobs == 0 else jobs
+            methods.append(
+                (
+                    f"iter_jl jobs={jobs}",
+                    iter_jl,
+                    {"jobs": jobs, "chunk_size": kwargs["chunk_size"]},
+                )
+            )
+            if kwargs["fields"]:
+                methods.append(
+                    (
+                        f"iter_jl jobs={jobs} fields",
+                        iter_jl,
+                        {
+                            "jobs": jobs,
+                            "chunk_size": kwargs["chunk_size"],
+                            "fields": kwargs["fields"],
+                        },
+                    )
+                )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = kwargs["cache_dir"] or tmp_dir
+            methods.append(("build_cache", _build_cache, {"cache_dir": cache_dir}))
+            methods.append(("iter_records", _iter_records, {"cache_dir": cache_dir}))
+            if kwargs["fields"]:
+                methods.append(
+                    (
+                        "iter_records fields",
+                        _iter_records,
+                        {"cache_dir": cache_dir, "fields": kwargs["fields"]},
+                    )
+                )
+            self._compare(kwargs["path"], methods, kwargs["repeat"])
+
+        LOGGER.info("Done.")
+
+    @staticmethod
+    def _compare(path, methods, repeat=1):
+        baseline = None
+        for name, func, func_kwargs in methods:
+            durations = []
+            for _ in range(repeat):
+                start = timeit.default_timer()
+                rows = sum(1 for _ in func(path, **func_kwargs))
+                durations.append(timeit.default_timer() - start)
+
+            best = max(min(durations), 1e-6)
+            baseline = baseline or best
+            LOGGER.info(
+                "<%s>: best of %d runs %.2f seconds (%.0f rows/s, %.1fx)",
+                name,
+                len(durations),
+                best,
+                rows / best,
+                baseline / best,
+            )
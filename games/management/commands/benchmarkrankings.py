@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark writing rankings as model instances against raw inserts."""
+
+import logging
+import os
+import sys
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic, set_rollback
+from pytility import batchify
+
+from ...models import Game, Ranking
+from .fillrankingdb import (
+    Command as FillRankingCommand,
+    _iter_rankings,
+    _ranking_instances,
+    _ranking_rows,
+    _write_batch,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _instances(frames):
+    for ranking_type, _, rankings in frames:
+        yield from _ranking_instances(ranking_type, rankings)
+
+
+def _rows(frames):
+    for ranking_type, date, rankings in frames:
+        yield from _ranking_rows(
+            ranking_type=ranking_type,
+            date=date,
+            game_ids=rankings["bgg_id"].values,
+            ranks=rankings["rank"].values,
+        )
+
+
+METHODS = {
+    "bulk_create": (_instances, False),
+    "executemany": (_rows, True),
+}
+
+
+class Command(BaseCommand):
+    """Benchmark writing rankings as model instances against raw inserts."""
+
+    help = "Benchmark writing rankings as model instances against raw inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="input directory")
+        parser.add_argument(
+            "--types",
+            "-t",
+            choices=FillRankingCommand.ranking_types.keys(),
+            nargs="+",
+            default=(Ranking.BGG,),
+            help="ranking types to load",
+        )
+        parser.add_argument(
+            "--batch",
+            "-b",
+            type=int,
+            default=100_000,
+            help="batch size for DB transactions",
+        )
+        parser.add_argument(
+            "--repeat", "-r", type=int, default=3, help="number of runs per method"
+        )
+        parser.add_argument(
+            "--methods",
+            "-m",
+            choices=METHODS.keys(),
+            nargs="+",
+            default=tuple(METHODS.keys()),
+            help="write methods to compare",
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        # pylint: disable=no-member
+        game_ids = frozenset(Game.objects.order_by().values_list("bgg_id", flat=True))
+
+        # parse everything up front, so only the writes are measured
+        frames = []
+        for ranking_type in kwargs["types"]:
+            sub_dir, method, min_date = FillRankingCommand.ranking_types[ranking_type]
+            frames.extend(
+                (ranking_type, date, rankings)
+                for date, rankings in _iter_rankings(
+                    path_dir=os.path.join(kwargs["path"], sub_dir),
+                    ranking_type=ranking_type,
+                    filter_ids=game_ids,
+                    method=method,
+                    min_date=min_date,
+                )
+            )
+        total = sum(len(rankings) for _, _, rankings in frames)
+
+        LOGGER.info("Benchmarking writes of %d rankings...", total)
+
+        for name in kwargs["methods"]:
+            create, raw = METHODS[name]
+            durations = []
+            for _ in range(kwargs["repeat"]):
+                with atomic():
+                    start = timeit.default_timer()
+                    for batch in batchify(create(frames), kwargs["batch"]):
+                        _write_batch(Ranking, batch, raw)
+                    durations.append(timeit.default_timer() - start)
+                    # never keep the benchmark rows
+                    set_rollback(True)
+
+            best = max(min(durations), 1e-6)
+            LOGGER.info(
+                "<%s>: best of %d runs %.2f seconds (%.0f rows/s)",
+                name,
+                len(durations),
+                best,
+                total / best,
+            )
+
+        LOGGER.info("Done.")
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""Build the columnar cache of JSON lines files."""
+
+import logging
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ...jlcache import DATE_COLUMNS, cache_path, ensure_cache
+from ...utils import Timer
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Build the columnar cache of JSON lines files."""
+
+    help = "Build the columnar cache of JSON lines files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="JSON lines file(s) to cache")
+        parser.add_argument("--cache-dir", "-c", help="cache directory")
+        parser.add_argument(
+            "--date-columns",
+            "-d",
+            nargs="+",
+            default=DATE_COLUMNS,
+            help="columns to parse as dates",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            "-s",
+            type=int,
+            default=1_000_000,
+            help="number of rows per part",
+        )
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            help="number of processes decoding JSON lines (0: one per CPU)",
+        )
+        parser.add_argument(
+            "--rebuild", action="store_true", help="rebuild even if up to date"
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        jobs = os.cpu_count() if kwargs["jobs"] == 0 else kwargs["jobs"]
+
+        for path in kwargs["paths"]:
+            if not os.path.isfile(path):
+                LOGGER.warning("File <%s> does not exist, skipping...", path)
+                continue
+
+            with Timer(f"cache <{path}>", logger=LOGGER):
+                meta = ensure_cache(
+                    path,
+                    cache_dir=kwargs["cache_dir"],
+                    date_columns=tuple(kwargs["date_columns"]),
+                    rebuild=kwargs["rebuild"],
+                    chunk_size=kwargs["chunk_size"],
+                    jobs=jobs,
+                )
+
+            LOGGER.info(
+                "Cache of <%s> at <%s>: %d rows in %d %s parts",
+                path,
+                cache_path(path, kwargs["cache_dir"], kwargs["date_columns"]),
+                meta["rows"],
+                len(meta["parts"]),
+                meta["format"],
+            )
+
+        LOGGER.info("Done.")
@@ -2,8 +2,8 @@
 
 """Generate board game charts from ratings data."""
 
-import json
 import logging
+import os
 import sys
 
 from datetime import datetime, timedelta, timezone
@@ -19,15 +19,14 @@ from pytility import arg_to_iter, parse_date
 from snaptime import snap
 from tqdm import tqdm
 
-from ...utils import Timer
+from ...jlcache import read_jl
+from ...utils import Timer, iter_jl
 
 LOGGER = logging.getLogger(__name__)
 
 
-def _process_ratings(lines, keys=("bgg_id", "bgg_user_rating", "updated_at")):
-    for line in tqdm(lines):
-        item = json.loads(line)
-
+def _process_ratings(lines, keys=("bgg_id", "bgg_user_rating", "updated_at"), jobs=1):
+    for item in tqdm(iter_jl(lines, fields=keys, jobs=jobs)):
         if not item or any(not item.get(key) for key in keys):
             continue
 
@@ -39,12 +38,40 @@ def _process_ratings(lines, keys=("bgg_id", "bgg_user_rating", "updated_at")):
         }
 
 
-def _ratings_data(path, max_rows=None):
+def _cached_ratings(
+    path, keys=("bgg_id", "bgg_user_rating", "updated_at"), max_rows=None, jobs=1
+):
+    data = read_jl(path, columns=keys, jobs=jobs)
+    if max_rows:
+        data = data.head(max_rows)
+
+    # same as the falsy check in _process_ratings
+    mask = data.notna().all(axis=1)
+    for key in keys:
+        if pd.api.types.is_numeric_dtype(data[key]):
+            mask &= data[key].ne(0).fillna(False)
+        elif pd.api.types.is_string_dtype(data[key]):
+            mask &= data[key].ne("").fillna(False)
+    data = data[mask].reset_index(drop=True)
+
+    # no missing values left, so back to plain NumPy types
+    for key in keys:
+        numpy_dtype = getattr(data[key].dtype, "numpy_dtype", None)
+        if numpy_dtype is not None:
+            data[key] = data[key].astype(numpy_dtype)
+
+    return data
+
+
+def _ratings_data(path, max_rows=None, jobs=1, cache=False):
     path = Path(path).resolve()
     LOGGER.info("Reading ratings data from <%s>", path)
-    with path.open() as file:
-        lines = islice(file, max_rows) if max_rows else file
-        data = pd.DataFrame.from_records(_process_ratings(lines))
+    if cache:
+        data = _cached_ratings(path, max_rows=max_rows, jobs=jobs)
+    else:
+        with path.open("rb") as file:
+            lines = islice(file, max_rows) if max_rows else file
+            data = pd.DataFrame.from_records(_process_ratings(lines, jobs=jobs))
     LOGGER.info("Read %d rows", len(data))
     return data
 
@@ -170,6 +197,18 @@ class Command(BaseCommand):
         parser.add_argument("--out-dir", "-o", default=".")
         parser.add_argument("--out-file", "-O", default="%Y%m%d-%H%M%S.csv")
         parser.add_argument("--max-rows", "-m", type=int)
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            help="number of processes decoding JSON lines (0: one per CPU)",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="read the JSON lines file directly instead of its columnar cache",
+        )
         parser.add_argument(
             "--columns", "-c", nargs="+", default=("rank", "bgg_id", "score")
         )
@@ -193,7 +232,12 @@ class Command(BaseCommand):
         columns = list(arg_to_iter(kwargs["columns"]))
 
         with Timer(message="Loading ratings", logger=LOGGER):
-            ratings = _ratings_data(path=kwargs["in_file"], max_rows=kwargs["max_rows"])
+            ratings = _ratings_data(
+                path=kwargs["in_file"],
+                max_rows=kwargs["max_rows"],
+                jobs=os.cpu_count() if kwargs["jobs"] == 0 else kwargs["jobs"],
+                cache=not kwargs["no_cache"],
+            )
 
         min_date_args = parse_date(kwargs["min_date"], tzinfo=timezone.utc)
         min_date_ratings = ratings["updated_at"].min()
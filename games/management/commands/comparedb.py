@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""Compare the content of the tables filled by filldb between two databases."""
+
+import hashlib
+import logging
+import os
+import sys
+
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from ...models import Category, Collection, Game, GameType, Mechanic, Person, User
+
+LOGGER = logging.getLogger(__name__)
+MODULUS = 1 << 128
+
+
+def _models(models=(Game, Person, GameType, Category, Mechanic, User, Collection)):
+    for model in models:
+        yield model
+        # pylint: disable=protected-access
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                yield through
+
+
+def _fields(model):
+    """Fields to compare: all concrete fields but surrogate primary keys."""
+    # pylint: disable=protected-access
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if not (field.primary_key and field.get_internal_type() == "AutoField")
+    ]
+
+
+def _rows(model, using):
+    return model.objects.using(using).order_by().values_list(*_fields(model)).iterator()
+
+
+def _reprs(model, using):
+    # rows may hold unhashable JSON values, so compare their representations
+    return map(repr, _rows(model, using))
+
+
+def _table_digest(model, using):
+    """Row count and an order independent digest of all rows."""
+    count = 0
+    total = 0
+    for row in _reprs(model, using):
+        count += 1
+        digest = hashlib.blake2b(row.encode("utf-8"), digest_size=16).digest()
+        total = (total + int.from_bytes(digest, "big")) % MODULUS
+    return count, total
+
+
+def _database_alias(database):
+    """An alias for the given alias or SQLite file."""
+    if database in connections.databases:
+        return database
+    if not os.path.isfile(database):
+        raise CommandError(f"<{database}> is neither a database alias nor a file")
+    alias = f"compare_{hashlib.sha1(database.encode('utf-8')).hexdigest()[:8]}"
+    connections.databases[alias] = {
+        **connections.databases[DEFAULT_DB_ALIAS],
+        "NAME": database,
+    }
+    return alias
+
+
+class Command(BaseCommand):
+    """Compare the content of the tables filled by filldb between two databases."""
+
+    help = "Compare the content of the tables filled by filldb between two databases."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "other", help="database alias or SQLite file to compare with"
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="database to check"
+        )
+        parser.add_argument(
+            "--show",
+            "-s",
+            type=int,
+            default=0,
+            help="show up to this many differing rows per table",
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        this = _database_alias(kwargs["database"])
+        other = _database_alias(kwargs["other"])
+        mismatches = []
+
+        for model in _models():
+            # pylint: disable=protected-access
+            table = model._meta.db_table
+            this_count, this_digest = _table_digest(model, this)
+            other_count, other_digest = _table_digest(model, other)
+
+            if this_count == other_count and this_digest == other_digest:
+                LOGGER.info("Table <%s>: %d rows, identical", table, this_count)
+                continue
+
+            mismatches.append(table)
+            LOGGER.error(
+                "Table <%s>: %d rows vs %d rows, content differs",
+                table,
+                this_count,
+                other_count,
+            )
+
+            if kwargs["show"]:
+                diff = Counter(_reprs(model, this))
+                diff.subtract(_reprs(model, other))
+                for row, count in islice(
+                    ((row, count) for row, count in diff.items() if count),
+                    kwargs["show"],
+                ):
+                    LOGGER.error(
+                        "    %s %s",
+                        f"only in <{kwargs['database']}>"
+                        if count > 0
+                        else f"only in <{kwargs['other']}>",
+                        row,
+                    )
+
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} tables differ: {mismatches}")
+
+        LOGGER.info("Databases are consistent.")
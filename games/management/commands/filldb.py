@@ -2,26 +2,47 @@
 
 """ fill database """
 
+import hashlib
 import json
 import logging
+import os
 import re
+import sqlite3
 import sys
+import timeit
 
-from collections import defaultdict
+from collections import Counter, defaultdict
+from contextlib import nullcontext
 from functools import partial
-from itertools import groupby
+from itertools import chain, groupby
+
+import pandas as pd
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 from django.db.transaction import atomic
-from pytility import arg_to_iter, batchify, parse_int, take_first
+from pytility import arg_to_iter, batchify, parse_int
 
+from ...checkpoints import CheckpointMismatch, LoadProgress, NoProgress
+from ...jlcache import iter_records
 from ...models import Category, Collection, Game, GameType, Mechanic, Person, User
-from ...utils import format_from_path, load_recommender
+from ...utils import (
+    SQLiteBulkLoad,
+    fingerprint,
+    format_from_path,
+    iter_jl,
+    load_recommender,
+    normalize_user_name,
+    peak_memory_str,
+)
 
 LOGGER = logging.getLogger(__name__)
 VALUE_ID_REGEX = re.compile(r"^(.*?)(:(\d+))?$")
 LINK_ID_REGEX = re.compile(r"^([a-z]+):(.+)$")
+# recommender output columns and the game fields they are written to
+REC_COLUMNS = {"rank": "rec_rank", "score": "rec_rating", "stars": "rec_stars"}
+COLLECTION_COLUMNS = ("game", "user", "rating", "owned", "wishlist", "play_count")
 
 
 def _load_json(path):
@@ -30,53 +51,122 @@ def _load_json(path):
         yield from json.load(json_file)
 
 
-def _load_jl(path):
-    LOGGER.info("loading JSON lines from <%s>...", path)
-    with open(path, "r") as json_file:
-        for line in json_file:
-            yield json.loads(line)
-
-
-def _load(*paths, in_format=None):
+def _load(*paths, in_format=None, fields=None, jobs=1, cache=False):
     for path in paths:
         file_format = in_format or format_from_path(path)
-        if file_format in ("jl", "jsonl"):
-            yield from _load_jl(path)
+        if file_format in ("jl", "jsonl") and cache:
+            yield from iter_records(path, columns=fields, jobs=jobs)
+        elif file_format in ("jl", "jsonl"):
+            yield from iter_jl(path, fields=fields, jobs=jobs)
         else:
             yield from _load_json(path)
 
 
-def _rating_data(
-    recommender_path=getattr(settings, "RECOMMENDER_PATH", None), pk_field="bgg_id"
+def _rating_frame(
+    recommender_path=getattr(settings, "RECOMMENDER_PATH", None),
+    pk_field="bgg_id",
+    columns=REC_COLUMNS,
 ):
+    """Recommender scores as a DataFrame with the primary key column followed
+    by the rec_* columns, one row per game."""
+
     recommender = load_recommender(recommender_path, "bgg")
 
     if not recommender:
-        return {}
+        return None
 
-    count = -1
     recommendations = recommender.recommend(
         star_percentiles=getattr(settings, "STAR_PERCENTILES", None)
     )
-    result = {}
 
-    for count, game in enumerate(recommendations):
-        if count and count % 1000 == 0:
-            LOGGER.info("processed %d items so far", count)
+    # turicreate SFrame or pandas DataFrame
+    column_names = getattr(recommendations, "column_names", None)
+    column_names = (
+        column_names() if callable(column_names) else list(recommendations.columns)
+    )
+    selected = [column for column in (pk_field, *columns) if column in column_names]
+    frame = recommendations[selected]
+    frame = frame.to_dataframe() if hasattr(frame, "to_dataframe") else frame
+
+    frame = (
+        pd.DataFrame(frame)
+        .reindex(columns=[pk_field, *columns])
+        .rename(columns=columns)
+        .dropna(subset=[pk_field])
+        .drop_duplicates(subset=pk_field, keep="last")
+        .astype({pk_field: int})
+        .convert_dtypes()
+    )
 
-        pkey = game.get(pk_field)
-        if pkey is None:
-            continue
+    LOGGER.info("loaded %d recommendations", len(frame))
 
-        result[pkey] = {
-            "rec_rank": game.get("rank"),
-            "rec_rating": game.get("score"),
-            "rec_stars": game.get("stars"),
-        }
+    return frame
 
-    LOGGER.info("processed %d items in total", count)
 
-    return result
+def _update_rating_columns(model, frame, reset=False, batch_size=None):
+    """Write the scores of a frame from _rating_frame into the model's table
+    with a single bulk UPDATE joined on a temporary table. If reset, rows not
+    in the frame have their scores cleared. Returns the number of rows updated."""
+
+    # pylint: disable=protected-access
+    meta = model._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    pk_column = quote(meta.pk.column)
+    columns = [quote(meta.get_field(name).column) for name in frame.columns[1:]]
+    tmp_table = quote(f"tmp_{meta.db_table}_scores")
+
+    rows = (
+        frame.astype(object)
+        .where(frame.notna(), None)
+        .itertuples(index=False, name=None)
+    )
+    batches = batchify(rows, batch_size) if batch_size else (rows,)
+
+    if sqlite3.sqlite_version_info >= (3, 33):
+        update_sql = (
+            f"UPDATE {table} SET "
+            + ", ".join(f"{column} = scores.{column}" for column in columns)
+            + f" FROM {tmp_table} AS scores"
+            + f" WHERE {table}.{pk_column} = scores.{pk_column}"
+        )
+    else:
+        # no UPDATE ... FROM before SQLite 3.33
+        update_sql = (
+            f"UPDATE {table} SET ({', '.join(columns)}) = "
+            f"(SELECT {', '.join(columns)} FROM {tmp_table} AS scores "
+            f"WHERE scores.{pk_column} = {table}.{pk_column}) "
+            f"WHERE {pk_column} IN (SELECT {pk_column} FROM {tmp_table})"
+        )
+
+    with atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {tmp_table}")
+        cursor.execute(
+            f"CREATE TEMP TABLE {tmp_table} "
+            f"({pk_column} INTEGER PRIMARY KEY, {', '.join(columns)})"
+        )
+        insert_sql = (
+            f"INSERT INTO {tmp_table} VALUES "
+            f"({', '.join(['%s'] * (len(columns) + 1))})"
+        )
+        for batch in batches:
+            cursor.executemany(insert_sql, list(batch))
+
+        if reset:
+            cursor.execute(
+                f"UPDATE {table} SET "
+                + ", ".join(f"{column} = NULL" for column in columns)
+                + f" WHERE {pk_column} NOT IN (SELECT {pk_column} FROM {tmp_table})"
+            )
+            LOGGER.info("cleared scores of %d rows", cursor.rowcount)
+
+        cursor.execute(update_sql)
+        updated = cursor.rowcount
+        cursor.execute(f"DROP TABLE {tmp_table}")
+
+    LOGGER.info("updated scores of %d rows in %r", updated, model)
+
+    return updated
 
 
 def _parse_item(item, fields=None, fields_mapping=None, item_mapping=None):
@@ -151,7 +241,15 @@ def _create_from_items(
     item_mapping=None,
     add_data=None,
     batch_size=None,
+    progress=None,
 ):
+    progress = progress or NoProgress()
+    stage = model._meta.label_lower
+
+    if progress.done(stage):
+        LOGGER.info("instances of %r were created already", model)
+        return
+
     LOGGER.info("creating instances of %r", model)
 
     instances = _make_instances(
@@ -166,13 +264,59 @@ def _create_from_items(
     batches = batchify(instances, batch_size) if batch_size else (instances,)
 
     for count, batch in enumerate(batches):
+        if progress.skip(stage, count):
+            LOGGER.info("skipping batch #%d, written already", count + 1)
+            continue
         LOGGER.info("processing batch #%d...", count + 1)
-        model.objects.bulk_create(batch)
+        with progress.batch(stage, count):
+            model.objects.bulk_create(batch)
 
+    progress.finish(stage)
     LOGGER.info("done processing")
 
 
-def _create_references(model, items, foreign=None, recursive=None, batch_size=None):
+def _item_update(model, item, foreign, recursive, foreign_values=None, known_pks=()):
+    update = defaultdict(list)
+
+    for field, (fmodel, _) in foreign.items():
+        for value in filter(None, map(_parse_value_id, arg_to_iter(item.get(field)))):
+            id_ = value.get("id")
+            value = value.get("value")
+            if id_ and value:
+                if foreign_values is not None:
+                    foreign_values[fmodel][id_].add(value)
+                update[field].append(id_)
+
+    for rec_from, rec_to in recursive.items():
+        rec = {parse_int(r) for r in arg_to_iter(item.get(rec_from)) if r}
+        rec = sorted(r for r in rec if r in known_pks)
+        if rec:
+            update[rec_to] = rec
+
+    return parse_int(item.get(model._meta.pk.name)), update
+
+
+def _create_through_rows(field, pairs, batch_size=None):
+    """Bulk insert (from_id, to_id) pairs into a M2M field's through table."""
+    through = field.remote_field.through
+    from_field = f"{field.m2m_field_name()}_id"
+    to_field = f"{field.m2m_reverse_field_name()}_id"
+    LOGGER.info("creating %d rows in %r", len(pairs), through)
+    through.objects.bulk_create(
+        (through(**{from_field: a, to_field: b}) for a, b in sorted(pairs)),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def _create_references(
+    model, load_items, foreign=None, recursive=None, batch_size=None, progress=None
+):
+    """Create foreign and recursive references in two passes over the items:
+    load_items is called for each pass and should return a fresh iterable."""
+
+    progress = progress or NoProgress()
+
     foreign = foreign or {}
     foreign = {k: tuple(arg_to_iter(v)) for k, v in foreign.items()}
     foreign = {k: v for k, v in foreign.items() if len(v) == 2}
@@ -192,87 +336,383 @@ def _create_references(model, items, foreign=None, recursive=None, batch_size=No
     LOGGER.info("creating foreign references: %r", foreign)
     LOGGER.info("creating recursive references: %r", recursive)
 
+    # first pass: only collect the foreign values, which are far fewer than items
     count = -1
-    foreign_values = {f[0]: defaultdict(set) for f in foreign.values()}
-    updates = {}
-
-    for count, item in enumerate(items):
-        update = defaultdict(list)
-
-        for field, (fmodel, _) in foreign.items():
-            for value in filter(
-                None, map(_parse_value_id, arg_to_iter(item.get(field)))
-            ):
-                id_ = value.get("id")
-                value = value.get("value")
-                if id_ and value:
-                    foreign_values[fmodel][id_].add(value)
-                    update[field].append(id_)
-
-        for rec_from, rec_to in recursive.items():
-            rec = {parse_int(r) for r in arg_to_iter(item.get(rec_from)) if r}
-            rec = (
-                sorted(
-                    model.objects.filter(pk__in=rec)
-                    .values_list("pk", flat=True)
-                    .distinct()
-                )
-                if rec
-                else None
-            )
-            if rec:
-                update[rec_to] = rec
-
-        pkey = parse_int(item.get(model._meta.pk.name))
-        if pkey and any(update.values()):
-            updates[pkey] = update
+    pending = {
+        field: (fmodel, value_field)
+        for field, (fmodel, value_field) in foreign.items()
+        if not progress.done(fmodel._meta.label_lower)
+    }
+    foreign_values = {fmodel: defaultdict(set) for fmodel, _ in pending.values()}
 
-        if (count + 1) % 1000 == 0:
+    for count, item in enumerate(load_items() if pending else ()):
+        _item_update(model, item, pending, {}, foreign_values)
+        if (count + 1) % 10_000 == 0:
             LOGGER.info("processed %d items so far", count + 1)
 
-    del items, recursive
-
     LOGGER.info("processed %d items in total", count + 1)
 
-    for fmodel, value_field in frozenset(foreign.values()):
+    for fmodel, value_field in frozenset(pending.values()):
         id_field = fmodel._meta.pk.name
         LOGGER.info(
             "found %d items for model %r to create", len(foreign_values[fmodel]), fmodel
         )
         values = (
-            {id_field: k, value_field: take_first(v)}
+            {id_field: k, value_field: min(v)}
             for k, v in foreign_values[fmodel].items()
             if k and v
         )
-        _create_from_items(model=fmodel, items=values, batch_size=batch_size)
+        _create_from_items(
+            model=fmodel, items=values, batch_size=batch_size, progress=progress
+        )
 
-    del foreign, foreign_values
+    del foreign_values
 
-    LOGGER.info("found %d items for model %r to update", len(updates), model)
+    # second pass: write the through table rows one batch at a time
+    known_pks = frozenset(model.objects.order_by().values_list("pk", flat=True))
+    fields = {
+        field: model._meta.get_field(field)
+        for field in chain(foreign.keys(), recursive.values())
+    }
+    items = load_items()
+    batches = batchify(items, batch_size) if batch_size else (items,)
+    total = 0
 
-    batches = (
-        batchify(updates.items(), batch_size) if batch_size else (updates.items(),)
+    for count, batch in enumerate(batches):
+        if progress.skip("references", count):
+            LOGGER.info("skipping batch #%d, written already", count + 1)
+            continue
+        LOGGER.info("processing batch #%d...", count + 1)
+        rows = defaultdict(set)
+
+        for item in batch:
+            pkey, update = _item_update(
+                model, item, foreign, recursive, known_pks=known_pks
+            )
+            if pkey not in known_pks or not any(update.values()):
+                continue
+            total += 1
+            for field, values in update.items():
+                symmetrical = fields[field].remote_field.symmetrical
+                for value in values:
+                    rows[field].add((pkey, value))
+                    if symmetrical:
+                        rows[field].add((value, pkey))
+
+        with atomic(), progress.batch("references", count):
+            for field, pairs in rows.items():
+                _create_through_rows(fields[field], pairs, batch_size)
+
+    progress.finish("references")
+    LOGGER.info("updated %d items of model %r", total, model)
+    LOGGER.info("done updating")
+
+
+def _digest(values):
+    return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=16).digest()
+
+
+def _model_fields(model, with_pk=True):
+    """Concrete fields of a model, the primary key first."""
+    # pylint: disable=protected-access
+    meta = model._meta
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    return [meta.pk] + fields if with_pk else fields
+
+
+def _prep_values(fields, values):
+    """Values as they are written to the database, so rows from the database
+    and freshly parsed instances can be compared."""
+    return tuple(
+        field.get_db_prep_save(value, connection=connection)
+        for field, value in zip(fields, values)
+    )
+
+
+def _instance_values(instance, fields):
+    return _prep_values(fields, (getattr(instance, field.attname) for field in fields))
+
+
+def _row_digests(model, fields):
+    """Digest of every row in the database by primary key."""
+    rows = (
+        model.objects.order_by()
+        .values_list(*(field.attname for field in fields))
+        .iterator()
+    )
+    result = {}
+    for row in rows:
+        values = _prep_values(fields, row)
+        result[values[0]] = _digest(values)
+    return result
+
+
+def _write_rows(model, fields, rows, upsert=False):
+    """Insert prepared rows with a single executemany; with upsert, rows with
+    an existing primary key are updated instead."""
+
+    # pylint: disable=protected-access
+    quote = connection.ops.quote_name
+    columns = [field.column for field in fields]
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} "
+        f"({', '.join(map(quote, columns))}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
     )
+    if upsert:
+        sql += f" ON CONFLICT ({quote(model._meta.pk.column)}) DO UPDATE SET " + (
+            ", ".join(
+                f"{quote(column)} = excluded.{quote(column)}"
+                for column in columns
+                if column != model._meta.pk.column
+            )
+        )
+    with atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _delete_pks(model, pks, batch_size=500):
+    """Delete by primary key, cascading like the ORM does."""
+    for batch in batchify(sorted(pks), batch_size):
+        with atomic():
+            model.objects.filter(pk__in=list(batch)).delete()
+
+
+def _update_from_items(
+    model,
+    items,
+    fields=None,
+    fields_mapping=None,
+    item_mapping=None,
+    add_data=None,
+    batch_size=None,
+    exclude_fields=(),
+):
+    """Like _create_from_items, but against an existing database: insert new
+    rows, update changed ones, and delete the ones not in the items anymore.
+    Columns in exclude_fields are neither compared nor written. Returns the
+    primary keys of all items."""
+
+    LOGGER.info("updating instances of %r", model)
+
+    instances = _make_instances(
+        model=model,
+        items=items,
+        fields=fields,
+        fields_mapping=fields_mapping,
+        item_mapping=item_mapping,
+        add_data=add_data,
+    )
+    model_fields = [
+        field for field in _model_fields(model) if field.name not in exclude_fields
+    ]
+    existing = _row_digests(model, model_fields)
+    seen = set()
+    changed = 0
+
+    batches = batchify(instances, batch_size) if batch_size else (instances,)
 
     for count, batch in enumerate(batches):
         LOGGER.info("processing batch #%d...", count + 1)
-        with atomic():
-            for pkey, update in batch:
-                try:
-                    instance = model.objects.get(pk=pkey)
-                    for field, values in update.items():
-                        getattr(instance, field).set(values)
-                    instance.save()
-                except Exception:
-                    LOGGER.exception(
-                        "an error ocurred when updating <%s> with %r", pkey, update
-                    )
+        rows = []
+        for instance in batch:
+            values = _instance_values(instance, model_fields)
+            seen.add(values[0])
+            if existing.get(values[0]) != _digest(values):
+                rows.append(values)
+        if rows:
+            changed += len(rows)
+            _write_rows(model, model_fields, rows, upsert=True)
+
+    stale = existing.keys() - seen
+    LOGGER.info(
+        "%d items of %r: %d new or changed, %d to delete",
+        len(seen),
+        model,
+        changed,
+        len(stale),
+    )
+    _delete_pks(model, stale)
+
+    return seen
+
+
+def _update_through_rows(field, pairs, batch_size=None):
+    """Apply the difference between the given (from_id, to_id) pairs and the
+    rows in a M2M field's through table."""
+
+    through = field.remote_field.through
+    from_field = f"{field.m2m_field_name()}_id"
+    to_field = f"{field.m2m_reverse_field_name()}_id"
+    existing = {
+        (from_id, to_id): pkey
+        for pkey, from_id, to_id in through.objects.values_list(
+            "pk", from_field, to_field
+        ).iterator()
+    }
+    stale = [pkey for pair, pkey in existing.items() if pair not in pairs]
+    new = pairs - existing.keys()
+
+    LOGGER.info(
+        "%r: %d rows to delete, %d rows to create", through, len(stale), len(new)
+    )
+
+    _delete_pks(through, stale)
+    _create_through_rows(field, new, batch_size)
+
+
+def _update_references(
+    model, load_items, known_pks, foreign=None, recursive=None, batch_size=None
+):
+    """Like _create_references, but only apply the changes to the foreign
+    models and through tables. Needs a single pass over the items."""
+
+    foreign = foreign or {}
+    foreign = {k: tuple(arg_to_iter(v)) for k, v in foreign.items()}
+    foreign = {k: v for k, v in foreign.items() if len(v) == 2}
+    recursive = (
+        {r: r for r in arg_to_iter(recursive)}
+        if not isinstance(recursive, dict)
+        else recursive
+    )
+
+    # pylint: disable=protected-access
+    fields = {
+        field: model._meta.get_field(field)
+        for field in chain(foreign.keys(), recursive.values())
+    }
+    foreign_values = {f[0]: defaultdict(set) for f in foreign.values()}
+    pairs = defaultdict(set)
+    count = -1
+
+    for count, item in enumerate(load_items()):
+        pkey, update = _item_update(
+            model, item, foreign, recursive, foreign_values, known_pks
+        )
+        if pkey in known_pks:
+            for field, values in update.items():
+                symmetrical = fields[field].remote_field.symmetrical
+                for value in values:
+                    pairs[field].add((pkey, value))
+                    if symmetrical:
+                        pairs[field].add((value, pkey))
+        if (count + 1) % 10_000 == 0:
+            LOGGER.info("processed %d items so far", count + 1)
+
+    LOGGER.info("processed %d items in total", count + 1)
+
+    for fmodel, value_field in frozenset(foreign.values()):
+        id_field = fmodel._meta.pk.name
+        values = (
+            {id_field: k, value_field: min(v)}
+            for k, v in foreign_values[fmodel].items()
+            if k and v
+        )
+        _update_from_items(model=fmodel, items=values, batch_size=batch_size)
+
+    del foreign_values
 
-    del batches, updates
+    for field_name, field in fields.items():
+        _update_through_rows(field, pairs.pop(field_name, set()), batch_size)
 
     LOGGER.info("done updating")
 
 
+def _collection_digests(fields):
+    """Digest of every user's collection rows, ignoring their primary keys."""
+    user_index = [field.name for field in fields].index("user")
+    rows = (
+        Collection.objects.order_by("user_id")
+        .values_list(*(field.attname for field in fields))
+        .iterator()
+    )
+    return {
+        user: _digest(sorted((_prep_values(fields, row) for row in group), key=repr))
+        for user, group in groupby(rows, key=lambda row: row[user_index])
+    }
+
+
+def _apply_collection_changes(users, desired, fields):
+    """Delete and append the rows that differ for the given users."""
+
+    existing = defaultdict(list)
+    rows = Collection.objects.filter(user__in=users).values_list(
+        "pk", *(field.attname for field in fields)
+    )
+    for pkey, *row in rows:
+        values = _prep_values(fields, row)
+        existing[values].append(pkey)
+
+    new = Counter(row for user in users for row in desired[user])
+    stale = []
+    for values, pkeys in existing.items():
+        keep = min(new[values], len(pkeys))
+        new[values] -= keep
+        stale.extend(pkeys[keep:])
+    new = list((+new).elements())
+
+    _delete_pks(Collection, stale)
+    if new:
+        _write_rows(Collection, fields, new)
+
+    return len(stale), len(new)
+
+
+def _update_collections(instances, batch_size=500):
+    """Update users and their collections from the instances created by
+    _make_secondary_instances, only touching users whose rows changed. Rows
+    are gathered per user first, so the items need not be sorted by user."""
+
+    user_fields = _model_fields(User)
+    fields = _model_fields(Collection, with_pk=False)
+    existing_users = _row_digests(User, user_fields)
+    existing = _collection_digests(fields)
+    users = {}
+    desired = defaultdict(list)
+    total = [0, 0, 0]
+    changed_users = set()
+    user_rows = []
+
+    for instance in instances:
+        if isinstance(instance, User):
+            values = _instance_values(instance, user_fields)
+            users.setdefault(values[0], values)
+        elif instance.user_id:
+            desired[instance.user_id].append(_instance_values(instance, fields))
+
+    def _flush():
+        if user_rows:
+            _write_rows(User, user_fields, user_rows, upsert=True)
+        if changed_users:
+            deleted, created = _apply_collection_changes(changed_users, desired, fields)
+            total[1] += deleted
+            total[2] += created
+        total[0] += len(changed_users)
+        user_rows.clear()
+        changed_users.clear()
+
+    for user, values in users.items():
+        if existing_users.get(user) != _digest(values):
+            user_rows.append(values)
+        rows = desired.get(user)
+        if existing.get(user) != (_digest(sorted(rows, key=repr)) if rows else None):
+            changed_users.add(user)
+        if len(changed_users) >= batch_size or len(user_rows) >= batch_size:
+            _flush()
+
+    _flush()
+
+    stale = existing_users.keys() - users.keys()
+    LOGGER.info(
+        "%d users: %d collections changed with %d rows deleted and %d rows "
+        "created, %d users to delete",
+        len(users),
+        *total,
+        len(stale),
+    )
+    _delete_pks(User, stale)
+
+
 def _make_secondary_instances(model, secondary, items, **kwargs):
     instances = _make_instances(model=model, items=items, **kwargs)
 
@@ -292,42 +732,100 @@ def _make_secondary_instances(model, secondary, items, **kwargs):
         yield from group
 
 
-def _create_secondary_instances(
-    model, secondary, items, models_order=(), batch_size=None, **kwargs
-):
-    instances = _make_secondary_instances(
-        model=model, secondary=secondary, items=items, **kwargs
+def _collection_row(item):
+    """Row tuple of a rating item in the order of COLLECTION_COLUMNS, with the
+    same mappings as Command.collection_fields_mapping and
+    Command.collection_item_mapping."""
+    return (
+        item["bgg_id"],
+        item["bgg_user_name"].lower(),
+        float(item["bgg_user_rating"]) if item.get("bgg_user_rating") else None,
+        bool(
+            item.get("bgg_user_owned")
+            or item.get("bgg_user_prev_owned")
+            or item.get("bgg_user_preordered")
+        ),
+        int(item["bgg_user_wishlist"]) if item.get("bgg_user_wishlist") else None,
+        int(item.get("bgg_user_play_count") or 0),
     )
-    del items
-    batches = batchify(instances, batch_size) if batch_size else (instances,)
-    del instances
-    models_order = tuple(arg_to_iter(models_order))
+
+
+def _fill_collections(items, add_data=None, batch_size=None, progress=None):
+    """Fill the User and Collection tables from rating items without creating
+    model instances per rating: rows are plain tuples, users are deduplicated
+    with a set (so the items need not be sorted by user), and every batch is
+    written with executemany in a single transaction."""
+
+    progress = progress or NoProgress()
+
+    if progress.done("collections"):
+        LOGGER.info("users and collections were created already")
+        return
+
+    LOGGER.info("creating users and collections")
+
+    user_fields = _model_fields(User)
+    # pylint: disable=protected-access
+    fields = [Collection._meta.get_field(name) for name in COLLECTION_COLUMNS]
+    add_data = add_data or {}
+    users = set()
+    total = 0
+    skipped = 0
+    start = timeit.default_timer()
+
+    batches = batchify(items, batch_size) if batch_size else (items,)
 
     for count, batch in enumerate(batches):
-        LOGGER.info("processing batch #%d...", count + 1)
+        user_rows = []
+        rows = []
 
-        models = defaultdict(list)
-        for instance in batch:
-            models[type(instance)].append(instance)
-        order = models_order or tuple(models.keys())
-        del batch
-
-        for mdl in order:
-            instances = models.pop(mdl, ())
-            if instances:
-                LOGGER.info("creating %d instances of %r", len(instances), mdl)
-                mdl.objects.bulk_create(instances)
-
-        if any(models.values()):
-            LOGGER.warning(
-                "some models have not been processed properly: %r", tuple(models.keys())
-            )
+        for item in batch:
+            if not item.get("bgg_user_name") or not item.get("bgg_id"):
+                skipped += 1
+                continue
 
-        del models
+            row = _collection_row(item)
+            rows.append(row)
 
-    del batches
+            if row[1] not in users:
+                users.add(row[1])
+                user_rows.append(
+                    _instance_values(_make_user(row[1], add_data), user_fields)
+                )
 
-    LOGGER.info("done processing")
+        total += len(rows)
+
+        # still parse skipped batches to know which users were written
+        if progress.skip("collections", count):
+            LOGGER.info("skipping batch #%d, written already", count + 1)
+            continue
+
+        with progress.batch("collections", count):
+            _write_rows(User, user_fields, user_rows)
+            _write_rows(Collection, fields, rows)
+
+        duration = max(timeit.default_timer() - start, 1e-6)
+        LOGGER.info(
+            "batch #%d: %d users and %d collection rows so far (%.0f rows/s)",
+            count + 1,
+            len(users),
+            total,
+            total / duration,
+        )
+
+    progress.finish("collections")
+
+    if skipped:
+        LOGGER.warning("skipped %d items without a user or game", skipped)
+
+    duration = max(timeit.default_timer() - start, 1e-6)
+    LOGGER.info(
+        "created %d users and %d collection rows in %.1f seconds (%.0f rows/s)",
+        len(users),
+        total,
+        duration,
+        total / duration,
+    )
 
 
 def _parse_link_id(string, regex=LINK_ID_REGEX):
@@ -369,8 +867,14 @@ def _parse_link_file(file, regex=LINK_ID_REGEX):
     return _parse_link_ids(data, regex)
 
 
-def _load_add_data(files, id_field, *fields, in_format=None):
-    objs = _load(*arg_to_iter(files), in_format=in_format)
+def _load_add_data(files, id_field, *fields, in_format=None, jobs=1, cache=False):
+    objs = _load(
+        *arg_to_iter(files),
+        in_format=in_format,
+        fields=(id_field,) + fields,
+        jobs=jobs,
+        cache=cache,
+    )
     result = {
         o.get(id_field): {field: o[field] for field in fields if field in o}
         for o in objs
@@ -385,6 +889,7 @@ def _make_user(name, add_data):
     name = name.lower()
     data = add_data.get(name) or {}
     data["name"] = name
+    data["name_normalized"] = normalize_user_name(name)
     return User(**data)
 
 
@@ -472,6 +977,28 @@ class Command(BaseCommand):
         ),
     }
 
+    # the only keys read from collection items
+    collection_load_fields = (
+        "bgg_id",
+        "bgg_user_name",
+        "bgg_user_owned",
+        "bgg_user_play_count",
+        "bgg_user_preordered",
+        "bgg_user_prev_owned",
+        "bgg_user_rating",
+        "bgg_user_wishlist",
+    )
+
+    bulk_load_models = (
+        Game,
+        Person,
+        GameType,
+        Category,
+        Mechanic,
+        User,
+        Collection,
+    )
+
     linked_sites = (
         "freebase",
         "wikidata",
@@ -483,7 +1010,7 @@ class Command(BaseCommand):
     )
 
     def add_arguments(self, parser):
-        parser.add_argument("paths", nargs="+", help="game file(s) to be processed")
+        parser.add_argument("paths", nargs="*", help="game file(s) to be processed")
         parser.add_argument(
             "--collection-paths",
             "-c",
@@ -510,6 +1037,41 @@ class Command(BaseCommand):
             help="path to recommender model",
         )
         parser.add_argument("--links", "-l", help="links JSON file location")
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            help="number of processes decoding JSON lines (0: one per CPU)",
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="read the JSON lines files through their columnar cache "
+            "(only pays off if it is fresh and queried repeatedly, see benchmarkjl)",
+        )
+        parser.add_argument(
+            "--incremental",
+            "-i",
+            action="store_true",
+            help="update an existing database in place, only writing the changes",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="resume an interrupted load after its last written batch",
+        )
+        parser.add_argument(
+            "--rec-only",
+            action="store_true",
+            help="only refresh the recommender scores of the games in the database",
+        )
+        parser.add_argument(
+            "--bulk-load",
+            action="store_true",
+            help="speed up the load with SQLite bulk load settings, "
+            "dropping and rebuilding secondary indexes",
+        )
 
     def handle(self, *args, **kwargs):
         logging.basicConfig(
@@ -520,11 +1082,27 @@ class Command(BaseCommand):
 
         LOGGER.info(kwargs)
 
-        items = tuple(_load(*kwargs["paths"]))
         # pylint: disable=no-member
-        add_data = _rating_data(
+        rating_frame = _rating_frame(
             recommender_path=kwargs["recommender"], pk_field=Game._meta.pk.name
         )
+
+        if kwargs["rec_only"]:
+            if rating_frame is None:
+                raise CommandError("unable to load a recommender model")
+            _update_rating_columns(
+                model=Game, frame=rating_frame, reset=True, batch_size=kwargs["batch"]
+            )
+            LOGGER.info("done refreshing the recommender scores")
+            return
+
+        if not kwargs["paths"]:
+            raise CommandError("no game files given")
+
+        jobs = os.cpu_count() if kwargs["jobs"] == 0 else kwargs["jobs"]
+        # re-read the games lazily in every pass instead of holding them in memory
+        cache = kwargs["cache"]
+        load_games = partial(_load, *kwargs["paths"], jobs=jobs, cache=cache)
         game_item_mapping = dict(self.game_item_mapping or {})
 
         if kwargs["links"] and self.linked_sites:
@@ -538,50 +1116,136 @@ class Command(BaseCommand):
                     _find_links, site=site, links=links
                 )
 
-        _create_from_items(
-            model=Game,
-            items=items,
-            fields=self.game_fields,
-            fields_mapping=self.game_fields_mapping,
-            item_mapping=game_item_mapping,
-            add_data=add_data,
-            batch_size=kwargs["batch"],
+        incremental = kwargs["incremental"]
+        if incremental and kwargs["bulk_load"]:
+            LOGGER.warning("ignoring bulk load settings for an incremental update")
+
+        bulk_load = (
+            SQLiteBulkLoad(models=self.bulk_load_models, logger=LOGGER)
+            if kwargs["bulk_load"] and not incremental
+            else nullcontext()
         )
 
-        del add_data
+        if incremental:
+            # only writes the changes anyway, so a rerun resumes naturally
+            progress = NoProgress()
+        else:
+            key = fingerprint(
+                *kwargs["paths"],
+                *arg_to_iter(kwargs["collection_paths"]),
+                *arg_to_iter(kwargs["user_paths"]),
+                kwargs["links"],
+                kwargs["recommender"],
+                batch=kwargs["batch"],
+            )
+            try:
+                progress = LoadProgress(
+                    "filldb", key=key, resume=kwargs["resume"], logger=LOGGER
+                )
+            except CheckpointMismatch as exc:
+                raise CommandError(str(exc)) from exc
+
+        with bulk_load:
+            game_kwargs = {
+                "model": Game,
+                "items": load_games(),
+                "fields": self.game_fields,
+                "fields_mapping": self.game_fields_mapping,
+                "item_mapping": game_item_mapping,
+                "batch_size": kwargs["batch"],
+            }
+            if incremental:
+                # the scores are compared and written separately below
+                game_pks = _update_from_items(
+                    exclude_fields=REC_COLUMNS.values()
+                    if rating_frame is not None
+                    else (),
+                    **game_kwargs,
+                )
+            else:
+                game_pks = _create_from_items(progress=progress, **game_kwargs)
+
+            if rating_frame is not None and not progress.done("scores"):
+                _update_rating_columns(
+                    model=Game,
+                    frame=rating_frame,
+                    reset=incremental,
+                    batch_size=kwargs["batch"],
+                )
+                progress.finish("scores")
+
+            del rating_frame
+            LOGGER.info("peak memory after creating games: %s", peak_memory_str())
+
+            if incremental:
+                _update_references(
+                    model=Game,
+                    load_items=load_games,
+                    known_pks=game_pks,
+                    foreign=self.game_fields_foreign,
+                    recursive=self.game_fields_recursive,
+                    batch_size=kwargs["batch"],
+                )
+            else:
+                _create_references(
+                    model=Game,
+                    load_items=load_games,
+                    foreign=self.game_fields_foreign,
+                    recursive=self.game_fields_recursive,
+                    batch_size=kwargs["batch"],
+                    progress=progress,
+                )
+            LOGGER.info("peak memory after creating references: %s", peak_memory_str())
 
-        _create_references(
-            model=Game,
-            items=items,
-            foreign=self.game_fields_foreign,
-            recursive=self.game_fields_recursive,
-            batch_size=kwargs["batch"],
-        )
+            if kwargs["collection_paths"]:
+                game_pks = game_pks or frozenset(
+                    Game.objects.order_by().values_list("bgg_id", flat=True)
+                )
+                items = _load(
+                    *kwargs["collection_paths"],
+                    in_format=kwargs["in_format"],
+                    fields=self.collection_load_fields,
+                    jobs=jobs,
+                    cache=cache,
+                )
+                items = (item for item in items if item.get("bgg_id") in game_pks)
+
+                add_data = _load_add_data(
+                    kwargs["user_paths"],
+                    "bgg_user_name",
+                    "updated_at",
+                    in_format=kwargs["in_format"],
+                    jobs=jobs,
+                    cache=cache,
+                )
 
-        if kwargs["collection_paths"]:
-            game_pks = frozenset(item.get("bgg_id") for item in items)
-            items = _load(*kwargs["collection_paths"], in_format=kwargs["in_format"])
-            items = (item for item in items if item.get("bgg_id") in game_pks)
+                if incremental:
+                    user_function = partial(_make_user, add_data=add_data or {})
+                    _update_collections(
+                        _make_secondary_instances(
+                            model=Collection,
+                            secondary={
+                                "model": user_function,
+                                "from": "user_id",
+                                "to": "name",
+                            },
+                            items=items,
+                            fields=self.collection_fields,
+                            fields_mapping=self.collection_fields_mapping,
+                            item_mapping=self.collection_item_mapping,
+                        )
+                    )
+                else:
+                    _fill_collections(
+                        items=items,
+                        add_data=add_data,
+                        batch_size=kwargs["batch"],
+                        progress=progress,
+                    )
 
-            add_data = _load_add_data(
-                kwargs["user_paths"],
-                "bgg_user_name",
-                "updated_at",
-                in_format=kwargs["in_format"],
-            )
-            user_function = partial(_make_user, add_data=add_data) if add_data else User
-
-            _create_secondary_instances(
-                model=Collection,
-                secondary={"model": user_function, "from": "user_id", "to": "name"},
-                items=items,
-                models_order=(User, Collection),
-                fields=self.collection_fields,
-                fields_mapping=self.collection_fields_mapping,
-                item_mapping=self.collection_item_mapping,
-                batch_size=kwargs["batch"],
-            )
+                del items
 
-        del items
+        progress.clear()
 
+        LOGGER.info("peak memory: %s", peak_memory_str())
         LOGGER.info("done filling the database")
@@ -3,27 +3,72 @@
 """Parses the ranking CSVs and writes them to the database."""
 
 import csv
+import json
 import logging
 import os
 import sys
+import timeit
 
+from collections import defaultdict
+from contextlib import nullcontext
 from datetime import datetime, timezone
 from functools import lru_cache
-from itertools import groupby
+from itertools import groupby, repeat
 from pathlib import Path
 
 import pandas as pd
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Max
+from django.db.transaction import atomic
 from pytility import arg_to_iter, batchify, parse_date
 from snaptime import snap
 
-from ...models import Game, Ranking
-from ...utils import format_from_path
+from ...checkpoints import CheckpointMismatch, LoadProgress, NoProgress
+from ...models import (
+    Game,
+    Ranking,
+    RankingDate,
+    RankingFile,
+    RankingSnapshot,
+    RankingSummary,
+)
+from ...rankings import (
+    STORAGE_PACKED,
+    STORAGE_ROWS,
+    STORAGES,
+    RankingSummarizer,
+    is_packed,
+    iter_snapshots,
+    make_snapshot,
+    ranking_diff,
+    rankings_storage,
+    to_date,
+)
+from ...utils import (
+    SQLiteBulkLoad,
+    file_hash,
+    fingerprint,
+    format_from_path,
+    ordered_map,
+)
 
 csv.field_size_limit(sys.maxsize)
 
 LOGGER = logging.getLogger(__name__)
+SUMMARY_FIELDS = (
+    "game_id",
+    "best_rank",
+    "best_date",
+    "current_rank",
+    "first_date",
+    "last_date",
+    "weeks_top_10",
+    "weeks_top_100",
+)
 WEEK_DAYS = ("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT")
 
 
@@ -69,15 +114,11 @@ def parse_ranking_csv(path_file, date=None, tzinfo=timezone.utc):
     return ranking
 
 
-def parse_ranking_csvs(
-    path_dir,
-    week_day="SUN",
-    tzinfo=timezone.utc,
-    min_date=None,
-    max_date=None,
-):
-    """Parses all ranking CSV files in a directory."""
+def _group_date(date, week_day="SUN", tzinfo=timezone.utc):
+    return _following(date=date, week_day=week_day, tzinfo=tzinfo) if week_day else date
 
+
+def _ranking_files(path_dir, tzinfo=timezone.utc, min_date=None, max_date=None):
     path_dir = Path(path_dir).resolve()
     LOGGER.info("Iterating through all CSV files in <%s>...", path_dir)
 
@@ -92,22 +133,119 @@ def parse_ranking_csvs(
         LOGGER.info("Filter out files after %s", max_date)
         files = ((date, file) for date, file in files if date <= max_date)
 
-    if not week_day:
-        for date, file in files:
-            LOGGER.info("Processing rankings from %s...", date)
-            yield date, parse_ranking_csv(path_file=file, date=date)
-        return
+    return files
+
+
+def _ranking_groups(
+    path_dir,
+    week_day="SUN",
+    tzinfo=timezone.utc,
+    min_date=None,
+    max_date=None,
+    group_dates=None,
+):
+    files = _ranking_files(
+        path_dir=path_dir, tzinfo=tzinfo, min_date=min_date, max_date=max_date
+    )
+
+    groups = (
+        groupby(
+            files,
+            key=lambda pair: _following(date=pair[0], week_day=week_day, tzinfo=tzinfo),
+        )
+        if week_day
+        else ((date, ((date, file),)) for date, file in files)
+    )
+
+    for group_date, group in groups:
+        if group_dates is None or to_date(group_date) in group_dates:
+            yield group_date, tuple(group)
+
+
+def _parse_group(group_date, files):
+    LOGGER.info("Processing rankings from %s...", group_date)
+    dfs = (
+        parse_ranking_csv(path_file=path_file, date=date) for date, path_file in files
+    )
+    return pd.concat(dfs, ignore_index=True)
+
+
+def parse_ranking_csvs(
+    path_dir,
+    week_day="SUN",
+    tzinfo=timezone.utc,
+    min_date=None,
+    max_date=None,
+    group_dates=None,
+):
+    """Parses all ranking CSV files in a directory, optionally only those
+    belonging to the given (week) dates."""
 
-    for group_date, group in groupby(
-        files,
-        key=lambda pair: _following(date=pair[0], week_day=week_day, tzinfo=tzinfo),
+    for group_date, files in _ranking_groups(
+        path_dir=path_dir,
+        week_day=week_day,
+        tzinfo=tzinfo,
+        min_date=min_date,
+        max_date=max_date,
+        group_dates=group_dates,
     ):
-        LOGGER.info("Processing rankings from the week ending in %s...", group_date)
-        dfs = (
-            parse_ranking_csv(path_file=path_file, date=date)
-            for date, path_file in group
+        yield group_date, _parse_group(group_date, files)
+
+
+def _scan_files(ranking_type, path_dir, week_day="SUN", min_date=None, known=None):
+    """Compare the CSV files on disk with the files already loaded. Returns the
+    affected (week) dates, the file records to write, and the removed records."""
+
+    known = {record.path: record for record in known or ()}
+    affected = set()
+    records = []
+
+    for date, file in _ranking_files(path_dir=path_dir, min_date=min_date):
+        group_date = to_date(_group_date(date, week_day))
+        stat = file.stat()
+        record = known.pop(file.name, None)
+
+        if (
+            record is not None
+            and record.date == group_date
+            and record.size == stat.st_size
+            and record.mtime == stat.st_mtime
+        ):
+            continue
+
+        sha256 = file_hash(file)
+        if record is None or record.date != group_date or record.sha256 != sha256:
+            affected.add(group_date)
+            if record is not None:
+                affected.add(record.date)
+
+        records.append(
+            RankingFile(
+                ranking_type=ranking_type,
+                path=file.name,
+                date=group_date,
+                size=stat.st_size,
+                mtime=stat.st_mtime,
+                sha256=sha256,
+            )
         )
-        yield group_date, pd.concat(dfs, ignore_index=True)
+
+    removed = list(known.values())
+    affected.update(record.date for record in removed)
+
+    return affected, records, removed
+
+
+def _write_files(ranking_type, records, removed=(), replace_all=False):
+    # pylint: disable=no-member
+    files = RankingFile.objects.filter(ranking_type=ranking_type)
+    if replace_all:
+        files.delete()
+    else:
+        paths = [record.path for record in records] + [r.path for r in removed]
+        for batch in batchify(paths, 500):
+            files.filter(path__in=batch).delete()
+    RankingFile.objects.bulk_create(records, batch_size=10_000)
 
 
 def _last_ranking(data, date=None):
@@ -131,7 +269,29 @@ def _avg_ranking(data, date=None):
     return rankings
 
 
-def _create_instances(
+def _aggregate(data, method="last", date=None):
+    rankings = (
+        _avg_ranking(data=data, date=date)
+        if method == "mean"
+        else _last_ranking(data=data, date=date)
+        if method == "last"
+        else data
+        if method == "all"
+        else None
+    )
+    assert rankings is not None, f"illegal method <{method}>"
+    return rankings
+
+
+def _load_group(task):
+    """Parse and aggregate one (week) group of files; runs in worker processes."""
+    group_date, files, method = task
+    data = _parse_group(group_date, files)
+    num_rows = len(data)
+    return group_date, _aggregate(data, method, group_date), len(files), num_rows
+
+
+def _iter_rankings(
     path_dir,
     ranking_type=Ranking.BGG,
     filter_ids=None,
@@ -139,6 +299,9 @@ def _create_instances(
     week_day="SUN",
     min_date=None,
     max_date=None,
+    summarizer=None,
+    group_dates=None,
+    jobs=1,
 ):
     LOGGER.info(
         "Finding all rankings of type <%s> in <%s>, aggregating <%s>...",
@@ -147,30 +310,214 @@ def _create_instances(
         method,
     )
 
-    for date, data in parse_ranking_csvs(
+    groups = _ranking_groups(
         path_dir=path_dir,
         week_day=None if method == "all" else week_day,
         min_date=min_date,
         max_date=max_date,
+        group_dates=group_dates,
+    )
+    tasks = ((group_date, files, method) for group_date, files in groups)
+
+    start = timeit.default_timer()
+    total_files = total_rows = 0
+
+    for date, rankings, num_files, num_rows in ordered_map(
+        _load_group, tasks, jobs=jobs
     ):
-        rankings = (
-            _avg_ranking(data=data, date=date)
-            if method == "mean"
-            else _last_ranking(data=data, date=date)
-            if method == "last"
-            else data
-            if method == "all"
-            else None
+        total_files += num_files
+        total_rows += num_rows
+        if filter_ids is not None:
+            rankings = rankings[rankings["bgg_id"].isin(filter_ids)]
+        if summarizer is not None:
+            summarizer.update(
+                ranking_type=ranking_type,
+                date=date,
+                game_ids=rankings["bgg_id"].values,
+                ranks=rankings["rank"].values,
+            )
+        yield date, rankings
+
+    duration = max(timeit.default_timer() - start, 1e-6)
+    LOGGER.info(
+        "Processed %d files with %d rows of type <%s> in %.1f seconds "
+        "(%.1f files/s, %.1f rows/s)",
+        total_files,
+        total_rows,
+        ranking_type,
+        duration,
+        total_files / duration,
+        total_rows / duration,
+    )
+
+
+def _ranking_instances(ranking_type, rankings):
+    for item in rankings.itertuples(index=False):
+        yield Ranking(
+            game_id=item.bgg_id,
+            ranking_type=ranking_type,
+            rank=item.rank,
+            date=item.date,
         )
-        assert rankings is not None, f"illegal method <{method}>"
-        for item in rankings.itertuples(index=False):
-            if filter_ids is None or item.bgg_id in filter_ids:
-                yield Ranking(
-                    game_id=item.bgg_id,
-                    ranking_type=ranking_type,
-                    rank=item.rank,
-                    date=item.date,
-                )
+
+
+def _create_instances(ranking_type=Ranking.BGG, **kwargs):
+    for _, rankings in _iter_rankings(ranking_type=ranking_type, **kwargs):
+        yield from _ranking_instances(ranking_type, rankings)
+
+
+def _ranking_rows(ranking_type, date, game_ids, ranks):
+    """Raw (game_id, ranking_type, rank, date) rows for _insert_rankings."""
+    # pylint: disable=no-member,protected-access
+    date = Ranking._meta.get_field("date").get_db_prep_save(to_date(date), connection)
+    return zip(game_ids.tolist(), repeat(ranking_type), ranks.tolist(), repeat(date))
+
+
+def _create_rows(ranking_type=Ranking.BGG, **kwargs):
+    for date, rankings in _iter_rankings(ranking_type=ranking_type, **kwargs):
+        yield from _ranking_rows(
+            ranking_type=ranking_type,
+            date=date,
+            game_ids=rankings["bgg_id"].values,
+            ranks=rankings["rank"].values,
+        )
+
+
+def _insert_rankings(rows):
+    """Insert raw ranking rows with a single executemany, skipping the models."""
+
+    # pylint: disable=no-member,protected-access
+    meta = Ranking._meta
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(meta.get_field(field).column)
+        for field in ("game", "ranking_type", "rank", "date")
+    )
+    sql = f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s)"
+    with atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _create_snapshots(ranking_type=Ranking.BGG, **kwargs):
+    for date, rankings in _iter_rankings(ranking_type=ranking_type, **kwargs):
+        yield make_snapshot(
+            ranking_type=ranking_type,
+            date=date,
+            game_ids=rankings["bgg_id"].values,
+            ranks=rankings["rank"].values,
+        )
+
+
+def _creator(packed=False, raw=False):
+    return _create_snapshots if packed else _create_rows if raw else _create_instances
+
+
+def _write_batch(model, batch, raw=False):
+    if raw:
+        _insert_rankings(batch)
+    else:
+        model.objects.bulk_create(batch)
+
+
+def _batch_size(batch_size, packed=False):
+    # a snapshot packs thousands of rankings, so write fewer per batch
+    return max(batch_size // 1_000, 1) if packed and batch_size else batch_size
+
+
+def _convert_instances(packed=False, ranking_types=None, summarizer=None, raw=False):
+    source = STORAGE_ROWS if packed else STORAGE_PACKED
+    LOGGER.info("Converting rankings stored as <%s>...", source)
+
+    for ranking_type, date, game_ids, ranks in iter_snapshots(
+        ranking_types=ranking_types, storage=source
+    ):
+        if summarizer is not None:
+            summarizer.update(ranking_type, date, game_ids, ranks)
+        if packed:
+            yield make_snapshot(ranking_type, date, game_ids, ranks)
+            continue
+        if raw:
+            yield from _ranking_rows(ranking_type, date, game_ids, ranks)
+            continue
+        for game_id, rank in zip(game_ids.tolist(), ranks.tolist()):
+            yield Ranking(
+                game_id=game_id, ranking_type=ranking_type, rank=rank, date=date
+            )
+
+
+def _write_summaries(summarizer, batch_size=None):
+    ranking_types = tuple(summarizer.states.keys())
+    LOGGER.info("Writing ranking summaries of types %s...", ranking_types)
+
+    instances = summarizer.instances()
+    batches = batchify(instances, batch_size) if batch_size else (instances,)
+
+    with atomic():
+        # pylint: disable=no-member
+        RankingSummary.objects.filter(ranking_type__in=ranking_types).delete()
+        for batch in batches:
+            RankingSummary.objects.bulk_create(batch)
+
+
+def _write_dates(summarizer, batch_size=None):
+    LOGGER.info("Updating %d ranking dates...", len(summarizer.dates))
+
+    dates = defaultdict(list)
+    for ranking_type, date in summarizer.dates:
+        dates[ranking_type].append(date)
+
+    instances = summarizer.date_instances()
+    batches = batchify(instances, batch_size) if batch_size else (instances,)
+
+    with atomic():
+        # pylint: disable=no-member
+        for ranking_type, type_dates in dates.items():
+            for dates_batch in batchify(type_dates, 500):
+                RankingDate.objects.filter(
+                    ranking_type=ranking_type, date__in=dates_batch
+                ).delete()
+        for batch in batches:
+            RankingDate.objects.bulk_create(batch)
+
+
+def _resume_summaries(summarizer, ranking_type, affected, removed=()):
+    """Continue the summaries of a ranking type from the database if all
+    affected dates come after the latest one already summarized. Returns
+    whether that was possible, if not the summaries need a full rebuild."""
+
+    # pylint: disable=no-member
+    latest = RankingDate.objects.filter(ranking_type=ranking_type).aggregate(
+        latest=Max("date")
+    )["latest"]
+    if removed or (latest and min(to_date(date) for date in affected) <= latest):
+        return False
+
+    summaries = RankingSummary.objects.filter(ranking_type=ranking_type)
+    last_date = summaries.aggregate(last_date=Max("last_date"))["last_date"]
+    if last_date != latest:
+        return False
+
+    LOGGER.info("Continuing the summaries of type <%s> from %s", ranking_type, latest)
+    summarizer.resume(ranking_type, summaries.order_by().values_list(*SUMMARY_FIELDS))
+    return True
+
+
+def _write_movers(ranking_types, output, storage=None):
+    existing = {}
+    if os.path.isfile(output):
+        with open(output) as file:
+            existing = json.load(file)
+
+    for ranking_type in ranking_types:
+        LOGGER.info("Computing the latest movers of type <%s>...", ranking_type)
+        diff = ranking_diff(ranking_type=ranking_type, storage=storage)
+        if diff:
+            existing[ranking_type] = diff
+
+    LOGGER.info("Writing movers to <%s>...", output)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(existing, file, cls=DjangoJSONEncoder, separators=(",", ":"))
 
 
 class Command(BaseCommand):
@@ -185,6 +532,13 @@ class Command(BaseCommand):
         Ranking.CHARTS: ("charts", "all", datetime(2016, 1, 1, tzinfo=timezone.utc)),
     }
 
+    bulk_load_models = (
+        Ranking,
+        RankingSnapshot,
+        RankingDate,
+        RankingSummary,
+    )
+
     def add_arguments(self, parser):
         parser.add_argument("path", help="input directory")
         parser.add_argument(
@@ -208,22 +562,226 @@ class Command(BaseCommand):
             choices=WEEK_DAYS,
             help="anchor week day when aggregating weeks",
         )
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            help="number of processes parsing the CSVs (0: one per CPU)",
+        )
+        parser.add_argument(
+            "--storage",
+            "-s",
+            choices=STORAGES,
+            default=rankings_storage(),
+            help="write rankings as one row per game or as packed snapshots",
+        )
+        parser.add_argument(
+            "--bulk-create",
+            action="store_true",
+            help="create ranking model instances instead of inserting raw rows "
+            "(slower, only affects the rows storage)",
+        )
+        parser.add_argument(
+            "--bulk-load",
+            action="store_true",
+            help="speed up full loads with SQLite bulk load settings, "
+            "dropping and rebuilding secondary indexes",
+        )
+        parser.add_argument(
+            "--incremental",
+            "-i",
+            action="store_true",
+            help="only load new or changed files and replace the affected dates",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="resume an interrupted full load after its last written batch",
+        )
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="convert the rankings in the database to the given storage "
+            "instead of parsing the CSVs",
+        )
+        parser.add_argument(
+            "--summaries-only",
+            action="store_true",
+            help="only (re-)compute the ranking summaries and dates from the database",
+        )
+        parser.add_argument(
+            "--movers-output",
+            default=getattr(settings, "MOVERS_FILE", None),
+            help="output JSON file for the latest movers",
+        )
         parser.add_argument(
             "--dry-run", "-n", action="store_true", help="don't write to the database"
         )
 
-    def _create_all_instances(self, path, filter_ids=None, week_day="SUN", types=None):
+    def _create_all_instances(
+        self,
+        path,
+        filter_ids=None,
+        week_day="SUN",
+        types=None,
+        summarizer=None,
+        packed=False,
+        raw=False,
+        jobs=1,
+    ):
         types = frozenset(arg_to_iter(types))
+        create = _creator(packed=packed, raw=raw)
         for ranking_type, (sub_dir, method, min_date) in self.ranking_types.items():
             if not types or ranking_type in types:
-                yield from _create_instances(
+                yield from create(
                     path_dir=os.path.join(path, sub_dir),
                     ranking_type=ranking_type,
                     filter_ids=filter_ids,
                     method=method,
                     week_day=week_day,
                     min_date=min_date,
+                    summarizer=summarizer,
+                    jobs=jobs,
+                )
+
+    def _type_dirs(self, path, types=None, week_day="SUN"):
+        types = frozenset(arg_to_iter(types))
+        for ranking_type, (sub_dir, method, min_date) in self.ranking_types.items():
+            if not types or ranking_type in types:
+                yield (
+                    ranking_type,
+                    os.path.join(path, sub_dir),
+                    None if method == "all" else week_day,
+                    min_date,
+                )
+
+    def _rebuild_summaries(
+        self,
+        types=None,
+        storage=None,
+        batch_size=None,
+        dry_run=False,
+        movers_output=None,
+    ):
+        summarizer = RankingSummarizer()
+        for ranking_type, date, game_ids, ranks in iter_snapshots(
+            ranking_types=types, storage=storage
+        ):
+            summarizer.update(ranking_type, date, game_ids, ranks)
+
+        if dry_run:
+            return
+
+        _write_summaries(summarizer=summarizer, batch_size=batch_size)
+        _write_dates(summarizer=summarizer, batch_size=batch_size)
+        if movers_output:
+            _write_movers(
+                ranking_types=summarizer.states.keys(),
+                output=movers_output,
+                storage=storage,
+            )
+
+    def _handle_incremental(
+        self,
+        path,
+        types=None,
+        week_day="SUN",
+        storage=None,
+        batch_size=None,
+        dry_run=False,
+        movers_output=None,
+        raw=True,
+        jobs=1,
+    ):
+        # pylint: disable=no-member
+        game_ids = frozenset(Game.objects.order_by().values_list("bgg_id", flat=True))
+        packed = is_packed(storage)
+        raw = raw and not packed
+        model = RankingSnapshot if packed else Ranking
+        create = _creator(packed=packed, raw=raw)
+        write_batch_size = _batch_size(batch_size, packed)
+        summarizer = RankingSummarizer()
+        changed_types = []
+        rebuild_types = []
+
+        for ranking_type, path_dir, type_week_day, min_date in self._type_dirs(
+            path=path, types=types, week_day=week_day
+        ):
+            affected, records, removed = _scan_files(
+                ranking_type=ranking_type,
+                path_dir=path_dir,
+                week_day=type_week_day,
+                min_date=min_date,
+                known=RankingFile.objects.filter(ranking_type=ranking_type),
+            )
+
+            if not affected:
+                LOGGER.info("No new or changed files of type <%s>", ranking_type)
+                if records and not dry_run:
+                    _write_files(ranking_type, records)
+                continue
+
+            LOGGER.info(
+                "Replacing %d dates of type <%s>...", len(affected), ranking_type
+            )
+            if not _resume_summaries(summarizer, ranking_type, affected, removed):
+                rebuild_types.append(ranking_type)
+
+            _, method, _ = self.ranking_types[ranking_type]
+            instances = create(
+                path_dir=path_dir,
+                ranking_type=ranking_type,
+                filter_ids=game_ids,
+                method=method,
+                week_day=week_day,
+                min_date=min_date,
+                group_dates=affected,
+                summarizer=summarizer if ranking_type in summarizer.states else None,
+                jobs=jobs,
+            )
+
+            if dry_run:
+                for item in instances:
+                    print(item)
+                continue
+
+            with atomic():
+                for dates in batchify(sorted(affected), 500):
+                    model.objects.filter(
+                        ranking_type=ranking_type, date__in=dates
+                    ).delete()
+                    RankingDate.objects.filter(
+                        ranking_type=ranking_type, date__in=dates
+                    ).delete()
+                batches = (
+                    batchify(instances, write_batch_size)
+                    if write_batch_size
+                    else (instances,)
                 )
+                for batch in batches:
+                    _write_batch(model, batch, raw)
+                _write_files(ranking_type, records, removed)
+
+            changed_types.append(ranking_type)
+
+        if not changed_types:
+            return
+
+        if summarizer.states:
+            _write_summaries(summarizer=summarizer, batch_size=batch_size)
+            _write_dates(summarizer=summarizer, batch_size=batch_size)
+
+        # dates before the latest one changed, so the history needs a rescan
+        if rebuild_types:
+            self._rebuild_summaries(
+                types=rebuild_types, storage=storage, batch_size=batch_size
+            )
+
+        if movers_output:
+            _write_movers(
+                ranking_types=changed_types, output=movers_output, storage=storage
+            )
 
     def handle(self, *args, **kwargs):
         logging.basicConfig(
@@ -234,24 +792,131 @@ class Command(BaseCommand):
 
         LOGGER.info(kwargs)
 
+        jobs = os.cpu_count() if kwargs["jobs"] == 0 else kwargs["jobs"]
+
+        if kwargs["summaries_only"]:
+            self._rebuild_summaries(
+                types=kwargs["types"],
+                storage=kwargs["storage"],
+                batch_size=kwargs["batch"],
+                dry_run=kwargs["dry_run"],
+                movers_output=kwargs["movers_output"],
+            )
+            LOGGER.info("Done computing the summaries.")
+            return
+
+        if kwargs["incremental"]:
+            self._handle_incremental(
+                path=kwargs["path"],
+                types=kwargs["types"],
+                week_day=kwargs["week_day"],
+                storage=kwargs["storage"],
+                batch_size=kwargs["batch"],
+                dry_run=kwargs["dry_run"],
+                movers_output=kwargs["movers_output"],
+                raw=not kwargs["bulk_create"],
+                jobs=jobs,
+            )
+            LOGGER.info("Done updating the database.")
+            return
+
         # pylint: disable=no-member
         game_ids = frozenset(Game.objects.order_by().values_list("bgg_id", flat=True))
-        instances = self._create_all_instances(
-            path=kwargs["path"],
-            filter_ids=game_ids,
-            week_day=kwargs["week_day"],
-            types=kwargs["types"],
+        packed = is_packed(kwargs["storage"])
+        raw = not packed and not kwargs["bulk_create"]
+        model = RankingSnapshot if packed else Ranking
+        summarizer = RankingSummarizer()
+        instances = (
+            _convert_instances(
+                packed=packed,
+                ranking_types=kwargs["types"],
+                summarizer=summarizer,
+                raw=raw,
+            )
+            if kwargs["convert"]
+            else self._create_all_instances(
+                path=kwargs["path"],
+                filter_ids=game_ids,
+                week_day=kwargs["week_day"],
+                types=kwargs["types"],
+                summarizer=summarizer,
+                packed=packed,
+                raw=raw,
+                jobs=jobs,
+            )
         )
-        batches = (
-            batchify(instances, kwargs["batch"]) if kwargs["batch"] else (instances,)
+        batch_size = _batch_size(kwargs["batch"], packed)
+        batches = batchify(instances, batch_size) if batch_size else (instances,)
+
+        bulk_load = (
+            SQLiteBulkLoad(models=self.bulk_load_models, logger=LOGGER)
+            if kwargs["bulk_load"] and not kwargs["dry_run"]
+            else nullcontext()
         )
 
-        for count, batch in enumerate(batches):
-            LOGGER.info("Processing batch #%d...", count + 1)
-            if kwargs["dry_run"]:
-                for item in batch:
-                    print(item)
-            else:
-                Ranking.objects.bulk_create(batch)
+        if kwargs["convert"] or kwargs["dry_run"]:
+            progress = NoProgress()
+        else:
+            key = fingerprint(
+                kwargs["path"],
+                batch=kwargs["batch"],
+                types=sorted(arg_to_iter(kwargs["types"])),
+                week_day=kwargs["week_day"],
+                storage=kwargs["storage"],
+                raw=raw,
+            )
+            try:
+                progress = LoadProgress(
+                    "fillrankingdb", key=key, resume=kwargs["resume"], logger=LOGGER
+                )
+            except CheckpointMismatch as exc:
+                raise CommandError(str(exc)) from exc
+
+        with bulk_load:
+            # skipped batches are still parsed to feed the summarizer
+            for count, batch in enumerate(batches):
+                if progress.skip("rankings", count):
+                    LOGGER.info("Skipping batch #%d, written already", count + 1)
+                    continue
+                LOGGER.info("Processing batch #%d...", count + 1)
+                if kwargs["dry_run"]:
+                    for item in batch:
+                        print(item)
+                else:
+                    with progress.batch("rankings", count):
+                        _write_batch(model, batch, raw)
+
+            progress.finish("rankings")
+
+            if not kwargs["dry_run"]:
+                _write_summaries(summarizer=summarizer, batch_size=kwargs["batch"])
+                _write_dates(summarizer=summarizer, batch_size=kwargs["batch"])
+
+        if not kwargs["convert"] and not kwargs["dry_run"]:
+            for ranking_type, path_dir, week_day, min_date in self._type_dirs(
+                path=kwargs["path"], types=kwargs["types"], week_day=kwargs["week_day"]
+            ):
+                LOGGER.info("Recording loaded files of type <%s>...", ranking_type)
+                _, records, _ = _scan_files(ranking_type, path_dir, week_day, min_date)
+                _write_files(ranking_type, records, replace_all=True)
+
+        if kwargs["convert"] and not kwargs["dry_run"]:
+            source = Ranking if packed else RankingSnapshot
+            LOGGER.info("Removing the converted rankings from <%s>...", source.__name__)
+            source_rankings = source.objects.all()
+            if kwargs["types"]:
+                source_rankings = source_rankings.filter(
+                    ranking_type__in=kwargs["types"]
+                )
+            source_rankings.delete()
+
+        if kwargs["movers_output"] and not kwargs["dry_run"]:
+            _write_movers(
+                ranking_types=summarizer.states.keys(),
+                output=kwargs["movers_output"],
+                storage=kwargs["storage"],
+            )
+
+        progress.clear()
 
         LOGGER.info("Done filling the database.")
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""Finalize the read-only production database."""
+
+import json
+import logging
+import os
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Index
+from django.db.utils import OperationalError
+
+from ...models import Collection, Game, Ranking
+from ...utils import Timer
+
+LOGGER = logging.getLogger(__name__)
+
+# (model, fields) of covering indexes for the hottest query shapes
+COVERING_INDEXES = {
+    "games_coll_user_game_cov": (
+        Collection,
+        ("user", "game", "rating", "owned", "play_count", "wishlist"),
+    ),
+    "games_rank_game_type_cov": (Ranking, ("game", "ranking_type", "date", "rank")),
+}
+
+
+def _advised_indexes(path):
+    """Indexes chosen by the indexadvisor command, see settings.INDEXES_FILE."""
+
+    if not path or not os.path.isfile(path):
+        return {}
+
+    with open(path) as file:
+        indexes = json.load(file)
+
+    return {
+        index["name"]: (apps.get_model(index["model"]), tuple(index["fields"]))
+        for index in indexes
+    }
+
+
+def _query_shapes():
+    """(description, queryset, expected index) of the hottest query shapes."""
+
+    # pylint: disable=no-member,protected-access
+    return (
+        (
+            "games in default order",
+            Game.objects.order_by(*Game._meta.ordering).values_list("bgg_id")[:100],
+            Game._meta.indexes[0].name,
+        ),
+        (
+            "collection of a user",
+            Collection.objects.filter(user="user")
+            .order_by()
+            .values_list("game", "rating", "owned"),
+            "games_coll_user_game_cov",
+        ),
+        (
+            "rankings of a game",
+            Ranking.objects.filter(game=1, ranking_type__in=(Ranking.BGG,))
+            .order_by("ranking_type", "date")
+            .values_list("ranking_type", "rank", "date"),
+            "games_rank_game_type_cov",
+        ),
+    )
+
+
+class Command(BaseCommand):
+    """Finalize the read-only production database."""
+
+    help = "Finalize the read-only production database."
+
+    connection = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="database to finalize"
+        )
+        parser.add_argument(
+            "--page-size",
+            "-p",
+            type=int,
+            help="rebuild the database with this page size (e.g., 8192)",
+        )
+        parser.add_argument(
+            "--no-indexes",
+            action="store_true",
+            help="don't create the covering and advised indexes",
+        )
+        parser.add_argument(
+            "--indexes",
+            "-i",
+            default=getattr(settings, "INDEXES_FILE", None),
+            help="JSON file with additional indexes from the indexadvisor command",
+        )
+        parser.add_argument("--report", "-r", help="output JSON file for the report")
+
+    def _execute(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def _create_indexes(self, indexes):
+        with self.connection.schema_editor() as schema_editor:
+            for name, (model, fields) in indexes.items():
+                LOGGER.info("Creating index <%s> on %s...", name, fields)
+                schema_editor.execute(
+                    f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}"
+                )
+                schema_editor.add_index(model, Index(fields=fields, name=name))
+
+    def _check_plans(self):
+        ok = True
+        for description, queryset, index in _query_shapes():
+            sql, params = queryset.query.sql_with_params()
+            plan = " / ".join(
+                row[-1] for row in self._execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            )
+            if index in plan:
+                LOGGER.info("Query <%s> uses index <%s>: %s", description, index, plan)
+            else:
+                ok = False
+                LOGGER.warning(
+                    "Query <%s> does not use index <%s>: %s", description, index, plan
+                )
+        return ok
+
+    def _sizes(self):
+        try:
+            rows = self._execute(
+                "SELECT d.name, m.type, m.tbl_name, COUNT(*), SUM(d.pgsize) "
+                "FROM dbstat d LEFT JOIN sqlite_master m ON m.name = d.name "
+                "GROUP BY d.name ORDER BY SUM(d.pgsize) DESC"
+            )
+        except OperationalError:
+            LOGGER.warning("SQLite was compiled without the dbstat table")
+            return []
+        return [
+            {
+                "name": name,
+                "type": obj_type or "table",
+                "table": table or name,
+                "pages": pages,
+                "bytes": size,
+            }
+            for name, obj_type, table, pages, size in rows
+        ]
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        self.connection = connections[kwargs["database"]]
+        if self.connection.vendor != "sqlite":
+            LOGGER.info("Nothing to finalize for <%s>", self.connection.vendor)
+            return
+
+        if not kwargs["no_indexes"]:
+            with Timer("finalize: indexes", logger=LOGGER):
+                self._create_indexes(
+                    {**COVERING_INDEXES, **_advised_indexes(kwargs["indexes"])}
+                )
+
+        if kwargs["page_size"]:
+            LOGGER.info("Rebuilding with page size %d...", kwargs["page_size"])
+            self._execute("PRAGMA journal_mode = DELETE")
+            self._execute(f"PRAGMA page_size = {int(kwargs['page_size'])}")
+
+        with Timer("finalize: vacuum", logger=LOGGER):
+            self._execute("VACUUM")
+
+        with Timer("finalize: analyze", logger=LOGGER):
+            self._execute("ANALYZE")
+            self._execute("PRAGMA optimize")
+
+        plans_ok = self._check_plans()
+
+        ((page_size,),) = self._execute("PRAGMA page_size")
+        ((page_count,),) = self._execute("PRAGMA page_count")
+        sizes = self._sizes()
+        total = page_size * page_count
+
+        LOGGER.info(
+            "Database size: %.1f MB (%d pages of %d bytes)",
+            total / 1024 / 1024,
+            page_count,
+            page_size,
+        )
+        for item in sizes:
+            LOGGER.info(
+                "%-5s %-40s %10.1f MB %5.1f%%",
+                item["type"],
+                item["name"],
+                item["bytes"] / 1024 / 1024,
+                100 * item["bytes"] / total if total else 0,
+            )
+
+        if kwargs["report"]:
+            LOGGER.info("Writing report to <%s>...", kwargs["report"])
+            os.makedirs(os.path.dirname(kwargs["report"]) or ".", exist_ok=True)
+            with open(kwargs["report"], "w") as file:
+                json.dump(
+                    {
+                        "page_size": page_size,
+                        "page_count": page_count,
+                        "bytes": total,
+                        "plans_ok": plans_ok,
+                        "objects": sizes,
+                    },
+                    file,
+                    indent=4,
+                )
+
+        LOGGER.info("Done finalizing the database.")
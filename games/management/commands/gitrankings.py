@@ -2,7 +2,6 @@
 
 """Extract rankings from Git repositories."""
 
-import json
 import logging
 import os
 import sys
@@ -16,7 +15,7 @@ from django.core.management.base import BaseCommand
 from git import Repo
 from pytility import arg_to_iter
 
-from ...utils import format_from_path
+from ...utils import format_from_path, iter_jl
 
 LOGGER = logging.getLogger(__name__)
 
@@ -26,7 +25,7 @@ def _df_from_jl(rows):
         with open(rows) as file:
             return _df_from_jl(file)
 
-    return pd.DataFrame.from_records(map(json.loads, rows))
+    return pd.DataFrame.from_records(iter_jl(rows))
 
 
 def _dfs_from_repo(repo, directories, files):
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+
+"""Replay game list requests, find slow query shapes, and propose indexes."""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import timeit
+
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Index
+from django.db.transaction import atomic, set_rollback
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+
+from ...models import Category, Game, GameType, Mechanic, Person
+from ...views import GameFilter, GameViewSet
+
+LOGGER = logging.getLogger(__name__)
+
+LIST_URL_REGEX = re.compile(r"/api/games/?\?([^\s\"']*)")
+RANGE_LOOKUPS = frozenset({"gt", "gte", "lt", "lte"})
+SHAPE_PARAMS = frozenset(GameFilter.get_filters()) | {"ordering", "search"}
+
+SYNTHETIC_REQUESTS = (
+    "min_players__lte={players}&max_players__gte={players}",
+    "max_time__lte={time}",
+    "min_players__lte={players}&max_players__gte={players}&max_time__lte={time}",
+    "min_players__lte={players}&max_time__lte={time}&category={category}",
+    "min_age__lte={age}&max_time__lte={time}",
+    "complexity__lte={complexity}",
+    "year__gte={year}",
+    "cooperative=True",
+    "game_type={game_type}",
+    "mechanic={mechanic}",
+    "designer={designer}",
+    "ordering=bgg_rank",
+    "num_votes__gte={votes}&ordering=-avg_rating",
+    "year__gte={year}&ordering=-rec_rating",
+    "",
+)
+
+
+def _parse_log(path):
+    """Query strings of game list requests in a log file, one per line; lines
+    may be either bare query strings or contain request URLs."""
+
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            match = LIST_URL_REGEX.search(line)
+            if match:
+                yield match.group(1)
+            elif "/" not in line and " " not in line:
+                yield line.lstrip("?")
+
+
+def _random_ids(model, size=100):
+    # pylint: disable=no-member
+    ids = list(model.objects.order_by().values_list("pk", flat=True)[:10_000])
+    return random.sample(ids, min(size, len(ids))) if ids else []
+
+
+def _synthetic_requests(number, seed=None):
+    random.seed(seed)
+    values = {
+        "category": _random_ids(Category),
+        "designer": _random_ids(Person),
+        "game_type": _random_ids(GameType),
+        "mechanic": _random_ids(Mechanic),
+    }
+    templates = [
+        template
+        for template in SYNTHETIC_REQUESTS
+        if all(values[key] for key in values if f"{{{key}}}" in template)
+    ]
+
+    for _ in range(number):
+        template = random.choice(templates)
+        yield template.format(
+            players=random.randint(1, 6),
+            time=random.choice((30, 45, 60, 90, 120)),
+            age=random.choice((8, 10, 12, 14)),
+            complexity=random.choice((1.5, 2, 2.5, 3, 3.5)),
+            year=random.randint(2000, 2020),
+            votes=random.choice((100, 1000, 10000)),
+            **{key: random.choice(ids) if ids else 0 for key, ids in values.items()},
+        )
+
+
+def _shape(params):
+    """A normalized query shape, i.e., the filters without their values."""
+    keys = sorted({key for key, _ in params if key in SHAPE_PARAMS} - {"ordering"})
+    ordering = next((value for key, value in params if key == "ordering"), None)
+    return "&".join(keys) + f" | ordering={ordering or 'default'}"
+
+
+def _request_sqls(query_string, factory, page_size):
+    request = Request(factory.get("/api/games/", dict(parse_qsl(query_string))))
+    view = GameViewSet(request=request, format_kwarg=None, action="list", kwargs={})
+    queryset = view.filter_queryset(view.get_queryset())
+
+    with CaptureQueriesContext(connection) as context:
+        queryset.count()
+        list(queryset[:page_size])
+
+    return [query["sql"] for query in context.captured_queries]
+
+
+def _explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def _plan_flags(plan, table):
+    flags = set()
+    for detail in plan:
+        if detail.startswith(f"SCAN {table}"):
+            flags.add("index scan" if "INDEX" in detail else "full scan")
+        if "TEMP B-TREE" in detail:
+            flags.add("temp sort")
+    return flags
+
+
+def _timing(sqls, repeat=3):
+    """Best time in seconds out of repeat runs of all the given queries."""
+    best = None
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            start = timeit.default_timer()
+            for sql in sqls:
+                cursor.execute(sql)
+                cursor.fetchall()
+            duration = timeit.default_timer() - start
+            best = duration if best is None else min(best, duration)
+    return best
+
+
+def _ordering(params):
+    ordering = next((value for key, value in params if key == "ordering"), None)
+    fields = [
+        field.strip()
+        for field in (ordering or "").split(",")
+        if field.strip().lstrip("-") in GameViewSet.ordering_fields
+    ]
+    return fields or None
+
+
+def _field_lookup(key):
+    field, _, lookup = key.partition("__")
+    return field, lookup or "exact"
+
+
+def _candidates(shape_params, ordering):
+    """Composite index candidates for a query shape: equality columns first,
+    then either the first range column, all range columns, or the ordering."""
+
+    # pylint: disable=no-member,protected-access
+    columns = {
+        field.name
+        for field in Game._meta.concrete_fields
+        if not field.many_to_many and not field.primary_key
+    }
+    equal, ranges = [], []
+    for key in shape_params:
+        field, lookup = _field_lookup(key)
+        if field not in columns:
+            continue
+        if lookup == "exact":
+            equal.append(field)
+        elif lookup in RANGE_LOOKUPS and field not in ranges:
+            ranges.append(field)
+
+    candidates = []
+    if ranges:
+        candidates.append(tuple(equal + ranges[:1]))
+        # covers the count query
+        candidates.append(tuple(equal + ranges))
+    # avoids sorting, but only after equality columns
+    candidates.append(tuple(equal + list(ordering or Game._meta.ordering)))
+
+    # single columns and the default ordering are indexed already
+    existing = {tuple(index.fields) for index in Game._meta.indexes}
+    return list(
+        dict.fromkeys(c for c in candidates if len(c) > 1 and c not in existing)
+    )
+
+
+def _make_index(fields):
+    index = Index(fields=list(fields))
+    index.set_name_with_model(Game)
+    return index
+
+
+def _try_index(index, sqls, repeat=3):
+    """Create the index in a transaction that gets rolled back, and measure
+    the queries with it. Returns the timing and whether the planner used it."""
+
+    with atomic():
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            cursor.execute(str(index.create_sql(Game, schema_editor)))
+            # pylint: disable=no-member,protected-access
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(Game._meta.db_table)}")
+        used = any(index.name in detail for sql in sqls for detail in _explain(sql))
+        timing = _timing(sqls, repeat=repeat)
+        set_rollback(True)
+
+    return timing, used
+
+
+class Command(BaseCommand):
+    """Replay game list requests, find slow query shapes, and propose indexes."""
+
+    help = "Replay game list requests, find slow query shapes, and propose indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--log",
+            "-l",
+            nargs="+",
+            help="request log file(s) with game list URLs or query strings; "
+            "replays a synthetic mix if not given",
+        )
+        parser.add_argument(
+            "--number",
+            "-n",
+            type=int,
+            default=1_000,
+            help="number of synthetic requests",
+        )
+        parser.add_argument("--seed", type=int, help="random seed")
+        parser.add_argument(
+            "--repeat", "-r", type=int, default=3, help="timing runs per query shape"
+        )
+        parser.add_argument(
+            "--min-speedup",
+            type=float,
+            default=1.5,
+            help="minimum speedup for an index to be chosen",
+        )
+        parser.add_argument(
+            "--output",
+            "-o",
+            default=getattr(settings, "INDEXES_FILE", None),
+            help="output JSON file for the chosen indexes, applied by finalizedb",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="don't write the chosen indexes"
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        query_strings = (
+            (qs for path in kwargs["log"] for qs in _parse_log(path))
+            if kwargs["log"]
+            else _synthetic_requests(kwargs["number"], kwargs["seed"])
+        )
+
+        factory = RequestFactory()
+        page_size = settings.REST_FRAMEWORK.get("PAGE_SIZE") or 25
+        # pylint: disable=no-member,protected-access
+        table = Game._meta.db_table
+
+        counts = Counter()
+        shape_sqls = defaultdict(list)
+        shape_params = {}
+
+        for query_string in query_strings:
+            params = parse_qsl(query_string)
+            shape = _shape(params)
+            counts[shape] += 1
+            shape_params.setdefault(shape, params)
+            # a few samples per shape are enough for plans and timings
+            if counts[shape] <= 10:
+                shape_sqls[shape].extend(
+                    _request_sqls(urlencode(params), factory, page_size)
+                )
+
+        LOGGER.info(
+            "Replayed %d requests with %d query shapes",
+            sum(counts.values()),
+            len(counts),
+        )
+
+        chosen = {}
+
+        for shape, count in counts.most_common():
+            sqls = shape_sqls[shape]
+            flags = set()
+            for sql in sqls:
+                flags |= _plan_flags(_explain(sql), table)
+            before = _timing(sqls, repeat=kwargs["repeat"]) / len(sqls)
+
+            LOGGER.info(
+                "Shape <%s>: %d requests, %.2f ms per query, %s",
+                shape,
+                count,
+                1000 * before,
+                ", ".join(sorted(flags)) or "index search",
+            )
+
+            if not flags:
+                continue
+
+            params = shape_params[shape]
+            best = None
+            for fields in _candidates(
+                [key for key, _ in params if key != "ordering"], _ordering(params)
+            ):
+                index = _make_index(fields)
+                timing, used = _try_index(index, sqls, repeat=kwargs["repeat"])
+                after = timing / len(sqls)
+                speedup = before / after if after else float("inf")
+                LOGGER.info(
+                    "    candidate %s: %s, %.2f ms per query (%.1fx)",
+                    fields,
+                    "used" if used else "unused",
+                    1000 * after,
+                    speedup,
+                )
+                if used and speedup >= kwargs["min_speedup"]:
+                    benefit = count * (before - after)
+                    if best is None or benefit > best[0]:
+                        best = (benefit, index, speedup)
+
+            if best is not None:
+                benefit, index, speedup = best
+                LOGGER.info(
+                    "    => index %s (%.1fx, saves %.1f ms over the log)",
+                    tuple(index.fields),
+                    speedup,
+                    1000 * benefit,
+                )
+                chosen.setdefault(index.name, index)
+
+        result = [
+            {"model": Game._meta.label, "name": name, "fields": list(index.fields)}
+            for name, index in sorted(chosen.items())
+        ]
+        LOGGER.info("Chose %d indexes", len(result))
+
+        if kwargs["dry_run"] or not kwargs["output"]:
+            print(json.dumps(result, indent=4))
+            return
+
+        LOGGER.info("Writing indexes to <%s>...", kwargs["output"])
+        os.makedirs(os.path.dirname(kwargs["output"]) or ".", exist_ok=True)
+        with open(kwargs["output"], "w") as file:
+            json.dump(result, file, indent=4)
+
+        LOGGER.info("Done.")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Precompute the top rankings history."""
+
+import json
+import logging
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ...rankings import HISTORY_TYPES, MAX_HISTORY_TOP, history_matrix
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Precompute the top rankings history."""
+
+    help = "Precompute the top rankings history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            "-o",
+            default=getattr(settings, "HISTORY_FILE", None),
+            help="output JSON file",
+        )
+        parser.add_argument(
+            "--types",
+            "-t",
+            nargs="+",
+            default=HISTORY_TYPES,
+            help="ranking types to precompute",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=MAX_HISTORY_TOP,
+            help="number of top games to precompute; smaller tops are sliced",
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        result = {}
+        for ranking_type in kwargs["types"]:
+            LOGGER.info(
+                "Computing the top %d history of type <%s>...",
+                kwargs["top"],
+                ranking_type,
+            )
+            result[ranking_type] = history_matrix(
+                ranking_type=ranking_type, top=kwargs["top"]
+            )
+
+        if not kwargs["output"] or kwargs["output"] == "-":
+            print(json.dumps(result, cls=DjangoJSONEncoder, indent=4))
+        else:
+            LOGGER.info("Writing history to <%s>...", kwargs["output"])
+            os.makedirs(os.path.dirname(kwargs["output"]) or ".", exist_ok=True)
+            with open(kwargs["output"], "w") as file:
+                json.dump(result, file, cls=DjangoJSONEncoder, separators=(",", ":"))
+
+        LOGGER.info("Done.")
@@ -2,7 +2,6 @@
 
 """Split rankings from a GameItem file into separate CSVs."""
 
-import json
 import logging
 import os
 import sys
@@ -15,15 +14,9 @@ import pandas as pd
 from django.core.management.base import BaseCommand
 from pytility import arg_to_iter, clear_list, parse_date
 
-LOGGER = logging.getLogger(__name__)
-
+from ...utils import iter_jl
 
-def _parse_json(line):
-    try:
-        return json.loads(line)
-    except Exception:
-        pass
-    return None
+LOGGER = logging.getLogger(__name__)
 
 
 def _process_row(row):
@@ -31,21 +24,22 @@ def _process_row(row):
     return row
 
 
-def _process_file(file):
+def _process_file(file, fields=None, jobs=1):
     if isinstance(file, (str, Path)):
         LOGGER.info("Loading rows from <%s>...", file)
-        with open(file) as file_obj:
-            yield from _process_file(file_obj)
+        with open(file, "rb") as file_obj:
+            yield from _process_file(file_obj, fields=fields, jobs=jobs)
         return
 
-    for row in filter(None, map(_parse_json, file)):
+    rows = iter_jl(file, fields=fields, jobs=jobs, skip_errors=True)
+    for row in filter(None, rows):
         yield _process_row(row)
 
 
-def _process_files(files):
+def _process_files(files, fields=None, jobs=1):
     for file in files:
         file = Path(file).resolve()
-        yield from _process_file(file)
+        yield from _process_file(file, fields=fields, jobs=jobs)
 
 
 def _process_df(data_frame, columns=None, required_columns=None, target_column=None):
@@ -99,6 +93,13 @@ class Command(BaseCommand):
             "--required-columns", "-r", nargs="+", default=("rank", "bgg_id")
         )
         parser.add_argument("--target-column", "-t")
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            help="number of processes decoding JSON lines (0: one per CPU)",
+        )
         parser.add_argument("--overwrite", "-W", action="store_true")
         parser.add_argument("--dry-run", "-n", action="store_true")
 
@@ -118,8 +119,23 @@ class Command(BaseCommand):
         LOGGER.info("Write results to dir <%s>", out_dir)
         out_template = os.path.join(out_dir, kwargs["out_file"])
 
+        # only decode the columns that end up in the CSVs
+        fields = clear_list(
+            (
+                *arg_to_iter(kwargs["columns"]),
+                *arg_to_iter(kwargs["required_columns"]),
+                kwargs["target_column"],
+                "published_at",
+            )
+        )
+        rows = _process_files(
+            kwargs["in_files"],
+            fields=fields,
+            jobs=os.cpu_count() if kwargs["jobs"] == 0 else kwargs["jobs"],
+        )
+
         for published_at, group in groupby(
-            _process_files(kwargs["in_files"]), key=lambda row: row.get("published_at")
+            rows, key=lambda row: row.get("published_at")
         ):
             LOGGER.info("Processing rankings from <%s>", published_at)
 
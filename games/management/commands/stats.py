@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""Precompute the default games and user stats."""
+
+import json
+import logging
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+from pytility import batchify
+
+from ...models import UserStats
+from ...stats import (
+    DEFAULT_TOP_GAMES,
+    DEFAULT_TOP_ITEMS,
+    compute_user_stats,
+    games_stats,
+    user_totals,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Precompute the default games and user stats."""
+
+    help = "Precompute the default games and user stats."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            "-o",
+            default=getattr(settings, "STATS_FILE", None),
+            help="output JSON file for games stats",
+        )
+        parser.add_argument(
+            "--batch",
+            "-b",
+            type=int,
+            default=100_000,
+            help="batch size for DB transactions",
+        )
+        parser.add_argument(
+            "--no-users", action="store_true", help="don't precompute user stats"
+        )
+        parser.add_argument(
+            "--dry-run", "-n", action="store_true", help="don't write any results"
+        )
+
+    def handle(self, *args, **kwargs):
+        logging.basicConfig(
+            stream=sys.stderr,
+            level=logging.DEBUG if kwargs["verbosity"] > 1 else logging.INFO,
+            format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+        )
+
+        LOGGER.info(kwargs)
+
+        LOGGER.info("Computing games stats...")
+        result = {
+            "top_games": DEFAULT_TOP_GAMES,
+            "top_items": DEFAULT_TOP_ITEMS,
+            "games": games_stats(
+                top_games=DEFAULT_TOP_GAMES, top_items=DEFAULT_TOP_ITEMS
+            ),
+            "user_totals": user_totals(top_games=DEFAULT_TOP_GAMES),
+        }
+
+        if not kwargs["no_users"]:
+            instances = compute_user_stats(top_games=DEFAULT_TOP_GAMES)
+            batches = (
+                batchify(instances, kwargs["batch"])
+                if kwargs["batch"]
+                else (instances,)
+            )
+
+            with atomic():
+                if not kwargs["dry_run"]:
+                    # pylint: disable=no-member
+                    UserStats.objects.all().delete()
+
+                for count, batch in enumerate(batches):
+                    LOGGER.info("Processing batch #%d...", count + 1)
+                    if kwargs["dry_run"]:
+                        for item in batch:
+                            print(item)
+                    else:
+                        UserStats.objects.bulk_create(batch)
+
+        if kwargs["dry_run"] or not kwargs["output"] or kwargs["output"] == "-":
+            print(json.dumps(result, indent=4))
+        else:
+            LOGGER.info("Writing games stats to <%s>...", kwargs["output"])
+            os.makedirs(os.path.dirname(kwargs["output"]) or ".", exist_ok=True)
+            with open(kwargs["output"], "w") as file:
+                json.dump(result, file)
+
+        LOGGER.info("Done.")
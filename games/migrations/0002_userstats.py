@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(max_length=16)),
+                ('owned', models.PositiveIntegerField(default=0)),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('rated', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='games.user')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['user', 'site'], name='games_users_user_id_f5d7f0_idx'),
+        ),
+    ]
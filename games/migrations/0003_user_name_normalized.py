@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+def normalize_user_name(name):
+    # frozen copy of games.utils.normalize_user_name
+    name = ' '.join((name or '').split())
+    return name.lower() if name else None
+
+
+def normalize_names(apps, schema_editor):
+    User = apps.get_model('games', 'User')
+    users = User.objects.filter(name_normalized__isnull=True).only('name').iterator()
+    batch = []
+    for user in users:
+        user.name_normalized = normalize_user_name(user.name)
+        batch.append(user)
+        if len(batch) >= 10000:
+            User.objects.bulk_update(batch, ['name_normalized'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['name_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0002_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+    ]
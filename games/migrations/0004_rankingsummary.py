@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_user_name_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking_type', models.CharField(choices=[('bgg', 'BoardGameGeek'), ('fac', 'Factor'), ('sim', 'Similarity'), ('cha', 'Charts')], db_index=True, default='bgg', max_length=3)),
+                ('best_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('best_date', models.DateField(blank=True, null=True)),
+                ('current_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('first_date', models.DateField(blank=True, null=True)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('weeks_top_10', models.PositiveIntegerField(default=0)),
+                ('weeks_top_100', models.PositiveIntegerField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='games.game')),
+            ],
+            options={
+                'ordering': ('game', 'ranking_type'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='rankingsummary',
+            index=models.Index(fields=['game', 'ranking_type'], name='games_ranki_game_id_56e1ce_idx'),
+        ),
+    ]
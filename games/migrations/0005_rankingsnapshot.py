@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_rankingsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking_type', models.CharField(choices=[('bgg', 'BoardGameGeek'), ('fac', 'Factor'), ('sim', 'Similarity'), ('cha', 'Charts')], default='bgg', max_length=3)),
+                ('date', models.DateField(db_index=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('game_ids', models.BinaryField()),
+                ('ranks', models.BinaryField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('ranking_type', 'date'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rankingsnapshot',
+            constraint=models.UniqueConstraint(fields=('ranking_type', 'date'), name='unique_ranking_snapshot'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_rankingsnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ranking',
+            name='game',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='games.game'),
+        ),
+        migrations.AddIndex(
+            model_name='ranking',
+            index=models.Index(fields=['game', 'ranking_type', 'date'], name='games_ranki_game_id_1b8c71_idx'),
+        ),
+    ]
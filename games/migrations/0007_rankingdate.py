@@ -0,0 +1,76 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:21
+
+from array import array
+
+from django.db import migrations, models
+
+
+def fill_ranking_dates(apps, schema_editor):
+    from django.db.models import Count, Max, Min
+
+    Ranking = apps.get_model('games', 'Ranking')
+    RankingDate = apps.get_model('games', 'RankingDate')
+    RankingSnapshot = apps.get_model('games', 'RankingSnapshot')
+
+    dates = {}
+    rows = (
+        Ranking.objects.order_by()
+        .values('ranking_type', 'date')
+        .annotate(count=Count('id'), min_rank=Min('rank'), max_rank=Max('rank'))
+    )
+    for row in rows:
+        dates[row['ranking_type'], row['date']] = (
+            row['count'], row['min_rank'], row['max_rank'])
+
+    snapshots = RankingSnapshot.objects.values_list(
+        'ranking_type', 'date', 'size', 'ranks').iterator(chunk_size=10)
+    for ranking_type, date, size, ranks in snapshots:
+        if ranks is None:
+            dates[ranking_type, date] = (size, 1 if size else None, size or None)
+        else:
+            ranks = array('i', bytes(ranks))
+            dates[ranking_type, date] = (
+                len(ranks), min(ranks, default=None), max(ranks, default=None))
+
+    RankingDate.objects.bulk_create(
+        (
+            RankingDate(
+                ranking_type=ranking_type,
+                date=date,
+                count=count,
+                min_rank=min_rank,
+                max_rank=max_rank,
+            )
+            for (ranking_type, date), (count, min_rank, max_rank) in dates.items()
+        ),
+        batch_size=10000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_ranking_game_type_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingDate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking_type', models.CharField(choices=[('bgg', 'BoardGameGeek'), ('fac', 'Factor'), ('sim', 'Similarity'), ('cha', 'Charts')], default='bgg', max_length=3)),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('min_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_rank', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('ranking_type', 'date'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rankingdate',
+            constraint=models.UniqueConstraint(fields=('ranking_type', 'date'), name='unique_ranking_date'),
+        ),
+        migrations.RunPython(fill_ranking_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0007_rankingdate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RankingFile",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ranking_type",
+                    models.CharField(
+                        choices=[
+                            ("bgg", "BoardGameGeek"),
+                            ("fac", "Factor"),
+                            ("sim", "Similarity"),
+                            ("cha", "Charts"),
+                        ],
+                        default="bgg",
+                        max_length=3,
+                    ),
+                ),
+                ("path", models.CharField(max_length=255)),
+                ("date", models.DateField()),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("mtime", models.FloatField(blank=True, null=True)),
+                ("sha256", models.CharField(max_length=64)),
+            ],
+            options={
+                "ordering": ("ranking_type", "path"),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="rankingfile",
+            constraint=models.UniqueConstraint(
+                fields=("ranking_type", "path"), name="unique_ranking_file"
+            ),
+        ),
+    ]
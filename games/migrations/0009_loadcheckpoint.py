@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0008_rankingfile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoadCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("command", models.CharField(max_length=64)),
+                ("stage", models.CharField(max_length=128)),
+                ("key", models.CharField(max_length=64)),
+                ("batches", models.PositiveIntegerField(default=0)),
+                ("done", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ("command", "stage"),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="loadcheckpoint",
+            constraint=models.UniqueConstraint(
+                fields=("command", "stage"), name="unique_load_checkpoint"
+            ),
+        ),
+    ]
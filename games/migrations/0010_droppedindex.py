@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0009_loadcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DroppedIndex",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("sql", models.TextField()),
+                ("dropped_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ("dropped_at", "name"),
+            },
+        ),
+    ]
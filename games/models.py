@@ -4,6 +4,7 @@
 
 from django.db.models import (
     CASCADE,
+    BinaryField,
     BooleanField,
     CharField,
     DateField,
@@ -17,10 +18,13 @@ from django.db.models import (
     PositiveSmallIntegerField,
     SmallIntegerField,
     TextField,
+    UniqueConstraint,
     URLField,
 )
 from django_extensions.db.fields.json import JSONField
 
+from .utils import normalize_user_name
+
 
 class Ranking(Model):
     """Ranking model."""
@@ -36,7 +40,8 @@ class Ranking(Model):
         (CHARTS, "Charts"),
     )
 
-    game = ForeignKey("Game", on_delete=CASCADE)
+    # covered by the (game, ranking_type, date) index
+    game = ForeignKey("Game", on_delete=CASCADE, db_index=False)
     ranking_type = CharField(max_length=3, choices=TYPES, default=BGG, db_index=True)
     rank = PositiveIntegerField(db_index=True)
     date = DateField(db_index=True)
@@ -45,11 +50,110 @@ class Ranking(Model):
         """Meta."""
 
         ordering = ("ranking_type", "date", "rank")
+        indexes = (Index(fields=("game", "ranking_type", "date")),)
 
     def __str__(self):
         return f"#{self.rank}: {self.game} ({self.ranking_type}, {self.date})"
 
 
+class RankingSnapshot(Model):
+    """All rankings of a given type and date, packed into arrays."""
+
+    ranking_type = CharField(max_length=3, choices=Ranking.TYPES, default=Ranking.BGG)
+    date = DateField(db_index=True)
+    size = PositiveIntegerField(default=0)
+    # little endian int32 game IDs in rank order
+    game_ids = BinaryField()
+    # little endian int32 ranks, NULL if ranks are simply 1, 2, ..., size
+    ranks = BinaryField(blank=True, null=True)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("ranking_type", "date")
+        constraints = (
+            UniqueConstraint(
+                fields=("ranking_type", "date"), name="unique_ranking_snapshot"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.ranking_type} ({self.date}): {self.size} games"
+
+
+class RankingDate(Model):
+    """Catalogue of available ranking dates per type."""
+
+    ranking_type = CharField(max_length=3, choices=Ranking.TYPES, default=Ranking.BGG)
+    date = DateField()
+    count = PositiveIntegerField(default=0)
+    min_rank = PositiveIntegerField(blank=True, null=True)
+    max_rank = PositiveIntegerField(blank=True, null=True)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("ranking_type", "date")
+        constraints = (
+            UniqueConstraint(
+                fields=("ranking_type", "date"), name="unique_ranking_date"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.ranking_type} ({self.date}): {self.count} rankings"
+
+
+class RankingFile(Model):
+    """Ranking source file that has been loaded into the database."""
+
+    ranking_type = CharField(max_length=3, choices=Ranking.TYPES, default=Ranking.BGG)
+    path = CharField(max_length=255)
+    date = DateField()
+    size = PositiveIntegerField(default=0)
+    mtime = FloatField(blank=True, null=True)
+    sha256 = CharField(max_length=64)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("ranking_type", "path")
+        constraints = (
+            UniqueConstraint(
+                fields=("ranking_type", "path"), name="unique_ranking_file"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.ranking_type}: {self.path} ({self.date})"
+
+
+class RankingSummary(Model):
+    """Summary of a game's historical rankings of a given type."""
+
+    game = ForeignKey("Game", on_delete=CASCADE)
+    ranking_type = CharField(
+        max_length=3, choices=Ranking.TYPES, default=Ranking.BGG, db_index=True
+    )
+    best_rank = PositiveIntegerField(blank=True, null=True)
+    best_date = DateField(blank=True, null=True)
+    current_rank = PositiveIntegerField(blank=True, null=True)
+    first_date = DateField(blank=True, null=True)
+    last_date = DateField(blank=True, null=True)
+    weeks_top_10 = PositiveIntegerField(default=0)
+    weeks_top_100 = PositiveIntegerField(default=0)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("game", "ranking_type")
+        indexes = (Index(fields=("game", "ranking_type")),)
+
+    def __str__(self):
+        # pylint: disable=no-member
+        return f"{self.game_id} ({self.ranking_type}): best #{self.best_rank}"
+
+
 class Game(Model):
     """ game model """
 
@@ -120,6 +224,21 @@ class Game(Model):
 
     def highest_ranking(self, ranking_type=Ranking.BGG):
         """Find the highest ever rank of the given type."""
+
+        # pylint: disable=no-member
+        summary = self.rankingsummary_set.filter(ranking_type=ranking_type).first()
+        if summary is not None:
+            return (
+                Ranking(
+                    game=self,
+                    ranking_type=ranking_type,
+                    rank=summary.best_rank,
+                    date=summary.best_date,
+                )
+                if summary.best_rank
+                else None
+            )
+
         return (
             # pylint: disable=no-member
             self.ranking_set.filter(ranking_type=ranking_type)
@@ -216,6 +335,7 @@ class User(Model):
     """ user model """
 
     name = CharField(primary_key=True, max_length=255)
+    name_normalized = CharField(max_length=255, blank=True, null=True, db_index=True)
     games = ManyToManyField(Game, through="Collection", blank=True)
     updated_at = DateTimeField(blank=True, null=True, db_index=True)
 
@@ -224,6 +344,10 @@ class User(Model):
 
         ordering = ("name",)
 
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_user_name(self.name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -247,3 +371,65 @@ class Collection(Model):
     def __str__(self):
         # pylint: disable=no-member
         return f"{self.game_id}: {self.user_id}"
+
+
+class UserStats(Model):
+    """Precomputed stats about a user's collection within the top games."""
+
+    user = ForeignKey(User, on_delete=CASCADE)
+    site = CharField(max_length=16)
+
+    owned = PositiveIntegerField(default=0)
+    played = PositiveIntegerField(default=0)
+    rated = PositiveIntegerField(default=0)
+
+    class Meta:
+        """Meta."""
+
+        indexes = (Index(fields=("user", "site")),)
+
+    def __str__(self):
+        # pylint: disable=no-member
+        return f"{self.user_id}: {self.site}"
+
+
+class LoadCheckpoint(Model):
+    """Progress of a long running load, committed together with the batches
+    it counts, so an interrupted load can resume after the last written one."""
+
+    command = CharField(max_length=64)
+    stage = CharField(max_length=128)
+    key = CharField(max_length=64)
+    batches = PositiveIntegerField(default=0)
+    done = BooleanField(default=False)
+    updated_at = DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("command", "stage")
+        constraints = (
+            UniqueConstraint(
+                fields=("command", "stage"), name="unique_load_checkpoint"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.command}: {self.stage} ({self.batches} batches)"
+
+
+class DroppedIndex(Model):
+    """Secondary index dropped for a bulk load, kept until it was rebuilt, so
+    it can be restored even if the load was interrupted (see SQLiteBulkLoad)."""
+
+    name = CharField(max_length=255, primary_key=True)
+    sql = TextField()
+    dropped_at = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("dropped_at", "name")
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,923 @@
+# -*- coding: utf-8 -*-
+
+"""Helpers to work with ranking snapshots."""
+
+import logging
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from datetime import date as date_cls, datetime
+from functools import lru_cache
+from itertools import chain, groupby
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from .models import Ranking, RankingDate, RankingSnapshot, RankingSummary
+from .utils import database_version
+
+LOGGER = logging.getLogger(__name__)
+NO_RANK = np.iinfo(np.int64).max
+NO_DATE = np.iinfo(np.int32).max
+PACKED_DTYPE = np.dtype("<i4")
+STORAGE_ROWS = "rows"
+STORAGE_PACKED = "packed"
+STORAGES = (STORAGE_ROWS, STORAGE_PACKED)
+SNAPSHOT_FIELDS = ("ranking_type", "date")
+ROW_FIELDS = ("rank", "game")
+RESOLUTIONS = ("day", "week", "month", "year")
+HISTORY_TYPES = (Ranking.BGG, Ranking.FACTOR)
+DEFAULT_HISTORY_TOP = 100
+MAX_HISTORY_TOP = 250
+DEFAULT_MOVERS_TOP = 100
+
+
+def to_date(value):
+    """Convert datetimes to dates, leave dates as they are."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date_cls) else None
+
+
+def rankings_storage():
+    """Storage mode of the ranking history, see settings.RANKINGS_STORAGE."""
+    storage = getattr(settings, "RANKINGS_STORAGE", None) or STORAGE_ROWS
+    return storage if storage in STORAGES else STORAGE_ROWS
+
+
+def is_packed(storage=None):
+    """Whether rankings are stored as packed snapshots."""
+    return (storage or rankings_storage()) == STORAGE_PACKED
+
+
+def pack_array(values):
+    """Pack integers into little endian int32 bytes."""
+    return np.asarray(values, dtype=PACKED_DTYPE).tobytes()
+
+
+def unpack_array(data):
+    """Unpack little endian int32 bytes (read-only, without copying)."""
+    return np.frombuffer(data, dtype=PACKED_DTYPE) if data is not None else None
+
+
+def make_snapshot(ranking_type, date, game_ids, ranks):
+    """Pack a ranking snapshot into a model instance."""
+
+    game_ids = np.asarray(game_ids, dtype=np.int64)
+    ranks = np.asarray(ranks, dtype=np.int64)
+    order = np.argsort(ranks, kind="stable")
+    game_ids = game_ids[order]
+    ranks = ranks[order]
+    dense = np.array_equal(ranks, np.arange(1, len(ranks) + 1))
+
+    return RankingSnapshot(
+        ranking_type=ranking_type,
+        date=to_date(date),
+        size=len(game_ids),
+        game_ids=pack_array(game_ids),
+        ranks=None if dense else pack_array(ranks),
+    )
+
+
+def _snapshot_arrays(game_ids, ranks, size=None):
+    game_ids = unpack_array(game_ids)
+    ranks = unpack_array(ranks)
+    if ranks is None:
+        ranks = np.arange(1, (len(game_ids) if size is None else size) + 1)
+    return game_ids, ranks
+
+
+def _iter_row_snapshots(ranking_types, date_filters, chunk_size):
+    # pylint: disable=no-member
+    queryset = Ranking.objects.order_by("ranking_type", "date", "rank")
+    if ranking_types:
+        queryset = queryset.filter(ranking_type__in=ranking_types)
+    if date_filters:
+        queryset = queryset.filter(**date_filters)
+
+    rows = queryset.values_list("ranking_type", "date", "game_id", "rank").iterator(
+        chunk_size=chunk_size
+    )
+
+    for (ranking_type, date), group in groupby(rows, key=lambda row: row[:2]):
+        data = np.array([row[2:] for row in group], dtype=np.int64)
+        yield ranking_type, date, data[:, 0], data[:, 1]
+
+
+def _iter_packed_snapshots(ranking_types, date_filters, chunk_size):
+    # pylint: disable=no-member
+    queryset = RankingSnapshot.objects.order_by("ranking_type", "date")
+    if ranking_types:
+        queryset = queryset.filter(ranking_type__in=ranking_types)
+    if date_filters:
+        queryset = queryset.filter(**date_filters)
+
+    rows = queryset.values_list(
+        "ranking_type", "date", "size", "game_ids", "ranks"
+    ).iterator(chunk_size=max(chunk_size // 10_000, 1))
+
+    for ranking_type, date, size, game_ids, ranks in rows:
+        yield (ranking_type, date) + _snapshot_arrays(game_ids, ranks, size)
+
+
+def iter_snapshots(
+    ranking_types=None,
+    date_gte=None,
+    date_lte=None,
+    chunk_size=100_000,
+    storage=None,
+    date_filters=None,
+):
+    """Iterate through ranking snapshots stored in the database, yielding
+    (ranking_type, date, game_ids, ranks) ordered by type, date and rank."""
+
+    date_filters = dict(date_filters or {})
+    if date_gte:
+        date_filters["date__gte"] = date_gte
+    if date_lte:
+        date_filters["date__lte"] = date_lte
+
+    iter_func = _iter_packed_snapshots if is_packed(storage) else _iter_row_snapshots
+    yield from iter_func(
+        ranking_types=clear_types(ranking_types),
+        date_filters=date_filters,
+        chunk_size=chunk_size,
+    )
+
+
+def clear_types(ranking_types):
+    """Remove empty values from the ranking types."""
+    return tuple(t for t in ranking_types or () if t)
+
+
+def ranking_dict(game_id, ranking_type, rank, date):
+    """Same representation as RankingSerializer."""
+    return {
+        "ranking_type": ranking_type,
+        "rank": int(rank),
+        "date": date,
+        "game": int(game_id),
+    }
+
+
+def _ranked_ranges(game_ids, ranking_types=None):
+    # pylint: disable=no-member
+    queryset = RankingSummary.objects.filter(game__in=game_ids)
+    if ranking_types:
+        queryset = queryset.filter(ranking_type__in=ranking_types)
+    ranges = {
+        ranking_type: (first_date, last_date)
+        for ranking_type, first_date, last_date in queryset.order_by()
+        .values("ranking_type")
+        .annotate(first_date=Min("first_date"), last_date=Max("last_date"))
+        .values_list("ranking_type", "first_date", "last_date")
+    }
+    for ranking_type in ranking_types or sorted(t for t, _ in Ranking.TYPES):
+        if (
+            ranking_type not in ranges
+            and not RankingSummary.objects.filter(ranking_type=ranking_type).exists()
+        ):
+            # no summaries of that type (yet), so we need to scan all snapshots
+            ranges[ranking_type] = (None, None)
+    return ranges
+
+
+def iter_game_snapshots(game_ids, ranking_types=None, date_filters=None, storage=None):
+    """Like iter_snapshots(), but only the snapshots in which the given games
+    can appear: the ranking summaries tell the date range per type in which
+    they were ranked, so the rest is never read or decoded."""
+
+    date_filters = dict(date_filters or {})
+    ranges = _ranked_ranges(game_ids, clear_types(ranking_types))
+
+    for ranking_type, (first_date, last_date) in sorted(ranges.items()):
+        filters = dict(date_filters)
+        if first_date:
+            date_gte = to_date(filters.get("date__gte"))
+            filters["date__gte"] = max(first_date, date_gte or first_date)
+        if last_date:
+            date_lte = to_date(filters.get("date__lte"))
+            filters["date__lte"] = min(last_date, date_lte or last_date)
+        if first_date and last_date and filters["date__gte"] > filters["date__lte"]:
+            continue
+        yield from iter_snapshots(
+            ranking_types=(ranking_type,), date_filters=filters, storage=storage
+        )
+
+
+def _game_rankings_packed(game_id, ranking_types=None, date_gte=None, date_lte=None):
+    date_filters = {}
+    if date_gte:
+        date_filters["date__gte"] = date_gte
+    if date_lte:
+        date_filters["date__lte"] = date_lte
+
+    for ranking_type, date, game_ids, ranks in iter_game_snapshots(
+        game_ids=(game_id,),
+        ranking_types=ranking_types,
+        date_filters=date_filters,
+        storage=STORAGE_PACKED,
+    ):
+        for pos in np.flatnonzero(game_ids == game_id):
+            yield ranking_dict(game_id, ranking_type, ranks[pos], date)
+
+
+def _game_rankings_rows(game_id, ranking_types=None, date_gte=None, date_lte=None):
+    # pylint: disable=no-member
+    queryset = Ranking.objects.filter(game=game_id)
+    if ranking_types:
+        queryset = queryset.filter(ranking_type__in=ranking_types)
+    if date_gte:
+        queryset = queryset.filter(date__gte=date_gte)
+    if date_lte:
+        queryset = queryset.filter(date__lte=date_lte)
+    # matches the (game, ranking_type, date) index
+    yield from queryset.order_by("ranking_type", "date", "rank").values(
+        "ranking_type", "rank", "date", "game"
+    )
+
+
+def _best_ranking(rankings):
+    return min(
+        rankings,
+        key=lambda ranking: (ranking["rank"], -to_date(ranking["date"]).toordinal()),
+    )
+
+
+def _bucket(date, resolution):
+    date = to_date(date)
+    if resolution == "week":
+        return date.isocalendar()[:2]
+    if resolution == "month":
+        return date.year, date.month
+    if resolution == "year":
+        return date.year
+    return date
+
+
+def downsample(rankings, resolution=None, max_points=None):
+    """Downsample rankings ordered by type and date: keep the best rank (and
+    its latest date) per ranking type and resolution bucket, and, if there are
+    still more than max_points per type, per max_points chunks of equal size."""
+
+    result = []
+
+    for _, group in groupby(rankings, key=lambda ranking: ranking["ranking_type"]):
+        group = list(group)
+
+        if resolution in RESOLUTIONS and resolution != "day":
+            group = [
+                _best_ranking(bucket)
+                for _, bucket in groupby(
+                    group, key=lambda ranking: _bucket(ranking["date"], resolution)
+                )
+            ]
+
+        if max_points and len(group) > max_points:
+            size = -(-len(group) // max_points)
+            group = [
+                _best_ranking(group[start : start + size])
+                for start in range(0, len(group), size)
+            ]
+
+        result.extend(group)
+
+    return result
+
+
+def _iter_game_rankings(
+    game_id, ranking_types=None, date_gte=None, date_lte=None, storage=None
+):
+    iter_func = _game_rankings_packed if is_packed(storage) else _game_rankings_rows
+    return iter_func(
+        game_id=game_id,
+        ranking_types=ranking_types,
+        date_gte=date_gte,
+        date_lte=date_lte,
+    )
+
+
+@lru_cache(maxsize=128)
+def _downsampled_rankings(game_id, ranking_type, resolution, storage, version):
+    # pylint: disable=unused-argument
+    # only the (small) downsampled histories are cached, one per type
+    return tuple(
+        downsample(
+            _iter_game_rankings(game_id, (ranking_type,), storage=storage),
+            resolution=resolution,
+        )
+    )
+
+
+def game_rankings(
+    game_id,
+    ranking_types=None,
+    date_gte=None,
+    date_lte=None,
+    resolution=None,
+    max_points=None,
+):
+    """All rankings of a game, optionally downsampled, see downsample()."""
+
+    ranking_types = tuple(sorted(clear_types(ranking_types)))
+    resolution = (
+        resolution if resolution in RESOLUTIONS and resolution != "day" else None
+    )
+    storage = rankings_storage()
+
+    if resolution and not date_gte and not date_lte:
+        version = database_version()
+        rankings = chain.from_iterable(
+            _downsampled_rankings(game_id, ranking_type, resolution, storage, version)
+            for ranking_type in ranking_types or sorted(t for t, _ in Ranking.TYPES)
+        )
+    else:
+        rankings = _iter_game_rankings(
+            game_id=game_id,
+            ranking_types=ranking_types,
+            date_gte=date_gte,
+            date_lte=date_lte,
+            storage=storage,
+        )
+        if resolution:
+            rankings = downsample(rankings, resolution=resolution)
+
+    if max_points and max_points > 0:
+        rankings = downsample(rankings, max_points=max_points)
+
+    return list(rankings)
+
+
+def _last_top_ids(ranking_type, top, date_filters, storage=None):
+    # pylint: disable=no-member
+    if is_packed(storage):
+        last = (
+            RankingSnapshot.objects.filter(ranking_type=ranking_type, **date_filters)
+            .order_by("-date")
+            .values_list("date", "game_ids", "ranks", "size")
+            .first()
+        )
+        if last is None:
+            return None, ()
+        last_ids, last_ranks = _snapshot_arrays(*last[1:])
+        return last[0], last_ids[last_ranks <= top].tolist()
+
+    queryset = Ranking.objects.filter(ranking_type=ranking_type, **date_filters)
+    last_date = queryset.filter(rank=1).dates("date", "day", order="ASC").last()
+    if last_date is None:
+        return None, ()
+    return last_date, list(
+        queryset.filter(date=last_date, rank__lte=top)
+        .order_by("rank")
+        .values_list("game_id", flat=True)
+    )
+
+
+def _history_rows(ranking_type, game_ids, date_filters, storage=None):
+    if is_packed(storage):
+        for _, date, ids, ranks in iter_snapshots(
+            ranking_types=(ranking_type,),
+            date_filters=date_filters,
+            storage=STORAGE_PACKED,
+        ):
+            for pos in np.flatnonzero(np.isin(ids, game_ids)):
+                yield int(ids[pos]), date, int(ranks[pos])
+        return
+
+    # pylint: disable=no-member
+    yield from (
+        Ranking.objects.filter(
+            ranking_type=ranking_type, game__in=game_ids, **date_filters
+        )
+        .order_by("date", "rank")
+        .values_list("game_id", "date", "rank")
+        .iterator()
+    )
+
+
+def history_matrix(
+    ranking_type, top=DEFAULT_HISTORY_TOP, date_gte=None, date_lte=None, storage=None
+):
+    """History of the top games (as of the last available date) as a vector of
+    dates, a vector of game IDs and a matrix with a row of ranks per game
+    (None where a game was unranked)."""
+
+    date_filters = {}
+    if date_gte:
+        date_filters["date__gte"] = date_gte
+    if date_lte:
+        date_filters["date__lte"] = date_lte
+
+    last_date, game_ids = _last_top_ids(ranking_type, top, date_filters, storage)
+    rows = list(_history_rows(ranking_type, game_ids, date_filters, storage))
+    dates = sorted({to_date(date) for _, date, _ in rows})
+    game_index = {game_id: pos for pos, game_id in enumerate(game_ids)}
+    date_index = {date: pos for pos, date in enumerate(dates)}
+
+    ranks = [[None] * len(dates) for _ in game_ids]
+    for game_id, date, rank in rows:
+        ranks[game_index[game_id]][date_index[to_date(date)]] = rank
+
+    return {
+        "ranking_type": ranking_type,
+        "top": top,
+        "last_date": to_date(last_date),
+        "dates": dates,
+        "games": game_ids,
+        "ranks": ranks,
+    }
+
+
+def slice_history(history, top=None, date_gte=None, date_lte=None):
+    """Restrict a (precomputed) history matrix to fewer games or dates. Returns
+    None if the history does not cover the request."""
+
+    last_date = _date_str(history.get("last_date"))
+    if (
+        (top is not None and top > history["top"])
+        or not last_date
+        or (date_lte and _date_str(date_lte) < last_date)
+    ):
+        return None
+
+    dates = [_date_str(date) for date in history["dates"]]
+    lower = bisect_left(dates, _date_str(date_gte)) if date_gte else 0
+    upper = bisect_right(dates, _date_str(date_lte)) if date_lte else len(dates)
+
+    games = history["games"]
+    ranks = history["ranks"]
+    if top is not None:
+        last_pos = bisect_left(dates, last_date)
+        keep = [
+            pos
+            for pos, row in enumerate(ranks)
+            if last_pos < len(row)
+            and row[last_pos] is not None
+            and row[last_pos] <= top
+        ]
+        games = [games[pos] for pos in keep]
+        ranks = [ranks[pos] for pos in keep]
+
+    return {
+        "ranking_type": history["ranking_type"],
+        "top": history["top"] if top is None else top,
+        "last_date": history["last_date"],
+        "dates": history["dates"][lower:upper],
+        "games": games,
+        "ranks": [row[lower:upper] for row in ranks],
+    }
+
+
+def _date_str(value):
+    if isinstance(value, str):
+        return value[:10]
+    value = to_date(value)
+    return value.isoformat() if value else None
+
+
+def expand_history(history):
+    """Rankings per game in the same representation as RankingSerializer."""
+    ranking_type = history["ranking_type"]
+    for game_id, row in zip(history["games"], history["ranks"]):
+        yield game_id, [
+            ranking_dict(game_id, ranking_type, rank, date)
+            for date, rank in zip(history["dates"], row)
+            if rank is not None
+        ]
+
+
+def latest_dates(ranking_type, before=None, count=2):
+    """Latest available dates of a ranking type, most recent first."""
+    # pylint: disable=no-member
+    queryset = RankingDate.objects.filter(ranking_type=ranking_type)
+    if before:
+        queryset = queryset.filter(date__lt=to_date(before))
+    return list(queryset.order_by("-date").values_list("date", flat=True)[:count])
+
+
+def _best_ranks(game_ids, ranks):
+    # worst ranks first, so the best rank of duplicates is written last
+    order = np.argsort(-ranks, kind="stable")
+    return dict(zip(game_ids[order].tolist(), ranks[order].tolist()))
+
+
+def _diff_row(game_id, rank, previous_rank):
+    return {
+        "game": game_id,
+        "rank": rank,
+        "previous_rank": previous_rank,
+        "change": previous_rank - rank
+        if rank is not None and previous_rank is not None
+        else None,
+    }
+
+
+@lru_cache(maxsize=256)
+def _ranking_diff(ranking_type, date, previous, top, storage, version):
+    # pylint: disable=too-many-arguments,unused-argument
+    snapshots = {
+        to_date(snapshot_date): _best_ranks(game_ids, ranks)
+        for _, snapshot_date, game_ids, ranks in iter_snapshots(
+            ranking_types=(ranking_type,),
+            date_filters={"date__in": (date, previous)},
+            storage=storage,
+        )
+    }
+    current = snapshots.get(date) or {}
+    before = snapshots.get(previous) or {}
+
+    in_top = {game_id for game_id, rank in current.items() if rank <= top}
+    was_in_top = {game_id for game_id, rank in before.items() if rank <= top}
+
+    movers = sorted(
+        (
+            _diff_row(game_id, current[game_id], before[game_id])
+            for game_id in in_top & was_in_top
+            if current[game_id] != before[game_id]
+        ),
+        key=lambda row: (-row["change"], row["rank"]),
+    )
+    entries = sorted(
+        (
+            _diff_row(game_id, current[game_id], before.get(game_id))
+            for game_id in in_top - was_in_top
+        ),
+        key=lambda row: row["rank"],
+    )
+    exits = sorted(
+        (
+            _diff_row(game_id, current.get(game_id), before[game_id])
+            for game_id in was_in_top - in_top
+        ),
+        key=lambda row: row["previous_rank"],
+    )
+
+    return {
+        "ranking_type": ranking_type,
+        "date": date,
+        "previous": previous,
+        "top": top,
+        "movers": movers,
+        "entries": entries,
+        "exits": exits,
+    }
+
+
+def ranking_diff(
+    ranking_type, date=None, previous=None, top=DEFAULT_MOVERS_TOP, storage=None
+):
+    """Movers, entries and exits within the top ranks between two dates of a
+    ranking type, by default the latest two. None if there is nothing to diff."""
+
+    date = to_date(date) or next(iter(latest_dates(ranking_type, count=1)), None)
+    previous = to_date(previous) or next(
+        iter(latest_dates(ranking_type, before=date, count=1)), None
+    )
+    if not date or not previous:
+        return None
+    return _ranking_diff(
+        ranking_type,
+        date,
+        previous,
+        top,
+        storage or rankings_storage(),
+        database_version(),
+    )
+
+
+def _range_mask(values, filters):
+    mask = np.ones(len(values), dtype=bool)
+    for lookup, value in filters.items():
+        if lookup == "exact":
+            mask &= values == value
+        elif lookup == "gt":
+            mask &= values > value
+        elif lookup == "gte":
+            mask &= values >= value
+        elif lookup == "lt":
+            mask &= values < value
+        elif lookup == "lte":
+            mask &= values <= value
+    return mask
+
+
+def _parse_ordering(ordering):
+    return tuple(
+        (term.lstrip("-"), term.startswith("-"))
+        for term in ordering or ()
+        if term and term.lstrip("-") in SNAPSHOT_FIELDS + ROW_FIELDS
+    )
+
+
+def _sort_rows(blocks, ordering):
+    """Sort the rows of all blocks into a single block, where ranking types and
+    dates are arrays, too."""
+
+    if not blocks:
+        return []
+
+    sizes = [len(block[2]) for block in blocks]
+    types, type_codes = np.unique([block[0] for block in blocks], return_inverse=True)
+    dates = [block[1] for block in blocks]
+    columns = {
+        "ranking_type": np.repeat(type_codes, sizes),
+        "date": np.repeat([to_date(date).toordinal() for date in dates], sizes),
+        "game": np.concatenate([block[2] for block in blocks]).astype(np.int64),
+        "rank": np.concatenate([block[3] for block in blocks]).astype(np.int64),
+    }
+    order = np.lexsort(
+        [
+            -columns[field] if reverse else columns[field]
+            for field, reverse in reversed(ordering)
+        ]
+    )
+    date_values = np.empty(len(dates), dtype=object)
+    date_values[:] = dates
+
+    return [
+        (
+            types[columns["ranking_type"][order]],
+            np.repeat(date_values, sizes)[order],
+            columns["game"][order],
+            columns["rank"][order],
+        )
+    ]
+
+
+class PackedRankings(Sequence):
+    """Lazy, sliceable list of rankings from packed snapshots, ready to be
+    paginated. Rows are only materialised for the requested slice."""
+
+    def __init__(self, blocks):
+        # blocks: (ranking_type, date, game_ids, ranks) in final order
+        self.blocks = blocks
+        self.offsets = np.cumsum([0] + [len(block[2]) for block in blocks])
+
+    @classmethod
+    def from_snapshots(cls, snapshots, game_ids=None, rank_filters=None, ordering=None):
+        """Filter and sort snapshots."""
+
+        ordering = _parse_ordering(ordering) or (
+            ("ranking_type", False),
+            ("date", False),
+            ("rank", False),
+        )
+        blocks = []
+
+        for ranking_type, date, ids, ranks in snapshots:
+            mask = _range_mask(ranks, rank_filters or {})
+            if game_ids is not None:
+                mask &= np.isin(ids, game_ids)
+            if mask.any():
+                blocks.append((ranking_type, date, ids[mask], ranks[mask]))
+
+        fields = [field for field, _ in ordering]
+        first_row_field = min(
+            (fields.index(field) for field in ROW_FIELDS if field in fields),
+            default=len(fields),
+        )
+        varying = {
+            field
+            for pos, field in enumerate(SNAPSHOT_FIELDS)
+            if len({block[pos] for block in blocks}) > 1
+        }
+
+        if not varying.issubset(fields[:first_row_field]):
+            # rows of different snapshots interleave: sort all rows at once
+            return cls(_sort_rows(blocks, ordering))
+
+        for field, reverse in reversed(ordering[:first_row_field]):
+            blocks.sort(
+                key=lambda block, f=field: block[SNAPSHOT_FIELDS.index(f)],
+                reverse=reverse,
+            )
+
+        row_ordering = ordering[first_row_field:]
+        if row_ordering:
+            sorted_blocks = []
+            for ranking_type, date, ids, ranks in blocks:
+                columns = {"game": ids, "rank": ranks}
+                order = np.lexsort(
+                    [
+                        -columns[field] if reverse else columns[field]
+                        for field, reverse in reversed(row_ordering)
+                        if field in columns
+                    ]
+                )
+                sorted_blocks.append((ranking_type, date, ids[order], ranks[order]))
+            blocks = sorted_blocks
+
+        return cls(blocks)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _rows(self, start, stop):
+        first = max(int(np.searchsorted(self.offsets, start, side="right")) - 1, 0)
+        for index in range(first, len(self.blocks)):
+            offset = int(self.offsets[index])
+            if offset >= stop:
+                break
+            ranking_type, date, ids, ranks = self.blocks[index]
+            lower = max(start - offset, 0)
+            upper = min(stop - offset, len(ids))
+            for pos in range(lower, upper):
+                yield ranking_dict(
+                    ids[pos],
+                    ranking_type[pos]
+                    if isinstance(ranking_type, np.ndarray)
+                    else ranking_type,
+                    ranks[pos],
+                    date[pos] if isinstance(date, np.ndarray) else date,
+                )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            rows = list(self._rows(start, stop)) if start < stop else []
+            return rows[::step] if step != 1 else rows
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index out of range")
+        return next(self._rows(index, index + 1))
+
+
+class _SummaryState:
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, size=0):
+        self.best_rank = np.full(size, NO_RANK, dtype=np.int64)
+        self.best_date = np.zeros(size, dtype=np.int32)
+        self.first_date = np.full(size, NO_DATE, dtype=np.int32)
+        self.last_date = np.zeros(size, dtype=np.int32)
+        self.top_10 = np.zeros(size, dtype=np.int32)
+        self.top_100 = np.zeros(size, dtype=np.int32)
+        self.current_date = 0
+        self.current_ids = np.zeros(0, dtype=np.int64)
+        self.current_ranks = np.zeros(0, dtype=np.int64)
+
+    def _ensure(self, max_id):
+        size = len(self.best_rank)
+        if max_id < size:
+            return
+        grow = max(max_id + 1, 2 * size) - size
+        self.best_rank = np.append(
+            self.best_rank, np.full(grow, NO_RANK, dtype=np.int64)
+        )
+        self.best_date = np.append(self.best_date, np.zeros(grow, dtype=np.int32))
+        self.first_date = np.append(
+            self.first_date, np.full(grow, NO_DATE, dtype=np.int32)
+        )
+        self.last_date = np.append(self.last_date, np.zeros(grow, dtype=np.int32))
+        self.top_10 = np.append(self.top_10, np.zeros(grow, dtype=np.int32))
+        self.top_100 = np.append(self.top_100, np.zeros(grow, dtype=np.int32))
+
+    def update(self, day, game_ids, ranks):
+        """Add a snapshot."""
+
+        if not len(game_ids):  # pylint: disable=len-as-condition
+            return
+
+        self._ensure(int(game_ids.max()))
+
+        # highest rank first, so the best rank of duplicates is written last
+        order = np.argsort(-ranks, kind="stable")
+        game_ids = game_ids[order]
+        ranks = ranks[order]
+
+        self.first_date[game_ids] = np.minimum(self.first_date[game_ids], day)
+        self.last_date[game_ids] = np.maximum(self.last_date[game_ids], day)
+
+        best_rank = self.best_rank[game_ids]
+        better = (ranks < best_rank) | (
+            (ranks == best_rank) & (day >= self.best_date[game_ids])
+        )
+        self.best_rank[game_ids[better]] = ranks[better]
+        self.best_date[game_ids[better]] = day
+
+        np.add.at(self.top_10, game_ids[ranks <= 10], 1)
+        np.add.at(self.top_100, game_ids[ranks <= 100], 1)
+
+        if day > self.current_date:
+            self.current_date = day
+            self.current_ids = game_ids
+            self.current_ranks = ranks
+        elif day == self.current_date:
+            self.current_ids = np.concatenate((self.current_ids, game_ids))
+            self.current_ranks = np.concatenate((self.current_ranks, ranks))
+
+    @classmethod
+    def from_summaries(cls, summaries):
+        """Restore the state from (game_id, best_rank, best_date, current_rank,
+        first_date, last_date, weeks_top_10, weeks_top_100) summary rows."""
+
+        rows = list(summaries)
+        state = cls()
+        if not rows:
+            return state
+
+        columns = tuple(zip(*rows))
+        game_ids = np.array(columns[0], dtype=np.int64)
+        state._ensure(int(game_ids.max()))
+
+        def _days(dates):
+            return np.array([to_date(date).toordinal() for date in dates])
+
+        state.best_rank[game_ids] = [
+            NO_RANK if rank is None else rank for rank in columns[1]
+        ]
+        state.best_date[game_ids] = _days(columns[2])
+        state.first_date[game_ids] = _days(columns[4])
+        state.last_date[game_ids] = _days(columns[5])
+        state.top_10[game_ids] = columns[6]
+        state.top_100[game_ids] = columns[7]
+
+        # the current ranks are those of the last date of any game
+        current = np.array([rank is not None for rank in columns[3]], dtype=bool)
+        state.current_date = int(state.last_date.max())
+        state.current_ids = game_ids[current]
+        state.current_ranks = np.array(
+            [rank for rank in columns[3] if rank is not None], dtype=np.int64
+        )
+        return state
+
+    def current(self):
+        """Current rank of each game."""
+        result = np.full(len(self.best_rank), NO_RANK, dtype=np.int64)
+        order = np.argsort(-self.current_ranks, kind="stable")
+        result[self.current_ids[order]] = self.current_ranks[order]
+        return result
+
+
+class RankingSummarizer:
+    """Accumulate per game summaries from ranking snapshots."""
+
+    def __init__(self):
+        self.states = {}
+        self.dates = {}
+
+    def resume(self, ranking_type, summaries):
+        """Continue from the existing summaries of the given ranking type (see
+        _SummaryState.from_summaries), so only snapshots after their last date
+        need to be added."""
+        self.states[ranking_type] = _SummaryState.from_summaries(summaries)
+
+    def update(self, ranking_type, date, game_ids, ranks):
+        """Add a snapshot of the given ranking type."""
+        state = self.states.get(ranking_type)
+        if state is None:
+            state = self.states[ranking_type] = _SummaryState()
+        ranks = np.asarray(ranks, dtype=np.int64)
+        state.update(
+            day=to_date(date).toordinal(),
+            game_ids=np.asarray(game_ids, dtype=np.int64),
+            ranks=ranks,
+        )
+        self._update_date(ranking_type, to_date(date), ranks)
+
+    def _update_date(self, ranking_type, date, ranks):
+        count, min_rank, max_rank = self.dates.get(
+            (ranking_type, date), (0, None, None)
+        )
+        if len(ranks):  # pylint: disable=len-as-condition
+            min_rank = min(int(ranks.min()), min_rank or NO_RANK)
+            max_rank = max(int(ranks.max()), max_rank or 0)
+        self.dates[ranking_type, date] = (count + len(ranks), min_rank, max_rank)
+
+    def date_instances(self):
+        """Generate ranking date model instances."""
+        for (ranking_type, date), (count, min_rank, max_rank) in self.dates.items():
+            yield RankingDate(
+                ranking_type=ranking_type,
+                date=date,
+                count=count,
+                min_rank=min_rank,
+                max_rank=max_rank,
+            )
+
+    def instances(self):
+        """Generate summary model instances."""
+
+        for ranking_type, state in self.states.items():
+            current = state.current()
+            game_ids = np.flatnonzero(state.first_date != NO_DATE)
+            LOGGER.info(
+                "Found %d games with rankings of type <%s>", len(game_ids), ranking_type
+            )
+
+            for game_id in game_ids:
+                current_rank = current[game_id]
+                yield RankingSummary(
+                    game_id=int(game_id),
+                    ranking_type=ranking_type,
+                    best_rank=int(state.best_rank[game_id]),
+                    best_date=date_cls.fromordinal(int(state.best_date[game_id])),
+                    current_rank=int(current_rank) if current_rank != NO_RANK else None,
+                    first_date=date_cls.fromordinal(int(state.first_date[game_id])),
+                    last_date=date_cls.fromordinal(int(state.last_date[game_id])),
+                    weeks_top_10=int(state.top_10[game_id]),
+                    weeks_top_100=int(state.top_100[game_id]),
+                )
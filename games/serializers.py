@@ -20,6 +20,7 @@ from .models import (
     Mechanic,
     Person,
     Ranking,
+    RankingSummary,
     User,
 )
 
@@ -77,6 +78,16 @@ class RankingFatSerializer(ModelSerializer):
         exclude = ("id",)
 
 
+class RankingSummarySerializer(ModelSerializer):
+    """Ranking summary serializer."""
+
+    class Meta:
+        """Meta."""
+
+        model = RankingSummary
+        exclude = ("id",)
+
+
 class PersonSerializer(ModelSerializer):
     """ person serializer """
 
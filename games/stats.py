@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+""" games and user stats """
+
+import logging
+
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Count, F, Q
+
+from .models import Collection, Game, UserStats
+from .utils import database_version
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TOP_GAMES = 100
+DEFAULT_TOP_ITEMS = 10
+
+STATS_SITES = {"rg_top": "rec_rank", "bgg_top": "bgg_rank"}
+
+# stats key -> (Game M2M field, excluded IDs)
+STATS_FIELDS = {
+    "designer": ("designer", (3,)),  # exclude "(Uncredited)"
+    "artist": ("artist", (3,)),  # exclude "(Uncredited)"
+    "game_type": ("game_type", ()),
+    "category": ("category", ()),
+    "mechanic": ("mechanic", ()),
+}
+
+
+def _top_games_sql(queryset, site_rank, top_games):
+    queryset = (
+        queryset.filter(**{f"{site_rank}__isnull": False})
+        .annotate(site_rank=F(site_rank))
+        .order_by(site_rank)
+        .values_list("bgg_id", "site_rank")[:top_games]
+    )
+    sql, params = queryset.query.sql_with_params()
+    return sql, tuple(params)
+
+
+def _field_sql(key, field_name, exclude=()):
+    # pylint: disable=no-member,protected-access
+    field = Game._meta.get_field(field_name)
+    through = field.remote_field.through._meta.db_table
+    target = field.related_model._meta.db_table
+    game_column = field.m2m_column_name()
+    target_column = field.m2m_reverse_name()
+    where = (
+        f"WHERE t.{target_column} NOT IN ({', '.join(map(str, exclude))}) "
+        if exclude
+        else ""
+    )
+    return (
+        f"SELECT '{key}' AS stats_key, t.{target_column} AS item_id, o.name AS name, "
+        "COUNT(*) AS top, MIN(g.site_rank) AS best "
+        f"FROM {through} t "
+        f"JOIN top_games g ON g.bgg_id = t.{game_column} "
+        f"JOIN {target} o ON o.bgg_id = t.{target_column} "
+        f"{where}"
+        f"GROUP BY t.{target_column}, o.name"
+    )
+
+
+@lru_cache(maxsize=128)
+def _stats_from_sql(top_sql, top_params, top_items, version):
+    # pylint: disable=unused-argument
+    parts = [
+        "SELECT NULL AS stats_key, NULL AS item_id, NULL AS name, "
+        "COUNT(*) AS top, NULL AS best FROM top_games"
+    ]
+    parts.extend(
+        _field_sql(key, field_name, exclude)
+        for key, (field_name, exclude) in STATS_FIELDS.items()
+    )
+    sql = (
+        f"WITH top_games(bgg_id, site_rank) AS ({top_sql}) "
+        "SELECT stats_key, item_id, name, top, best FROM ("
+        "SELECT *, ROW_NUMBER() OVER "
+        "(PARTITION BY stats_key ORDER BY top DESC, best) AS pos "
+        f"FROM ({' UNION ALL '.join(parts)})"
+        ") WHERE pos <= %s ORDER BY stats_key, pos"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, top_params + (top_items,))
+        rows = cursor.fetchall()
+
+    total = next((top for key, _, _, top, _ in rows if key is None), 0)
+    result = {"total": total}
+    result.update({key: [] for key in STATS_FIELDS})
+
+    for key, item_id, name, top, best in rows:
+        if key is None:
+            continue
+        result[key].append(
+            {
+                "bgg_id": item_id,
+                "name": name,
+                "count": top,
+                "pct": 100 * top / total if total else 0,
+                "best": best,
+            }
+        )
+
+    return result
+
+
+def games_stats(
+    queryset=None, top_games=DEFAULT_TOP_GAMES, top_items=DEFAULT_TOP_ITEMS
+):
+    """Stats about the top games per site, one aggregated query per site."""
+
+    # pylint: disable=no-member
+    queryset = Game.objects.all() if queryset is None else queryset
+    result = {}
+
+    for site_key, site_rank in STATS_SITES.items():
+        top_sql, top_params = _top_games_sql(queryset, site_rank, top_games)
+        result[site_key] = _stats_from_sql(
+            top_sql, top_params, top_items, database_version()
+        )
+
+    return result
+
+
+@lru_cache(maxsize=32)
+def _top_total(site_rank, top_games, version):
+    # pylint: disable=no-member,unused-argument
+    return Game.objects.filter(**{f"{site_rank}__lte": top_games}).count()
+
+
+def user_totals(top_games=DEFAULT_TOP_GAMES):
+    """Number of games within the top games per site."""
+    return {
+        site_key: _top_total(site_rank, top_games, database_version())
+        for site_key, site_rank in STATS_SITES.items()
+    }
+
+
+def _empty_stats(totals):
+    return {
+        site_key: {
+            "total": totals.get(site_key) or 0,
+            "owned": 0,
+            "played": 0,
+            "rated": 0,
+        }
+        for site_key in STATS_SITES
+    }
+
+
+def _user_stats_rows(users=None, top_games=DEFAULT_TOP_GAMES):
+    """One conditional aggregation over the collections across all sites."""
+
+    in_top = reduce(
+        or_,
+        (Q(**{f"game__{rank}__lte": top_games}) for rank in STATS_SITES.values()),
+    )
+    # pylint: disable=no-member
+    queryset = Collection.objects.filter(in_top)
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+
+    annotations = {}
+    for site_key, site_rank in STATS_SITES.items():
+        site_filter = Q(**{f"game__{site_rank}__lte": top_games})
+        annotations[f"{site_key}__owned"] = Count(
+            "pk", filter=site_filter & Q(owned=True)
+        )
+        annotations[f"{site_key}__played"] = Count(
+            "pk", filter=site_filter & Q(play_count__gt=0)
+        )
+        annotations[f"{site_key}__rated"] = Count(
+            "pk", filter=site_filter & Q(rating__isnull=False)
+        )
+
+    return queryset.order_by().values("user").annotate(**annotations)
+
+
+def _parse_stats_row(row, totals):
+    result = _empty_stats(totals)
+    for key, value in row.items():
+        site_key, _, stat = key.partition("__")
+        if site_key in result and stat:
+            result[site_key][stat] = value
+    return result
+
+
+def users_stats(users, top_games=DEFAULT_TOP_GAMES):
+    """Stats about many users' collections within the top games per site."""
+
+    users = frozenset(users)
+    totals = user_totals(top_games)
+    result = {user: _empty_stats(totals) for user in users}
+
+    for row in _user_stats_rows(users=users, top_games=top_games):
+        result[row["user"]] = _parse_stats_row(row, totals)
+
+    return result
+
+
+@lru_cache(maxsize=1024)
+def _user_stats(user, top_games, version):
+    # pylint: disable=unused-argument
+    return users_stats((user,), top_games)[user]
+
+
+def user_stats(user, top_games=DEFAULT_TOP_GAMES):
+    """Stats about a user's collection within the top games per site."""
+    return _user_stats(user, top_games, database_version())
+
+
+def users_stats_precomputed(users, totals):
+    """Precomputed stats for the default top games, None if unavailable."""
+
+    if not totals:
+        return None
+
+    users = frozenset(users)
+    result = {user: _empty_stats(totals) for user in users}
+
+    # pylint: disable=no-member
+    for stats in UserStats.objects.filter(user__in=users):
+        if stats.site in result[stats.user_id]:
+            result[stats.user_id][stats.site].update(
+                owned=stats.owned, played=stats.played, rated=stats.rated
+            )
+
+    return result
+
+
+def user_stats_precomputed(user, totals):
+    """Precomputed stats for the default top games, None if unavailable."""
+    result = users_stats_precomputed((user,), totals)
+    return result[user] if result else None
+
+
+def compute_user_stats(top_games=DEFAULT_TOP_GAMES):
+    """Compute stats for all users in a single grouped query."""
+
+    LOGGER.info("Computing user stats for the top %d games...", top_games)
+
+    for row in _user_stats_rows(top_games=top_games).iterator():
+        for site_key, stats in _parse_stats_row(row, {}).items():
+            if any(stats.values()):
+                yield UserStats(
+                    user_id=row["user"],
+                    site=site_key,
+                    owned=stats["owned"],
+                    played=stats["played"],
+                    rated=stats["rated"],
+                )
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+"""Run build tasks as a dependency graph on a bounded pool of workers.
+
+Every task declares the paths it reads and writes. Two tasks whose paths
+overlap (the same path or one inside the other) keep the order they were added
+in if at least one of them writes there, all other tasks may run concurrently.
+With a single worker the tasks run in exactly the order they were added."""
+
+import logging
+import os
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from pytility import arg_to_iter
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TaskFailed(Exception):
+    """One or more tasks of the graph failed."""
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(os.fspath(path)))
+
+
+def _overlap(paths, others):
+    return any(
+        path == other
+        or path.startswith(other.rstrip(os.sep) + os.sep)
+        or other.startswith(path.rstrip(os.sep) + os.sep)
+        for path in paths
+        for other in others
+    )
+
+
+def _duration(seconds):
+    return str(timedelta(seconds=round(seconds or 0)))
+
+
+class _Task:
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+
+    def __init__(self, name, func, inputs, outputs, dependencies, **kwargs):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.dependencies = dependencies
+        self.exclusive = kwargs.get("exclusive", False)
+        self.cache = kwargs.get("cache", False)
+        self.params = kwargs.get("params")
+        self.code = kwargs.get("code") or func
+        self.ancestors = frozenset(
+            dependency.name for dependency in dependencies
+        ).union(*(dependency.ancestors for dependency in dependencies))
+        self.start = None
+        self.end = None
+        self.status = "pending"
+        self.cached = False
+        self.saved = 0
+
+    @property
+    def duration(self):
+        """Seconds the task ran for."""
+        return self.end - self.start if self.start is not None else 0
+
+
+class TaskGraph:
+    """A graph of build tasks, dependencies are derived from their paths.
+
+    graph = TaskGraph("builddb")
+    graph.add("split", split, inputs="data.jl", outputs="parts")
+    graph.add("count", count, inputs="parts", outputs="COUNT.md")
+    graph.run(jobs=4)
+
+    Exclusive tasks run while no other task does (e.g., tasks that change the
+    working directory). Use after to add explicit dependencies.
+
+    Run with a BuildCache, tasks added with cache enabled are skipped if they
+    ran before with the same params and code (defaults to func) on inputs with
+    the same content, and their outputs did not change since."""
+
+    def __init__(self, name="build", logger=None):
+        self.name = name
+        self.logger = logger or LOGGER
+        self.tasks = {}
+        self.results = {}
+        self.wall_time = None
+        self.jobs = None
+        self.cache = None
+
+    def add(
+        self,
+        name,
+        func,
+        inputs=None,
+        outputs=None,
+        after=None,
+        exclusive=False,
+        cache=False,
+        params=None,
+        code=None,
+    ):
+        """Add a task, it depends on all earlier tasks it conflicts with."""
+
+        if name in self.tasks:
+            raise ValueError(f"task <{name}> was added already")
+
+        inputs = tuple(_normalize(path) for path in arg_to_iter(inputs))
+        outputs = tuple(_normalize(path) for path in arg_to_iter(outputs))
+        after = frozenset(arg_to_iter(after))
+
+        unknown = after - self.tasks.keys()
+        if unknown:
+            raise ValueError(f"task <{name}> depends on unknown tasks {unknown}")
+
+        conflicts = [
+            other
+            for other in self.tasks.values()
+            if other.name in after
+            or _overlap(other.outputs, inputs + outputs)
+            or _overlap(other.inputs, outputs)
+        ]
+        # only keep direct dependencies, the others are implied
+        implied = frozenset().union(*(other.ancestors for other in conflicts))
+        dependencies = tuple(other for other in conflicts if other.name not in implied)
+
+        self.tasks[name] = _Task(
+            name=name,
+            func=func,
+            inputs=inputs,
+            outputs=outputs,
+            dependencies=dependencies,
+            exclusive=exclusive,
+            cache=cache,
+            params=params,
+            code=code,
+        )
+
+    def ancestors(self, name):
+        """Names of all tasks the given one has to wait for."""
+        return self.tasks[name].ancestors
+
+    def dependencies(self, name):
+        """Names of the tasks the given one has to wait for directly."""
+        return tuple(dependency.name for dependency in self.tasks[name].dependencies)
+
+    def plan(self):
+        """Log the tasks in order along with what they are waiting for."""
+        for task in self.tasks.values():
+            self.logger.info(
+                "Task <%s>%s waits for: %s",
+                task.name,
+                " (exclusive)" if task.exclusive else "",
+                ", ".join(dep.name for dep in task.dependencies) or "nothing",
+            )
+
+    def _call(self, task, cache=None):
+        task.start = time.monotonic()
+        try:
+            if cache is None or not task.cache:
+                self.logger.info("Starting task <%s>...", task.name)
+                return task.func()
+
+            key = cache.key(task.name, task.code, task.params, task.inputs)
+            record = cache.lookup(key)
+            if record:
+                self.logger.info("Task <%s> is up to date, skipping...", task.name)
+                task.cached = True
+                task.saved = record.get("duration") or 0
+                return None
+
+            self.logger.info("Starting task <%s>...", task.name)
+            result = task.func()
+            cache.store(key, task.name, task.outputs, time.monotonic() - task.start)
+            return result
+
+        finally:
+            task.end = time.monotonic()
+
+    def _ready(self, task):
+        return all(dep.status in ("done", "cached") for dep in task.dependencies)
+
+    def run(self, jobs=0, cache=None):
+        """Run all tasks with up to jobs workers (0: one per CPU). Once a task
+        failed no further tasks are started, the running ones are waited for,
+        then TaskFailed is raised. Return values are stored in results, tasks
+        skipped by the cache have None."""
+
+        # pylint: disable=too-many-branches
+        self.jobs = jobs if jobs and jobs > 0 else os.cpu_count() or 1
+        self.cache = cache
+        pending = list(self.tasks.values())
+        running = {}
+        failed = []
+        start = time.monotonic()
+
+        self.logger.info(
+            "Running %d tasks of <%s> with up to %d workers...",
+            len(pending),
+            self.name,
+            self.jobs,
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=self.jobs, thread_name_prefix=self.name
+        ) as executor:
+            while pending or running:
+                for task in tuple(pending) if not failed else ():
+                    if len(running) >= self.jobs or any(
+                        other.exclusive for other in running.values()
+                    ):
+                        break
+                    if not self._ready(task):
+                        continue
+                    if task.exclusive and running:
+                        break
+                    pending.remove(task)
+                    task.status = "running"
+                    running[executor.submit(self._call, task, cache)] = task
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        self.results[task.name] = future.result()
+                    except BaseException:  # pylint: disable=broad-except
+                        self.logger.exception("Task <%s> failed", task.name)
+                        task.status = "failed"
+                        failed.append(task.name)
+                    else:
+                        task.status = "cached" if task.cached else "done"
+                        self.logger.info(
+                            "Finished task <%s> in %s",
+                            task.name,
+                            _duration(task.duration),
+                        )
+
+        if cache is not None:
+            cache.save()
+
+        self.wall_time = time.monotonic() - start
+        self.report()
+
+        if failed:
+            raise TaskFailed(
+                f"tasks {failed} of <{self.name}> failed, "
+                f"{len(pending)} tasks were not run"
+            )
+
+        return self.results
+
+    def critical_path(self):
+        """The chain of tasks that determined the wall time: starting from the
+        task that finished last, step back to the task that finished last
+        before it started. That is usually a dependency; if not, the task
+        waited for a free worker or an exclusive task."""
+
+        ran = [task for task in self.tasks.values() if task.end is not None]
+        if not ran:
+            return []
+
+        task = max(ran, key=lambda task: task.end)
+        path = [task]
+        while True:
+            before = [other for other in ran if other.end <= task.start]
+            if not before:
+                break
+            task = max(before, key=lambda task: task.end)
+            path.append(task)
+
+        return path[::-1]
+
+    def report(self):
+        """Log the timings of all tasks and the critical path."""
+
+        ran = [task for task in self.tasks.values() if task.start is not None]
+        if not ran:
+            return
+
+        origin = min(task.start for task in ran)
+        total = sum(task.duration for task in ran)
+        wall_time = self.wall_time or max(task.end for task in ran) - origin
+
+        self.logger.info(
+            "Tasks of <%s> took %s in total, finished after %s with up to %d "
+            "workers (%.1fx parallelism)",
+            self.name,
+            _duration(total),
+            _duration(wall_time),
+            self.jobs or 1,
+            total / wall_time if wall_time else 1,
+        )
+
+        for task in sorted(ran, key=lambda task: task.start):
+            self.logger.info(
+                "    %-24s %-8s started at %9s, took %9s",
+                task.name,
+                task.status,
+                _duration(task.start - origin),
+                _duration(task.duration),
+            )
+
+        if self.cache is not None:
+            cached = [task for task in ran if task.cached]
+            self.logger.info(
+                "Build cache: %d tasks up to date, %d executed, saved about %s "
+                "(the time the skipped tasks took when they last ran)",
+                len(cached),
+                len(ran) - len(cached),
+                _duration(sum(task.saved for task in cached)),
+            )
+
+        path = self.critical_path()
+        length = sum(task.duration for task in path)
+        self.logger.info(
+            "Critical path: %d tasks, %s running (%.0f%% of the wall time)",
+            len(path),
+            _duration(length),
+            100 * length / wall_time if wall_time else 100,
+        )
+
+        previous = None
+        for task in path:
+            self.logger.info(
+                "    %-24s took %9s%s",
+                task.name,
+                _duration(task.duration),
+                ""
+                if previous is None or previous.name in task.ancestors
+                else f", waited for a worker after <{previous.name}>",
+            )
+            previous = task
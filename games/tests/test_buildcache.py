@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the build cache and cached tasks in the task graph."""
+
+import os
+import tempfile
+
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from ..buildcache import BuildCache
+from ..taskgraph import TaskGraph
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def _upper(src, dst):
+    _write(dst, src.read_text().upper())
+
+
+def _lower(src, dst):
+    _write(dst, src.read_text().lower())
+
+
+class BuildCacheTest(SimpleTestCase):
+    """Keys, hits, restored and stale outputs."""
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        self.cache_dir = self.path / ".cache"
+        self.input = self.path / "data" / "input.txt"
+        self.output = self.path / "out" / "output.txt"
+        _write(self.input, "input")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run(self, cache, **kwargs):
+        key = cache.key("upper", _upper, inputs=self.input, **kwargs)
+        _upper(self.input, self.output)
+        cache.store(key, "upper", self.output.parent, 1.5)
+        return key
+
+    def test_key(self):
+        """Keys depend on the name, code, params and input contents."""
+        cache = BuildCache(self.cache_dir)
+        key = cache.key("upper", _upper, {"week": 1}, self.input)
+        self.assertEqual(key, cache.key("upper", _upper, {"week": 1}, self.input))
+        self.assertEqual(
+            key,
+            BuildCache(self.cache_dir).key("upper", _upper, {"week": 1}, self.input),
+        )
+        others = {
+            cache.key("lower", _upper, {"week": 1}, self.input),
+            cache.key("upper", _lower, {"week": 1}, self.input),
+            cache.key("upper", _upper, {"week": 2}, self.input),
+            cache.key("upper", _upper, {"week": 1}, self.input.parent),
+        }
+        _write(self.input, "changed input")
+        others.add(cache.key("upper", _upper, {"week": 1}, self.input))
+        self.assertNotIn(key, others)
+        self.assertEqual(len(others), 5)
+
+    def test_hit(self):
+        """Stored results are found as long as the outputs are unchanged."""
+        cache = BuildCache(self.cache_dir)
+        key = cache.key("upper", _upper, inputs=self.input)
+        self.assertIsNone(cache.lookup(key))
+
+        self._run(cache)
+        record = cache.lookup(key)
+        self.assertEqual(record["task"], "upper")
+        self.assertEqual(record["duration"], 1.5)
+        self.assertEqual(
+            record["outputs"], {str(self.output): cache.digest(self.output)}
+        )
+
+        cache.save()
+        cache = BuildCache(self.cache_dir)
+        self.assertEqual(cache.lookup(key), record)
+        self.assertIsNone(BuildCache(self.cache_dir, force=True).lookup(key))
+
+    def test_restore(self):
+        """Removed or overwritten outputs are restored from the object store."""
+        cache = BuildCache(self.cache_dir)
+        key = self._run(cache)
+
+        self.output.unlink()
+        self.assertTrue(cache.lookup(key))
+        self.assertEqual(self.output.read_text(), "INPUT")
+
+        _write(self.output, "overwritten")
+        self.assertTrue(cache.lookup(key))
+        self.assertEqual(self.output.read_text(), "INPUT")
+
+    def test_stale(self):
+        """Changed outputs that were too large to keep make the result stale."""
+        cache = BuildCache(self.cache_dir, max_object_size=0)
+        key = self._run(cache)
+        self.assertTrue(cache.lookup(key))
+        self.assertFalse((self.cache_dir / "objects").exists())
+
+        _write(self.output, "overwritten")
+        self.assertIsNone(cache.lookup(key))
+        self.output.unlink()
+        self.assertIsNone(cache.lookup(key))
+        self.assertFalse(self.output.exists())
+
+    def test_digest(self):
+        """Digests are remembered by size and modification time."""
+        cache = BuildCache(self.cache_dir)
+        digest = cache.digest(self.input)
+        stat = os.stat(self.input)
+        self.input.write_text("INPUT")
+        os.utime(self.input, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(cache.digest(self.input), digest)
+        self.input.write_text("changed")
+        self.assertNotEqual(cache.digest(self.input), digest)
+
+
+class CachedTaskGraphTest(SimpleTestCase):
+    """Tasks are skipped if they are up to date."""
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        self.cache_dir = self.path / ".cache"
+        self.calls = []
+        _write(self.path / "input.txt", "Input")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _task(self, name, func, src, dst):
+        def task():
+            self.calls.append(name)
+            func(self.path / src, self.path / dst)
+            return name
+
+        return task
+
+    def _run(self, force=False, params=None):
+        graph = TaskGraph("test")
+        tasks = (
+            ("lower", _lower, "input.txt", "lower.txt"),
+            ("upper", _upper, "lower.txt", "upper.txt"),
+        )
+        for name, func, src, dst in tasks:
+            graph.add(
+                name,
+                self._task(name, func, src, dst),
+                inputs=self.path / src,
+                outputs=self.path / dst,
+                cache=True,
+                params=params,
+                code=func,
+            )
+        graph.add(
+            "uncached",
+            self._task("uncached", _lower, "upper.txt", "uncached.txt"),
+            inputs=self.path / "upper.txt",
+            outputs=self.path / "uncached.txt",
+        )
+        self.calls = []
+        results = graph.run(jobs=2, cache=BuildCache(self.cache_dir, force=force))
+        return graph, results
+
+    def test_skip(self):
+        """Only out of date tasks run, unchanged outputs don't invalidate the
+        tasks that read them."""
+
+        graph, results = self._run()
+        self.assertEqual(self.calls, ["lower", "upper", "uncached"])
+        self.assertEqual(results, {name: name for name in self.calls})
+
+        graph, results = self._run()
+        self.assertEqual(self.calls, ["uncached"])
+        self.assertEqual(graph.tasks["lower"].status, "cached")
+        self.assertEqual(graph.tasks["upper"].status, "cached")
+        self.assertIsNone(results["upper"])
+        self.assertEqual((self.path / "upper.txt").read_text(), "INPUT")
+
+        (self.path / "upper.txt").unlink()
+        self._run()
+        self.assertEqual(self.calls, ["uncached"])
+        self.assertEqual((self.path / "upper.txt").read_text(), "INPUT")
+
+        # same size, so make sure the modification time changes
+        _write(self.path / "input.txt", "INPUT")
+        os.utime(self.path / "input.txt", ns=(0, 0))
+        self._run()
+        self.assertEqual(self.calls, ["lower", "uncached"])
+
+        _write(self.path / "input.txt", "Changed input")
+        self._run()
+        self.assertEqual(self.calls, ["lower", "upper", "uncached"])
+        self.assertEqual((self.path / "upper.txt").read_text(), "CHANGED INPUT")
+
+        self._run(params={"week": 2})
+        self.assertEqual(self.calls, ["lower", "upper", "uncached"])
+        self._run(params={"week": 2})
+        self.assertEqual(self.calls, ["uncached"])
+
+        self._run(force=True)
+        self.assertEqual(self.calls, ["lower", "upper", "uncached"])
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the filldb command."""
+
+import json
+import os
+import tempfile
+
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+from ..models import Collection, DroppedIndex, Game, User
+from ..utils import SQLiteBulkLoad
+
+GAMES = tuple({"bgg_id": bgg_id, "name": f"Game {bgg_id}"} for bgg_id in range(1, 6))
+
+# ratings are not sorted by user, so every user's rows are spread out
+RATINGS_BEFORE = (
+    ("alice", 1, 7),
+    ("bob", 1, 6),
+    ("alice", 2, 8),
+    ("carol", 3, 5),
+    ("bob", 2, 4),
+    ("alice", 3, 9),
+    ("carol", 4, 6),
+)
+RATINGS_AFTER = (
+    ("bob", 1, 6),
+    ("alice", 1, 7),
+    ("dave", 5, 10),
+    ("alice", 2, 3),
+    ("bob", 3, 8),
+    ("alice", 4, 9),
+    ("bob", 2, 4),
+    ("dave", 1, 2),
+    ("alice", 3, 9),
+)
+
+
+def _write_jl(path, items):
+    with open(path, "w") as file:
+        for item in items:
+            file.write(json.dumps(item))
+            file.write("\n")
+
+
+def _indexes():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        return {name for name, in cursor.fetchall()}
+
+
+class FillDbTestCase(TransactionTestCase):
+    """Loads games and ratings from temporary JSON lines files."""
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.games_file = os.path.join(self.tmp_dir.name, "games.jl")
+        _write_jl(self.games_file, GAMES)
+        self.settings = override_settings(
+            JL_CACHE_DIR=os.path.join(self.tmp_dir.name, "cache")
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.tmp_dir.cleanup()
+
+    def _filldb(self, ratings, name, **kwargs):
+        ratings_file = os.path.join(self.tmp_dir.name, f"{name}.jl")
+        if not os.path.exists(ratings_file):
+            _write_jl(
+                ratings_file,
+                (
+                    {"bgg_id": bgg_id, "bgg_user_name": user, "bgg_user_rating": rating}
+                    for user, bgg_id, rating in ratings
+                ),
+            )
+        call_command(
+            "filldb",
+            self.games_file,
+            collection_paths=[ratings_file],
+            recommender=None,
+            batch=2,
+            verbosity=0,
+            **kwargs,
+        )
+
+    @staticmethod
+    def _state():
+        """Users and collection rows in the database."""
+        # pylint: disable=no-member
+        return (
+            sorted(User.objects.values_list("name", flat=True)),
+            sorted(
+                Collection.objects.values_list(
+                    "user_id", "game_id", "rating", "owned", "wishlist", "play_count"
+                )
+            ),
+        )
+
+
+class UpdateCollectionsTest(FillDbTestCase):
+    """Incremental loads must end up with the same users and collections as a
+    full rebuild from the same files."""
+
+    def test_interleaved_users(self):
+        """Users whose ratings are spread out over the file are updated."""
+
+        self._filldb(RATINGS_AFTER, "after")
+        rebuilt = self._state()
+        # pylint: disable=no-member
+        Game.objects.all().delete()
+        User.objects.all().delete()
+
+        self._filldb(RATINGS_BEFORE, "before")
+        self._filldb(RATINGS_AFTER, "after", incremental=True)
+
+        self.assertEqual(self._state(), rebuilt)
+        self.assertEqual(rebuilt[0], ["alice", "bob", "dave"])
+        self.assertEqual(len(rebuilt[1]), len(RATINGS_AFTER))
+
+
+class BulkLoadResumeTest(FillDbTestCase):
+    """A bulk load that was killed before it could rebuild the dropped indexes
+    must restore them when it is resumed."""
+
+    def test_interrupted_bulk_load(self):
+        """Indexes dropped by the interrupted load exist after the resume."""
+
+        indexes = _indexes()
+
+        # the process dies while loading the collections, so the bulk load
+        # never gets to clean up after itself
+        with mock.patch.object(
+            SQLiteBulkLoad, "__exit__", return_value=None
+        ), mock.patch(
+            "games.management.commands.filldb._fill_collections",
+            side_effect=KeyboardInterrupt,
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                self._filldb(RATINGS_BEFORE, "before", bulk_load=True)
+
+        self.assertLess(_indexes(), indexes)
+        # pylint: disable=no-member
+        self.assertTrue(DroppedIndex.objects.exists())
+
+        self._filldb(RATINGS_BEFORE, "before", bulk_load=True, resume=True)
+
+        self.assertEqual(_indexes(), indexes)
+        self.assertFalse(DroppedIndex.objects.exists())
+        self.assertEqual(Game.objects.count(), len(GAMES))
+        self.assertEqual(Collection.objects.count(), len(RATINGS_BEFORE))
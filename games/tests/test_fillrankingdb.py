@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the fillrankingdb command."""
+
+import json
+import os
+import shutil
+import tempfile
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from ..models import (
+    Game,
+    Ranking,
+    RankingDate,
+    RankingFile,
+    RankingSnapshot,
+    RankingSummary,
+)
+from ..rankings import STORAGE_PACKED, STORAGE_ROWS, iter_snapshots
+
+NUM_GAMES = 40
+# ranking type directory -> (first date, days between files)
+RANKING_DIRS = {"bgg": (date(2021, 1, 1), 2), "factor": (date(2021, 1, 2), 3)}
+EMPTY_DIRS = ("similarity", "charts")
+LAST_DATE = date(2021, 3, 1)
+
+
+def _write_csvs(path, seed=42):
+    """Ranking CSVs with games entering and leaving, including some IDs that
+    are not in the database."""
+
+    for sub_dir in EMPTY_DIRS:
+        os.makedirs(os.path.join(path, sub_dir))
+
+    random = np.random.RandomState(seed)
+    for sub_dir, (day, step) in RANKING_DIRS.items():
+        os.makedirs(os.path.join(path, sub_dir))
+        while day <= LAST_DATE:
+            size = random.randint(NUM_GAMES // 2, NUM_GAMES + 5)
+            game_ids = random.permutation(np.arange(1, NUM_GAMES + 6))[:size]
+            file_name = f"{day.isoformat()}T00-00-00.csv"
+            scores = np.sort(random.uniform(size=size))[::-1]
+            with open(os.path.join(path, sub_dir, file_name), "w") as file:
+                file.write("rank,bgg_id,score\n")
+                for rank, (game_id, score) in enumerate(zip(game_ids, scores), 1):
+                    file.write(f"{rank},{game_id},{score}\n")
+            day += timedelta(days=step)
+
+
+def _copy_csvs(src, dst, before=None):
+    for sub_dir in os.listdir(src):
+        os.makedirs(os.path.join(dst, sub_dir), exist_ok=True)
+        for file_name in sorted(os.listdir(os.path.join(src, sub_dir))):
+            if before is None or file_name < before:
+                dst_path = os.path.join(dst, sub_dir, file_name)
+                if not os.path.exists(dst_path):
+                    shutil.copy(os.path.join(src, sub_dir, file_name), dst_path)
+
+
+class IncrementalFillRankingDbTest(TransactionTestCase):
+    """Incremental runs must end up with the same state as full ones."""
+
+    def setUp(self):
+        # pylint: disable=consider-using-with,no-member
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.src_dir = os.path.join(self.tmp_dir.name, "src")
+        self.dst_dir = os.path.join(self.tmp_dir.name, "dst")
+        self.movers_file = os.path.join(self.tmp_dir.name, "movers.json")
+        _write_csvs(self.src_dir)
+        Game.objects.bulk_create(
+            Game(bgg_id=bgg_id, name=f"Game {bgg_id}")
+            for bgg_id in range(1, NUM_GAMES + 1)
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _fill(self, storage, before=None, **kwargs):
+        _copy_csvs(self.src_dir, self.dst_dir, before)
+        call_command(
+            "fillrankingdb",
+            self.dst_dir,
+            storage=storage,
+            movers_output=self.movers_file,
+            **kwargs,
+        )
+
+    def _state(self, storage):
+        # pylint: disable=no-member
+        with open(self.movers_file) as file:
+            movers = json.load(file)
+        return {
+            "snapshots": [
+                (ranking_type, str(day), game_ids.tolist(), ranks.tolist())
+                for ranking_type, day, game_ids, ranks in iter_snapshots(
+                    storage=storage
+                )
+            ],
+            "dates": sorted(
+                RankingDate.objects.values_list(
+                    "ranking_type", "date", "count", "min_rank", "max_rank"
+                )
+            ),
+            "summaries": sorted(
+                RankingSummary.objects.values_list(
+                    "game_id",
+                    "ranking_type",
+                    "best_rank",
+                    "best_date",
+                    "current_rank",
+                    "first_date",
+                    "last_date",
+                    "weeks_top_10",
+                    "weeks_top_100",
+                )
+            ),
+            "movers": movers,
+        }
+
+    def _reset(self):
+        models = (Ranking, RankingSnapshot, RankingDate, RankingSummary, RankingFile)
+        for model in models:
+            model.objects.all().delete()  # pylint: disable=no-member
+        shutil.rmtree(self.dst_dir, ignore_errors=True)
+
+    def _full(self, storage):
+        self._reset()
+        self._fill(storage)
+        return self._state(storage)
+
+    def test_append(self):
+        """New files after a complete week or in the middle of a week."""
+        for storage in (STORAGE_ROWS, STORAGE_PACKED):
+            full = self._full(storage)
+            self.assertTrue(full["summaries"])
+            for before in ("2021-02-22", "2021-02-18"):
+                with self.subTest(storage=storage, before=before):
+                    self._reset()
+                    self._fill(storage, before=before)
+                    self.assertNotEqual(self._state(storage), full)
+                    self._fill(storage, incremental=True)
+                    self.assertEqual(self._state(storage), full)
+
+    def test_changed_file(self):
+        """Changing an old file rebuilds the history of its ranking type."""
+        for storage in (STORAGE_ROWS, STORAGE_PACKED):
+            with self.subTest(storage=storage):
+                self._full(storage)
+                path = os.path.join(self.dst_dir, "bgg", "2021-01-19T00-00-00.csv")
+                with open(path) as file:
+                    lines = file.read().splitlines()
+                lines[1], lines[2] = lines[2], lines[1]
+                with open(path, "w") as file:
+                    file.write("\n".join(lines) + "\n")
+                self._fill(storage, incremental=True)
+                changed = self._state(storage)
+                shutil.copy(
+                    path, os.path.join(self.src_dir, "bgg", "2021-01-19T00-00-00.csv")
+                )
+                self.assertEqual(changed, self._full(storage))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the columnar cache of JSON lines files."""
+
+import json
+import os
+import tempfile
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..jlcache import iter_records
+from ..utils import iter_jl
+
+ITEMS = (
+    {"id": 1, "name": "Catan", "rating": 7.5, "year": 1995, "tags": ["trade"]},
+    {"id": 2, "name": None, "rating": None, "year": 2017, "tags": None},
+    {"id": 3, "name": "Azul", "year": None},
+    {"id": 4, "rating": 8.0, "tags": "solo"},
+    {"id": 5, "name": None},
+)
+
+
+class IterRecordsTest(SimpleTestCase):
+    """Records read from the cache must equal the items of the source file."""
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "items.jl")
+        with open(self.path, "w") as file:
+            for item in ITEMS:
+                file.write(json.dumps(item))
+                file.write("\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _assert_same(self, fields=None, **kwargs):
+        records = list(
+            iter_records(
+                self.path,
+                columns=fields,
+                cache_dir=os.path.join(self.tmp_dir.name, "cache"),
+                date_columns=(),
+                rebuild=True,
+                **kwargs,
+            )
+        )
+        self.assertEqual(records, list(iter_jl(self.path, fields=fields)))
+
+    def test_explicit_nulls(self):
+        """Explicit nulls are kept, missing keys are left out."""
+        for chunk_size in (1, 2, 10):
+            with self.subTest(chunk_size=chunk_size):
+                self._assert_same(chunk_size=chunk_size)
+                self._assert_same(fields=("id", "name", "tags"), chunk_size=chunk_size)
+
+    def test_explicit_nulls_pickle(self):
+        """Same without pyarrow, when parts are pickled DataFrames."""
+        with mock.patch("games.jlcache._pyarrow", return_value=None):
+            self._assert_same(chunk_size=2)
+            self._assert_same(fields=("rating", "year"), chunk_size=2)
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the ranking helpers."""
+
+import json
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from ..models import Game, Ranking, RankingDate, RankingSummary
+from ..rankings import (
+    STORAGE_PACKED,
+    STORAGE_ROWS,
+    RankingSummarizer,
+    downsample,
+    game_rankings,
+    history_matrix,
+    iter_snapshots,
+    make_snapshot,
+    ranking_diff,
+    slice_history,
+)
+from ..views import GameViewSet, RankingViewSet
+
+RANKING_TYPES = ("bgg", "fac")
+START_DATE = date(2020, 1, 5)
+NUM_DATES = 20
+NUM_GAMES = 150
+
+
+def _snapshots(seed=23):
+    """Weekly snapshots ordered by type and date, with games entering and
+    leaving the rankings, and a last snapshot that misses some games."""
+
+    random = np.random.RandomState(seed)
+    for ranking_type in RANKING_TYPES:
+        for week in range(NUM_DATES):
+            size = random.randint(NUM_GAMES // 2, NUM_GAMES)
+            game_ids = random.permutation(np.arange(1, NUM_GAMES + 1))[:size]
+            yield (
+                ranking_type,
+                START_DATE + timedelta(weeks=week),
+                game_ids,
+                np.arange(1, size + 1),
+            )
+
+
+def _fill_rankings(snapshots):
+    """Store the snapshots both as rows and packed, with their summaries."""
+
+    # pylint: disable=no-member
+    Game.objects.bulk_create(
+        Game(bgg_id=bgg_id, name=f"Game {bgg_id}") for bgg_id in range(1, NUM_GAMES + 1)
+    )
+    summarizer = RankingSummarizer()
+    for ranking_type, day, game_ids, ranks in snapshots:
+        Ranking.objects.bulk_create(
+            Ranking(game_id=game_id, ranking_type=ranking_type, rank=rank, date=day)
+            for game_id, rank in zip(game_ids.tolist(), ranks.tolist())
+        )
+        make_snapshot(ranking_type, day, game_ids, ranks).save()
+        summarizer.update(ranking_type, day, game_ids, ranks)
+    RankingSummary.objects.bulk_create(summarizer.instances())
+    RankingDate.objects.bulk_create(summarizer.date_instances())
+
+
+def _expected_history(snapshots, ranking_type, top):
+    snapshots = [snapshot for snapshot in snapshots if snapshot[0] == ranking_type]
+    _, last_date, last_ids, last_ranks = snapshots[-1]
+    game_ids = last_ids[last_ranks <= top].tolist()
+    ranks = {game_id: {} for game_id in game_ids}
+    for _, day, ids, day_ranks in snapshots:
+        for game_id, rank in zip(ids.tolist(), day_ranks.tolist()):
+            if game_id in ranks:
+                ranks[game_id][day] = rank
+    dates = sorted({day for history in ranks.values() for day in history})
+    return {
+        "ranking_type": ranking_type,
+        "top": top,
+        "last_date": last_date,
+        "dates": dates,
+        "games": game_ids,
+        "ranks": [[ranks[game_id].get(day) for day in dates] for game_id in game_ids],
+    }
+
+
+def _get(view, path, **kwargs):
+    response = view(APIRequestFactory().get(path), **kwargs)
+    response.render()
+    return response.status_code, json.loads(response.content)
+
+
+def _expected_summaries(snapshots):
+    ranks = {}
+    last_dates = {}
+    for ranking_type, day, game_ids, game_ranks in snapshots:
+        last_dates[ranking_type] = max(day, last_dates.get(ranking_type, day))
+        for game_id, rank in zip(game_ids.tolist(), game_ranks.tolist()):
+            ranks.setdefault((ranking_type, game_id), []).append((day, rank))
+
+    result = {}
+    for (ranking_type, game_id), history in ranks.items():
+        best_rank = min(rank for _, rank in history)
+        current = dict(history).get(last_dates[ranking_type])
+        result[ranking_type, game_id] = (
+            best_rank,
+            max(day for day, rank in history if rank == best_rank),
+            current,
+            min(day for day, _ in history),
+            max(day for day, _ in history),
+            sum(rank <= 10 for _, rank in history),
+            sum(rank <= 100 for _, rank in history),
+        )
+    return result
+
+
+def _summaries(instances):
+    return {
+        (summary.ranking_type, summary.game_id): (
+            summary.best_rank,
+            summary.best_date,
+            summary.current_rank,
+            summary.first_date,
+            summary.last_date,
+            summary.weeks_top_10,
+            summary.weeks_top_100,
+        )
+        for summary in instances
+    }
+
+
+class RankingSummarizerTest(SimpleTestCase):
+    """Summaries must match a straightforward computation per game."""
+
+    def test_summaries(self):
+        """Best, current, first and last rank and weeks in the top N."""
+        summarizer = RankingSummarizer()
+        for snapshot in _snapshots():
+            summarizer.update(*snapshot)
+        self.assertEqual(
+            _summaries(summarizer.instances()),
+            _expected_summaries(_snapshots()),
+        )
+
+    def test_ties(self):
+        """The latest date of the best rank wins, games missing from the last
+        snapshot have no current rank."""
+        summarizer = RankingSummarizer()
+        summarizer.update("bgg", date(2020, 1, 5), [1, 2, 3], [1, 2, 3])
+        summarizer.update("bgg", date(2020, 1, 12), [2, 1, 3], [1, 2, 3])
+        summarizer.update("bgg", date(2020, 1, 19), [1, 2], [1, 2])
+        summarizer.update("bgg", date(2020, 1, 26), [2, 1], [1, 2])
+        summaries = _summaries(summarizer.instances())
+        self.assertEqual(
+            summaries["bgg", 1],
+            (1, date(2020, 1, 19), 2, date(2020, 1, 5), date(2020, 1, 26), 4, 4),
+        )
+        self.assertEqual(
+            summaries["bgg", 2],
+            (1, date(2020, 1, 26), 1, date(2020, 1, 5), date(2020, 1, 26), 4, 4),
+        )
+        self.assertEqual(
+            summaries["bgg", 3],
+            (3, date(2020, 1, 12), None, date(2020, 1, 5), date(2020, 1, 12), 2, 2),
+        )
+
+
+def _ranking(ranking_type, day, rank):
+    return {"ranking_type": ranking_type, "rank": rank, "date": day, "game": 1}
+
+
+class DownsampleTest(SimpleTestCase):
+    """Best rank per resolution bucket, with the latest date among ties."""
+
+    def _assert_points(self, rankings, expected, **kwargs):
+        self.assertEqual(
+            [
+                (ranking["ranking_type"], ranking["date"], ranking["rank"])
+                for ranking in downsample(rankings, **kwargs)
+            ],
+            expected,
+        )
+
+    def test_week_edges(self):
+        """Weeks are ISO weeks from Monday to Sunday, also across years."""
+        rankings = [
+            _ranking("bgg", date(2019, 12, 29), 5),  # Sunday, 2019-W52
+            _ranking("bgg", date(2019, 12, 30), 4),  # Monday, 2020-W01
+            _ranking("bgg", date(2020, 1, 5), 4),  # Sunday, 2020-W01
+            _ranking("bgg", date(2020, 1, 6), 7),  # Monday, 2020-W02
+            _ranking("bgg", date(2020, 1, 12), 6),  # Sunday, 2020-W02
+        ]
+        self._assert_points(
+            rankings,
+            [
+                ("bgg", date(2019, 12, 29), 5),
+                ("bgg", date(2020, 1, 5), 4),
+                ("bgg", date(2020, 1, 12), 6),
+            ],
+            resolution="week",
+        )
+        self._assert_points(
+            rankings,
+            # years are calendar years
+            [("bgg", date(2019, 12, 30), 4), ("bgg", date(2020, 1, 5), 4)],
+            resolution="year",
+        )
+
+    def test_month_edges(self):
+        """Months start on the first, each ranking type is downsampled alone."""
+        rankings = [
+            _ranking("bgg", date(2020, 1, 31), 3),
+            _ranking("bgg", date(2020, 2, 1), 9),
+            _ranking("bgg", date(2020, 2, 29), 8),
+            _ranking("fac", date(2020, 2, 1), 2),
+            _ranking("fac", date(2020, 2, 29), 2),
+            _ranking("fac", date(2020, 3, 1), 1),
+        ]
+        self._assert_points(
+            rankings,
+            [
+                ("bgg", date(2020, 1, 31), 3),
+                ("bgg", date(2020, 2, 29), 8),
+                ("fac", date(2020, 2, 29), 2),
+                ("fac", date(2020, 3, 1), 1),
+            ],
+            resolution="month",
+        )
+        self._assert_points(
+            rankings,
+            [
+                (ranking["ranking_type"], ranking["date"], ranking["rank"])
+                for ranking in rankings
+            ],
+            resolution="day",
+        )
+
+    def test_max_points(self):
+        """Chunks of equal size, the last one may be shorter."""
+        rankings = [
+            _ranking("bgg", START_DATE + timedelta(days=day), rank)
+            for day, rank in enumerate((5, 3, 4, 3, 9, 8, 7, 6, 2, 1))
+        ]
+        self._assert_points(
+            rankings,
+            [
+                ("bgg", START_DATE + timedelta(days=3), 3),
+                ("bgg", START_DATE + timedelta(days=7), 6),
+                ("bgg", START_DATE + timedelta(days=9), 1),
+            ],
+            max_points=3,
+        )
+        self._assert_points(
+            rankings, [("bgg", START_DATE + timedelta(days=9), 1)], max_points=1
+        )
+        self.assertEqual(downsample(rankings, max_points=10), rankings)
+
+
+class RankingStorageTest(TestCase):
+    """Rankings stored as rows and as packed snapshots must read the same."""
+
+    @classmethod
+    def setUpTestData(cls):
+        _fill_rankings(_snapshots())
+
+    def _both(self, func, *args, **kwargs):
+        results = []
+        for storage in (STORAGE_ROWS, STORAGE_PACKED):
+            with override_settings(RANKINGS_STORAGE=storage):
+                results.append(func(*args, **kwargs))
+        self.assertEqual(results[0], results[1])
+        return results[0]
+
+    def test_snapshots(self):
+        """Same snapshots, with and without filters."""
+
+        def snapshots(**kwargs):
+            return [
+                (ranking_type, str(day), game_ids.tolist(), ranks.tolist())
+                for ranking_type, day, game_ids, ranks in iter_snapshots(**kwargs)
+            ]
+
+        expected = [
+            (ranking_type, str(day), game_ids.tolist(), ranks.tolist())
+            for ranking_type, day, game_ids, ranks in _snapshots()
+        ]
+        self.assertEqual(self._both(snapshots), expected)
+        self.assertTrue(
+            self._both(
+                snapshots,
+                ranking_types=("fac",),
+                date_gte=START_DATE + timedelta(weeks=3),
+                date_lte=START_DATE + timedelta(weeks=5),
+            )
+        )
+
+    def test_list(self):
+        """The rankings endpoint returns the same pages."""
+        view = RankingViewSet.as_view({"get": "list"})
+        queries = (
+            "",
+            "?page=3",
+            "?ranking_type=fac&rank__lte=10",
+            "?date__gte=2020-03-01&date__lt=2020-03-15&ordering=-rank,ranking_type,date",
+            "?game=7&ordering=-date,ranking_type",
+            "?game=7&ranking_type=bgg&date__lte=2020-02-01",
+            "?rank__gt=50&rank__lte=55&ordering=-date,ranking_type,rank&page_size=500",
+        )
+        for query in queries:
+            with self.subTest(query=query):
+                status, data = self._both(_get, view, f"/rankings/{query}")
+                self.assertEqual(status, 200)
+                self.assertTrue(data["results"])
+
+    def test_game_rankings(self):
+        """The rankings of a single game are the same."""
+        view = GameViewSet.as_view({"get": "rankings"})
+        queries = (
+            "",
+            "?ranking_type=fac",
+            "?date__gte=2020-02-01&date__lte=2020-03-01",
+        )
+        for game_id in (1, 42, NUM_GAMES):
+            for query in queries:
+                with self.subTest(game_id=game_id, query=query):
+                    status, data = self._both(
+                        _get, view, f"/games/{game_id}/rankings/{query}", pk=game_id
+                    )
+                    self.assertEqual(status, 200)
+                    self.assertTrue(data)
+
+    def test_history(self):
+        """Same history matrix of the top games as computed from the snapshots."""
+        for ranking_type in RANKING_TYPES:
+            for top in (10, 50):
+                with self.subTest(ranking_type=ranking_type, top=top):
+                    self.assertEqual(
+                        self._both(history_matrix, ranking_type, top=top),
+                        _expected_history(_snapshots(), ranking_type, top),
+                    )
+
+    def test_slice_history(self):
+        """A precomputed history can be sliced to fewer games and dates."""
+        date_gte = START_DATE + timedelta(weeks=4)
+        date_lte = START_DATE + timedelta(weeks=NUM_DATES)
+        history = history_matrix("bgg", top=50)
+        self.assertEqual(
+            slice_history(history, top=10, date_gte=date_gte, date_lte=date_lte),
+            history_matrix("bgg", top=10, date_gte=date_gte, date_lte=date_lte),
+        )
+        self.assertIsNone(slice_history(history, top=100))
+        self.assertIsNone(slice_history(history, date_lte=START_DATE))
+
+    def test_downsampled_game_rankings(self):
+        """Downsampled rankings of a game are the same in both storages, also
+        with buckets cut by the date range."""
+        params = [
+            {"resolution": resolution, "max_points": max_points, "date_gte": date_gte}
+            for resolution in ("day", "week", "month", "year")
+            for max_points in (None, 3)
+            for date_gte in (None, date(2020, 2, 12))
+        ]
+        for game_id in (1, 42, NUM_GAMES):
+            for kwargs in params:
+                with self.subTest(game_id=game_id, **kwargs):
+                    self.assertEqual(
+                        self._both(game_rankings, game_id, **kwargs),
+                        downsample(
+                            self._both(
+                                game_rankings, game_id, date_gte=kwargs["date_gte"]
+                            ),
+                            resolution=kwargs["resolution"],
+                            max_points=kwargs["max_points"],
+                        ),
+                    )
+
+    def test_dates(self):
+        """The dates catalogue has the dates, sizes and ranks of all snapshots,
+        and the endpoint serves the same dates as distinct ranking rows."""
+
+        self.assertEqual(
+            sorted(
+                RankingDate.objects.values_list(
+                    "ranking_type", "date", "count", "min_rank", "max_rank"
+                )
+            ),
+            sorted(
+                (ranking_type, day, len(ranks), int(ranks.min()), int(ranks.max()))
+                for ranking_type, day, _, ranks in _snapshots()
+            ),
+        )
+
+        view = RankingViewSet.as_view({"get": "dates"})
+        for ranking_type in (None, "fac"):
+            with self.subTest(ranking_type=ranking_type):
+                queryset = Ranking.objects.order_by("ranking_type", "date")
+                if ranking_type:
+                    queryset = queryset.filter(ranking_type=ranking_type)
+                expected = [
+                    {"ranking_type": item["ranking_type"], "date": str(item["date"])}
+                    for item in queryset.values("ranking_type", "date").distinct()
+                ]
+                query = f"?ranking_type={ranking_type}" if ranking_type else ""
+                self.assertEqual(
+                    self._both(_get, view, f"/rankings/dates/{query}"),
+                    (200, expected),
+                )
+
+
+class MoversTest(TestCase):
+    """Movers, entries and exits between two dates."""
+
+    snapshots = {
+        date(2021, 2, 28): (1, 2, 3, 4, 5, 6, 7),
+        date(2021, 3, 7): (1, 2, 3, 4, 5, 6),
+        date(2021, 3, 14): (2, 1, 3, 7, 5, 4),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        # pylint: disable=no-member
+        Game.objects.bulk_create(
+            Game(bgg_id=bgg_id, name=f"Game {bgg_id}") for bgg_id in range(1, 9)
+        )
+        for day, game_ids in cls.snapshots.items():
+            ranks = range(1, len(game_ids) + 1)
+            Ranking.objects.bulk_create(
+                Ranking(game_id=game_id, ranking_type="bgg", rank=rank, date=day)
+                for game_id, rank in zip(game_ids, ranks)
+            )
+            make_snapshot("bgg", day, game_ids, ranks).save()
+            RankingDate.objects.create(
+                ranking_type="bgg",
+                date=day,
+                count=len(game_ids),
+                min_rank=1,
+                max_rank=len(game_ids),
+            )
+
+    def _assert_diff(self, diff, movers, entries, exits):
+        def rows(key):
+            return [
+                (row["game"], row["rank"], row["previous_rank"], row["change"])
+                for row in diff[key]
+            ]
+
+        self.assertEqual(rows("movers"), movers)
+        self.assertEqual(rows("entries"), entries)
+        self.assertEqual(rows("exits"), exits)
+
+    def test_latest(self):
+        """By default, the latest two dates are compared."""
+        for storage in (STORAGE_ROWS, STORAGE_PACKED):
+            with self.subTest(storage=storage):
+                diff = ranking_diff("bgg", top=5, storage=storage)
+                self.assertEqual(diff["date"], date(2021, 3, 14))
+                self.assertEqual(diff["previous"], date(2021, 3, 7))
+                self._assert_diff(
+                    diff,
+                    movers=[(2, 1, 2, 1), (1, 2, 1, -1)],
+                    entries=[(7, 4, None, None)],
+                    exits=[(4, 6, 4, -2)],
+                )
+
+    def test_dates(self):
+        """Entries may have been unranked before, exits may be unranked now."""
+        for storage in (STORAGE_ROWS, STORAGE_PACKED):
+            with self.subTest(storage=storage):
+                diff = ranking_diff(
+                    "bgg",
+                    date=date(2021, 3, 14),
+                    previous=date(2021, 2, 28),
+                    top=7,
+                    storage=storage,
+                )
+                self._assert_diff(
+                    diff,
+                    movers=[(7, 4, 7, 3), (2, 1, 2, 1), (1, 2, 1, -1), (4, 6, 4, -2)],
+                    entries=[],
+                    exits=[(6, None, 6, None)],
+                )
+                self.assertIsNone(ranking_diff("fac", storage=storage))
+
+    def test_endpoint(self):
+        """The endpoint adds the games to the rows."""
+        view = RankingViewSet.as_view({"get": "movers"})
+        with override_settings(MOVERS_FILE=None):
+            status, data = _get(view, "/rankings/movers/?top=5")
+            self.assertEqual(status, 200)
+            self.assertEqual([row["game"]["bgg_id"] for row in data["entries"]], [7])
+            status, _ = _get(view, "/rankings/movers/?ranking_type=fac")
+            self.assertEqual(status, 404)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the games and user stats."""
+
+from django.db.models import Count, Min, Q
+from django.test import TestCase
+
+from ..models import (
+    Category,
+    Collection,
+    Game,
+    GameType,
+    Mechanic,
+    Person,
+    User,
+    UserStats,
+)
+from ..stats import (
+    STATS_SITES,
+    compute_user_stats,
+    games_stats,
+    user_stats,
+    user_stats_precomputed,
+    user_totals,
+    users_stats,
+)
+
+NUM_GAMES = 30
+USERS = ("alice", "bob", "carol", "dave")
+
+# stats key -> (queryset, reverse relation), as in the former ORM implementation
+STATS_MODELS = {
+    "designer": (lambda: Person.objects.exclude(bgg_id=3), "designer_of"),
+    "artist": (lambda: Person.objects.exclude(bgg_id=3), "artist_of"),
+    "game_type": (GameType.objects.all, "games"),
+    "category": (Category.objects.all, "games"),
+    "mechanic": (Mechanic.objects.all, "games"),
+}
+
+
+def _orm_games_stats(queryset, top_games, top_items):
+    """Games stats the way the view used to compute them, one query per key."""
+
+    result = {}
+
+    for site_key, site_rank in STATS_SITES.items():
+        games = frozenset(
+            queryset.filter(**{f"{site_rank}__isnull": False})
+            .order_by(site_rank)[:top_games]
+            .values_list("bgg_id", flat=True)
+        )
+        total = len(games)
+        site_result = {"total": total}
+        result[site_key] = site_result
+
+        for key, (queryset_func, field) in STATS_MODELS.items():
+            in_top = Q(**{f"{field}__in": games})
+            objs = (
+                queryset_func()
+                .annotate(
+                    top=Count(field, filter=in_top),
+                    # "best" is the best rank among the considered games
+                    best=Min(f"{field}__{site_rank}", filter=in_top),
+                )
+                .filter(top__gt=0)
+                .order_by("-top", "best")[:top_items]
+            )
+            site_result[key] = [
+                {
+                    "bgg_id": obj.bgg_id,
+                    "name": obj.name,
+                    "count": obj.top,
+                    "pct": 100 * obj.top / total if total else 0,
+                    "best": obj.best,
+                }
+                for obj in objs
+            ]
+
+    return result
+
+
+def _orm_user_stats(user, top_games):
+    result = {}
+    for site_key, site_rank in STATS_SITES.items():
+        games = Game.objects.filter(**{f"{site_rank}__lte": top_games})
+        collection = Collection.objects.filter(user=user, game__in=games)
+        result[site_key] = {
+            "total": games.count(),
+            "owned": collection.filter(owned=True).count(),
+            "played": collection.filter(play_count__gt=0).count(),
+            "rated": collection.filter(rating__isnull=False).count(),
+        }
+    return result
+
+
+def _sorted_items(stats):
+    return {
+        site_key: {
+            key: sorted(value, key=lambda item: (-item["count"], item["best"]))
+            if isinstance(value, list)
+            else value
+            for key, value in site_stats.items()
+        }
+        for site_key, site_stats in stats.items()
+    }
+
+
+def _ranks(stats):
+    return {
+        site_key: {
+            key: [(item["count"], item["best"]) for item in value]
+            if isinstance(value, list)
+            else value
+            for key, value in site_stats.items()
+        }
+        for site_key, site_stats in stats.items()
+    }
+
+
+class StatsTest(TestCase):
+    """Stats must be the same as computed by the former ORM queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # pylint: disable=no-member
+        persons = Person.objects.bulk_create(
+            Person(bgg_id=bgg_id, name="(Uncredited)" if bgg_id == 3 else f"P{bgg_id}")
+            for bgg_id in range(1, 7)
+        )
+        game_types = GameType.objects.bulk_create(
+            GameType(bgg_id=bgg_id, name=f"T{bgg_id}") for bgg_id in range(1, 3)
+        )
+        categories = Category.objects.bulk_create(
+            Category(bgg_id=bgg_id, name=f"C{bgg_id}") for bgg_id in range(1, 5)
+        )
+        mechanics = Mechanic.objects.bulk_create(
+            Mechanic(bgg_id=bgg_id, name=f"M{bgg_id}") for bgg_id in range(1, 6)
+        )
+
+        for bgg_id in range(1, NUM_GAMES + 1):
+            game = Game.objects.create(
+                bgg_id=bgg_id,
+                name=f"Game {bgg_id}",
+                year=1990 + bgg_id,
+                bgg_rank=bgg_id if bgg_id <= 25 else None,
+                rec_rank=bgg_id * 7 % 31,
+            )
+            game.designer.set(
+                {persons[bgg_id % 6], persons[bgg_id * 5 % 6], persons[bgg_id % 4]}
+            )
+            game.artist.set({persons[bgg_id // 3 % 6]})
+            game.game_type.set({game_types[bgg_id % 2]})
+            game.category.set(
+                {categories[bgg_id % 4]} | ({categories[0]} if bgg_id % 5 else set())
+            )
+            game.mechanic.set({mechanics[bgg_id % 5], mechanics[bgg_id * 3 % 5]})
+
+        for pos, name in enumerate(USERS):
+            user = User.objects.create(name=name)
+            Collection.objects.bulk_create(
+                Collection(
+                    user=user,
+                    game_id=bgg_id,
+                    owned=bool((bgg_id + pos) % 3),
+                    play_count=(bgg_id * pos) % 4,
+                    rating=None if (bgg_id + pos) % 4 == 0 else bgg_id % 10,
+                )
+                for bgg_id in range(1 + pos, NUM_GAMES + 1, pos + 1)
+            )
+
+    def test_games_stats(self):
+        """Aggregated SQL returns the same items, counts and best ranks."""
+        querysets = {
+            "all": Game.objects.all(),
+            "filtered": Game.objects.filter(year__gte=2000),
+        }
+        for name, queryset in querysets.items():
+            for top_games in (5, 12, 100):
+                with self.subTest(queryset=name, top_games=top_games):
+                    self.assertEqual(
+                        _sorted_items(games_stats(queryset, top_games, 100)),
+                        _sorted_items(_orm_games_stats(queryset, top_games, 100)),
+                    )
+                    # same counts and ranks, although ties may be broken differently
+                    self.assertEqual(
+                        _ranks(games_stats(queryset, top_games, 2)),
+                        _ranks(_orm_games_stats(queryset, top_games, 2)),
+                    )
+
+    def test_user_stats(self):
+        """Conditional counts per site match the separate counts."""
+        for name in USERS + ("nobody",):
+            for top_games in (5, 12, 100):
+                with self.subTest(user=name, top_games=top_games):
+                    self.assertEqual(
+                        user_stats(name, top_games), _orm_user_stats(name, top_games)
+                    )
+
+    def test_precomputed_user_stats(self):
+        """Precomputed stats are the same as computed on the fly."""
+        UserStats.objects.bulk_create(compute_user_stats())
+        totals = user_totals()
+        for name in USERS:
+            with self.subTest(user=name):
+                self.assertEqual(
+                    user_stats_precomputed(name, totals), _orm_user_stats(name, 100)
+                )
+
+    def test_users_stats(self):
+        """Stats of many users at once are the same as one by one."""
+        names = USERS + ("nobody",)
+        for top_games in (5, 100):
+            with self.subTest(top_games=top_games):
+                self.assertEqual(
+                    users_stats(names, top_games),
+                    {name: _orm_user_stats(name, top_games) for name in names},
+                )
+
+    def test_name_normalized(self):
+        """Users are saved with their normalized name for the lookup."""
+        user = User.objects.create(name=" Eve  Example ")
+        self.assertEqual(user.name_normalized, "eve example")
+        self.assertEqual(
+            User.objects.get(name_normalized="eve example").name, " Eve  Example "
+        )
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the build task graph."""
+
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..taskgraph import TaskFailed, TaskGraph
+
+
+class _Recorder:
+    """Record start and end of every task, optionally sleeping in between."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.intervals = {}
+
+    def task(self, name, sleep=0.02, fail=False):
+        def func():
+            start = time.monotonic()
+            with self.lock:
+                self.events.append(name)
+            time.sleep(sleep)
+            if fail:
+                raise RuntimeError(f"{name} failed")
+            with self.lock:
+                self.intervals[name] = (start, time.monotonic())
+            return name
+
+        return func
+
+
+class TaskGraphTest(SimpleTestCase):
+    """Dependencies from paths, ordering, exclusive and failing tasks."""
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.recorder = _Recorder()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _path(self, *parts):
+        return os.path.join(self.tmp_dir.name, *parts)
+
+    def _graph(self, fail=()):
+        graph = TaskGraph("test")
+        tasks = (
+            ("scrape", None, self._path("scraped")),
+            ("merge", self._path("scraped", "games.jl"), self._path("games.jl")),
+            ("split", self._path("scraped"), self._path("split")),
+            ("filldb", self._path("games.jl"), self._path("db.sqlite3")),
+            ("train", self._path("games.jl"), self._path("recommender")),
+            ("stats", self._path("db.sqlite3"), self._path("stats.json")),
+            ("compress", self._path("db.sqlite3"), self._path("db.sqlite3")),
+        )
+        for name, inputs, outputs in tasks:
+            graph.add(
+                name,
+                self.recorder.task(name, fail=name in fail),
+                inputs=inputs,
+                outputs=outputs,
+            )
+        return graph
+
+    def test_dependencies(self):
+        """Tasks wait for writers of their inputs and for readers or writers of
+        their outputs, including parent and child paths; implied ones are left
+        out."""
+        graph = self._graph()
+        graph.add("upload", self.recorder.task("upload"), after=("stats", "train"))
+        self.assertEqual(graph.dependencies("scrape"), ())
+        self.assertEqual(graph.dependencies("merge"), ("scrape",))
+        self.assertEqual(graph.dependencies("split"), ("scrape",))
+        self.assertEqual(graph.dependencies("filldb"), ("merge",))
+        self.assertEqual(graph.dependencies("train"), ("merge",))
+        self.assertEqual(graph.dependencies("stats"), ("filldb",))
+        # compress writes what stats reads, so it waits for it (and filldb)
+        self.assertEqual(graph.dependencies("compress"), ("stats",))
+        self.assertEqual(set(graph.dependencies("upload")), {"train", "stats"})
+
+    def test_order(self):
+        """A single worker runs the tasks in order, many workers never start a
+        task before its dependencies finished."""
+
+        graph = self._graph()
+        results = graph.run(jobs=1)
+        self.assertEqual(self.recorder.events, list(graph.tasks))
+        self.assertEqual(results, {name: name for name in graph.tasks})
+
+        self.recorder = _Recorder()
+        graph = self._graph()
+        graph.run(jobs=4)
+        intervals = self.recorder.intervals
+        self.assertEqual(intervals.keys(), graph.tasks.keys())
+        for name in graph.tasks:
+            for dependency in graph.dependencies(name):
+                self.assertLessEqual(intervals[dependency][1], intervals[name][0])
+        # merge and split, filldb and train run concurrently
+        self.assertLess(intervals["split"][0], intervals["merge"][1])
+        self.assertLess(intervals["train"][0], intervals["filldb"][1])
+
+    def test_exclusive(self):
+        """Exclusive tasks never overlap with any other task."""
+        graph = TaskGraph("test")
+        for name in ("a", "b"):
+            graph.add(name, self.recorder.task(name, sleep=0.05))
+        graph.add("exclusive", self.recorder.task("exclusive"), exclusive=True)
+        for name in ("c", "d"):
+            graph.add(name, self.recorder.task(name, sleep=0.05))
+        graph.run(jobs=4)
+
+        intervals = self.recorder.intervals
+        start, end = intervals.pop("exclusive")
+        for other_start, other_end in intervals.values():
+            self.assertTrue(other_end <= start or end <= other_start)
+        self.assertLess(intervals["b"][0], intervals["a"][1])
+        self.assertLess(intervals["d"][0], intervals["c"][1])
+
+    def test_invalid(self):
+        """Tasks can only depend on earlier tasks, so there are no cycles."""
+        graph = TaskGraph("test")
+        graph.add("a", self.recorder.task("a"))
+        with self.assertRaises(ValueError):
+            graph.add("a", self.recorder.task("a"))
+        with self.assertRaises(ValueError):
+            graph.add("b", self.recorder.task("b"), after="c")
+        with self.assertRaises(ValueError):
+            graph.add("b", self.recorder.task("b"), after="b")
+        self.assertEqual(list(graph.tasks), ["a"])
+
+    def test_failure(self):
+        """After a failure, no further tasks start and dependents never run."""
+        graph = self._graph(fail=("merge",))
+        with self.assertRaises(TaskFailed), self.assertLogs(
+            "games.taskgraph", "ERROR"
+        ) as logs:
+            graph.run(jobs=2)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(graph.tasks["merge"].status, "failed")
+        self.assertEqual(graph.tasks["split"].status, "done")
+        for name in ("filldb", "train", "stats", "compress"):
+            self.assertEqual(graph.tasks[name].status, "pending")
+            self.assertNotIn(name, self.recorder.events)
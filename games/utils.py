@@ -2,19 +2,27 @@
 
 """ utils """
 
+import hashlib
 import json
 import logging
+import multiprocessing
 import os.path
 import re
+import sys
 import timeit
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from csv import DictWriter
 from datetime import timezone
 from functools import lru_cache, partial
 from pathlib import Path
 
+import django
+
 from django.conf import settings
-from pytility import arg_to_iter, normalize_space, parse_date
+from django.db import DEFAULT_DB_ALIAS, connections
+from pytility import arg_to_iter, batchify, normalize_space, parse_date
 
 LOGGER = logging.getLogger(__name__)
 VERSION_REGEX = re.compile(r"^\D*(.+)$")
@@ -30,6 +38,12 @@ def format_from_path(path):
     return None
 
 
+def normalize_user_name(name):
+    """normalize a user name for case insensitive lookups"""
+    name = normalize_space(name)
+    return name.lower() if name else None
+
+
 def serialize_date(date, tzinfo=None):
     """seralize a date into ISO format if possible"""
     parsed = parse_date(date, tzinfo)
@@ -112,6 +126,46 @@ def model_updated_at(file_path=settings.MODEL_UPDATED_FILE):
     return None
 
 
+def file_version(file_path):
+    """Size and modification time of a file, None if it does not exist. Use it
+    as part of a cache key to invalidate cached results when the file changes."""
+    try:
+        stat = os.stat(file_path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def database_version():
+    """Version of the database file (including its write-ahead log), changes
+    whenever the database is written to or replaced."""
+    path = getattr(settings, "DATABASE_FILE", None)
+    if not path:
+        return None
+    return file_version(path), file_version(f"{path}-wal")
+
+
+def load_json_file(file_path):
+    """Load a JSON file, None if it does not exist or cannot be parsed. The
+    result is cached until the file changes."""
+    return _load_json_file(file_path, file_version(file_path))
+
+
+@lru_cache(maxsize=8)
+def _load_json_file(file_path, version):
+    if version is None:
+        LOGGER.debug("file <%s> does not exist", file_path)
+        return None
+    try:
+        with open(file_path) as file_obj:
+            return json.load(file_obj)
+    except FileNotFoundError:
+        LOGGER.debug("file <%s> does not exist", file_path)
+    except Exception:
+        LOGGER.exception("unable to load JSON from <%s>", file_path)
+    return None
+
+
 def parse_version(version):
     """Parse a version string to strip leading "v" etc."""
     version = normalize_space(version)
@@ -152,6 +206,40 @@ def save_recommender_ranking(recommender, dst, similarity_model=False):
     recommendations.export_csv(str(dst))
 
 
+def file_hash(path, chunk_size=1 << 20):
+    """ SHA-256 hex digest of a file's content """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(*paths, **options):
+    """ SHA-256 hex digest of the paths' names, sizes, and modification times
+    (recursing into directories) as well as the given options; cheap enough to
+    check large inputs for changes """
+    digest = hashlib.sha256()
+    for path in paths:
+        if not path:
+            continue
+        path = Path(path).resolve()
+        files = (
+            sorted(p for p in path.rglob("*") if p.is_file())
+            if path.is_dir()
+            else (path,)
+        )
+        for file in files:
+            try:
+                stat = file.stat()
+                digest.update(f"{file}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+            except OSError:
+                digest.update(f"{file}|missing\n".encode())
+    for key, value in sorted(options.items()):
+        digest.update(f"{key}={value!r}\n".encode())
+    return digest.hexdigest()
+
+
 def count_lines(path) -> int:
     """Return the line count of a given path."""
     with open(path) as file:
@@ -223,7 +311,92 @@ def _process_row(row, columns=None, joiner=","):
     }
 
 
-def jl_to_csv(in_path, out_path, columns=None, joiner=","):
+def ordered_map(func, items, jobs=1, max_pending=None):
+    """Map func over items in a pool of processes, yielding the results in the
+    order of the items. At most max_pending items are in flight at any time.
+    Workers are spawned rather than forked (forking a process that runs other
+    threads, e.g., build tasks, can deadlock), so they set up Django first."""
+
+    if not jobs or jobs <= 1:
+        yield from map(func, items)
+        return
+
+    max_pending = max_pending or 2 * jobs
+    pending = deque()
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    ) as executor:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+@lru_cache(maxsize=1)
+def json_decoder():
+    """ fastest available JSON decoder: orjson if installed, else stdlib """
+    try:
+        import orjson  # pylint: disable=import-outside-toplevel
+
+        return orjson.loads
+    except ImportError:
+        pass
+    return json.loads
+
+
+def _decode_lines(lines, fields=None, skip_errors=False):
+    loads = json_decoder()
+    result = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = loads(line)
+        except ValueError:
+            if skip_errors:
+                continue
+            raise
+        if fields is not None and isinstance(item, dict):
+            item = {field: item[field] for field in fields if field in item}
+        result.append(item)
+    return result
+
+
+def iter_jl(source, fields=None, jobs=1, chunk_size=10_000, skip_errors=False):
+    """Decode JSON lines from a path or an iterable of lines, in order.
+
+    Lines are read in chunks and decoded in a pool of jobs processes. With
+    fields, items are projected onto those keys in the worker, so unused
+    values are never sent back nor kept around."""
+
+    if isinstance(source, (str, Path)):
+        LOGGER.info("loading JSON lines from <%s>...", source)
+        with open(source, "rb") as file:
+            yield from iter_jl(
+                source=file,
+                fields=fields,
+                jobs=jobs,
+                chunk_size=chunk_size,
+                skip_errors=skip_errors,
+            )
+        return
+
+    decode = partial(
+        _decode_lines,
+        fields=tuple(fields) if fields else None,
+        skip_errors=skip_errors,
+    )
+    chunks = map(tuple, batchify(source, chunk_size))
+    for items in ordered_map(decode, chunks, jobs=jobs):
+        yield from items
+
+
+def jl_to_csv(in_path, out_path, columns=None, joiner=",", jobs=1):
     """Convert a JSON lines file into CSV."""
 
     columns = tuple(arg_to_iter(columns))
@@ -232,7 +405,9 @@ def jl_to_csv(in_path, out_path, columns=None, joiner=","):
         "Reading JSON lines from <%s> and writing CSV to <%s>...", in_path, out_path
     )
 
-    with open(in_path) as in_file, open(out_path, "w") as out_file:
+    in_file = iter_jl(in_path, fields=columns, jobs=jobs)
+
+    with open(out_path, "w") as out_file:
         if not columns:
             row = next(in_file, None)
             row = _process_row(row, joiner=joiner) if row else {}
@@ -249,6 +424,23 @@ def jl_to_csv(in_path, out_path, columns=None, joiner=","):
         writer.writerows(rows)
 
 
+def peak_memory():
+    """Peak resident set size of this process in bytes, None if unavailable."""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def peak_memory_str():
+    """Human readable peak memory."""
+    peak = peak_memory()
+    return f"{peak / 1024 / 1024:.1f} MB" if peak is not None else "unknown"
+
+
 class Timer:
     """ log execution time: with Timer('message'): do_something() """
 
@@ -267,3 +459,175 @@ class Timer:
             print(self.message % duration)
         else:
             self.logger.info(self.message, duration)
+
+
+def _model_tables(models):
+    for model in models:
+        # pylint: disable=protected-access
+        yield model._meta.db_table
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                yield through._meta.db_table
+
+
+class SQLiteBulkLoad:
+    """Bulk load mode for SQLite: set load-time pragmas and drop the secondary
+    indexes of the given models, then rebuild the indexes, analyze, check the
+    integrity, and restore safe settings on exit. A no-op for other databases.
+
+    The dropped indexes are recorded in the database (see DroppedIndex) until
+    they were rebuilt. If a load was interrupted before that, the next bulk
+    load checks the database and rebuilds those indexes as well.
+
+    with SQLiteBulkLoad(models=(Game, Collection)): load_everything()
+    """
+
+    load_pragmas = (
+        ("journal_mode", "MEMORY"),
+        ("synchronous", "OFF"),
+        ("cache_size", -1_048_576),  # 1 GiB
+        ("temp_store", "MEMORY"),
+    )
+    safe_pragmas = (
+        ("journal_mode", "DELETE"),
+        ("synchronous", "FULL"),
+        ("cache_size", -2_000),
+        ("temp_store", "DEFAULT"),
+    )
+
+    def __init__(self, models=(), using=DEFAULT_DB_ALIAS, page_size=None, logger=None):
+        self.using = using
+        self.connection = connections[using]
+        self.tables = frozenset(_model_tables(arg_to_iter(models)))
+        self.page_size = page_size
+        self.logger = logger or LOGGER
+        self.indexes = ()
+        self.start = None
+
+    @property
+    def enabled(self):
+        """Only SQLite databases support the bulk load mode."""
+        return self.connection.vendor == "sqlite"
+
+    def _execute(self, sql):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall() if cursor.description else None
+
+    def _pragmas(self, pragmas):
+        for key, value in pragmas:
+            self._execute(f"PRAGMA {key} = {value}")
+
+    def _secondary_indexes(self):
+        if not self.tables:
+            return ()
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master "
+                "WHERE type = 'index' AND sql IS NOT NULL "
+                f"AND tbl_name IN ({', '.join(['%s'] * len(self.tables))})",
+                sorted(self.tables),
+            )
+            indexes = cursor.fetchall()
+        # keep unique indexes, they enforce constraints during the load
+        return tuple(
+            (name, sql)
+            for name, sql in indexes
+            if not sql.upper().startswith("CREATE UNIQUE")
+        )
+
+    def _dropped_indexes(self):
+        # pylint: disable=import-outside-toplevel
+        from .models import DroppedIndex
+
+        # pylint: disable=no-member
+        return DroppedIndex.objects.using(self.using)
+
+    def _interrupted_indexes(self):
+        indexes = tuple(self._dropped_indexes().values_list("name", "sql"))
+        if not indexes:
+            return ()
+
+        self.logger.warning(
+            "Found %d indexes dropped by an interrupted bulk load, checking the "
+            "database before rebuilding them...",
+            len(indexes),
+        )
+        with Timer("bulk load: quick check", logger=self.logger):
+            result = self._execute("PRAGMA quick_check")
+            problems = [row[0] for row in result if row[0] != "ok"]
+        if problems:
+            raise ValueError(
+                "the database was damaged by an interrupted bulk load, "
+                f"start from scratch instead: {'; '.join(problems)}"
+            )
+        return indexes
+
+    def __enter__(self):
+        if not self.enabled:
+            self.logger.info("Bulk load mode is only supported for SQLite")
+            return self
+
+        interrupted = self._interrupted_indexes()
+
+        with Timer("bulk load: set pragmas", logger=self.logger):
+            if self.page_size:
+                ((current,),) = self._execute("PRAGMA page_size")
+                if current != self.page_size:
+                    self._execute(f"PRAGMA page_size = {int(self.page_size)}")
+                    self._execute("VACUUM")
+            self._pragmas(self.load_pragmas)
+
+        with Timer("bulk load: drop indexes", logger=self.logger):
+            indexes = self._secondary_indexes()
+            for name, sql in indexes:
+                self.logger.info("Dropping index <%s>...", name)
+                self._dropped_indexes().update_or_create(
+                    name=name, defaults={"sql": sql}
+                )
+                self._execute(
+                    f"DROP INDEX IF EXISTS {self.connection.ops.quote_name(name)}"
+                )
+            self.indexes = tuple(dict((*interrupted, *indexes)).items())
+
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, *args, **kwargs):
+        if not self.enabled:
+            return
+
+        duration = 1000 * (timeit.default_timer() - self.start)
+        self.logger.info('"bulk load: load" execution time: %.1f ms', duration)
+
+        try:
+            with Timer("bulk load: rebuild indexes", logger=self.logger):
+                existing = {
+                    name
+                    for name, in self._execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'index'"
+                    )
+                }
+                for name, sql in self.indexes:
+                    if name not in existing:
+                        self.logger.info("Rebuilding index <%s>...", name)
+                        self._execute(sql)
+                self._dropped_indexes().filter(
+                    name__in=[name for name, _ in self.indexes]
+                ).delete()
+
+            if exc_type is not None:
+                return
+
+            with Timer("bulk load: analyze", logger=self.logger):
+                self._execute("ANALYZE")
+
+            with Timer("bulk load: integrity check", logger=self.logger):
+                result = self._execute("PRAGMA integrity_check")
+                problems = [row[0] for row in result if row[0] != "ok"]
+            if problems:
+                raise ValueError(f"integrity check failed: {'; '.join(problems)}")
+
+        finally:
+            self._pragmas(self.safe_pragmas)
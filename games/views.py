@@ -12,7 +12,7 @@ from operator import or_
 from typing import Callable, Iterable, Optional, Union
 
 from django.conf import settings
-from django.db.models import Count, Q, Min
+from django.db.models import Count, Q
 from django.shortcuts import redirect
 from django_filters import FilterSet
 from django_filters.rest_framework import DjangoFilterBackend
@@ -47,9 +47,24 @@ from .models import (
     Mechanic,
     Person,
     Ranking,
+    RankingDate,
+    RankingSummary,
     User,
 )
 from .permissions import AlwaysAllowAny, ReadOnly
+from .rankings import (
+    DEFAULT_HISTORY_TOP,
+    DEFAULT_MOVERS_TOP,
+    PackedRankings,
+    expand_history,
+    game_rankings,
+    history_matrix,
+    is_packed,
+    iter_game_snapshots,
+    iter_snapshots,
+    ranking_diff,
+    slice_history,
+)
 from .serializers import (
     CategorySerializer,
     CollectionSerializer,
@@ -59,11 +74,24 @@ from .serializers import (
     PersonSerializer,
     RankingSerializer,
     RankingFatSerializer,
+    RankingSummarySerializer,
     UserSerializer,
 )
+from .stats import (
+    DEFAULT_TOP_GAMES,
+    DEFAULT_TOP_ITEMS,
+    STATS_SITES,
+    games_stats,
+    user_stats,
+    user_stats_precomputed,
+    users_stats,
+    users_stats_precomputed,
+)
 from .utils import (
+    load_json_file,
     load_recommender,
     model_updated_at,
+    normalize_user_name,
     parse_version,
     project_version,
     pubsub_push,
@@ -71,6 +99,19 @@ from .utils import (
 
 LOGGER = logging.getLogger(__name__)
 
+GAME_RELATED_FIELDS = (
+    "designer",
+    "artist",
+    "game_type",
+    "category",
+    "mechanic",
+    "compilation_of",
+    "implements",
+    "integrates_with",
+    "contained_in",
+    "implemented_by",
+)
+
 
 class PermissionsModelViewSet(ModelViewSet):
     """ add permissions based on settings """
@@ -243,6 +284,41 @@ def _light_games_dict(bgg_ids=None):
     return {game["bgg_id"]: game for game in games}
 
 
+def _precomputed_stats(top_games=None, top_items=None):
+    path = getattr(settings, "STATS_FILE", None)
+    stats = load_json_file(path) if path else None
+    if not stats:
+        return None
+    if top_games is not None and stats.get("top_games") != top_games:
+        return None
+    if top_items is not None and stats.get("top_items") != top_items:
+        return None
+    return stats
+
+
+def _precomputed_history(ranking_type, top=None, date_gte=None, date_lte=None):
+    path = getattr(settings, "HISTORY_FILE", None)
+    history = load_json_file(path) if path else None
+    history = history.get(ranking_type) if history else None
+    if not history:
+        return None
+    return slice_history(history, top=top, date_gte=date_gte, date_lte=date_lte)
+
+
+def _precomputed_movers(ranking_type):
+    path = getattr(settings, "MOVERS_FILE", None)
+    movers = load_json_file(path) if path else None
+    return movers.get(ranking_type) if movers else None
+
+
+def _serialized_games(bgg_ids, context=None):
+    # pylint: disable=no-member
+    games = Game.objects.filter(bgg_id__in=bgg_ids).prefetch_related(
+        *GAME_RELATED_FIELDS
+    )
+    return {game.bgg_id: GameSerializer(game, context=context).data for game in games}
+
+
 def _add_games(data, bgg_ids=None, key="game"):
     games = _light_games_dict(bgg_ids)
     for item in data:
@@ -334,15 +410,8 @@ class GameViewSet(PermissionsModelViewSet):
 
     collection_fields = ("owned",)
 
-    stats_sites = {"rg_top": "rec_rank", "bgg_top": "bgg_rank"}
-
-    stats_models = {
-        "designer": (Person.objects.exclude(bgg_id=3), "designer_of", PersonSerializer),
-        "artist": (Person.objects.exclude(bgg_id=3), "artist_of", PersonSerializer),
-        "game_type": (GameType.objects.all(), "games", GameTypeSerializer),
-        "category": (Category.objects.all(), "games", CategorySerializer),
-        "mechanic": (Mechanic.objects.all(), "games", MechanicSerializer),
-    }
+    stats_sites = STATS_SITES
+    stats_params = frozenset({"top_games", "top_items", "format"})
 
     def _excluded_games(self, user, params, include=None, exclude=None):
         params = params or {}
@@ -701,21 +770,36 @@ class GameViewSet(PermissionsModelViewSet):
 
     @action(detail=True)
     def rankings(self, request, pk=None):
-        """Find historical rankings of a game."""
+        """Find historical rankings of a game, optionally downsampled to a
+        resolution (day, week, month or year) and / or max_points per type."""
+
+        return Response(
+            game_rankings(
+                game_id=parse_int(pk),
+                ranking_types=clear_list(_extract_params(request, "ranking_type")),
+                date_gte=parse_date(
+                    request.query_params.get("date__gte"), tzinfo=timezone.utc
+                ),
+                date_lte=parse_date(
+                    request.query_params.get("date__lte"), tzinfo=timezone.utc
+                ),
+                resolution=request.query_params.get("resolution"),
+                max_points=parse_int(request.query_params.get("max_points")),
+            )
+        )
+
+    @action(detail=True)
+    def ranking_summary(self, request, pk=None):
+        """Summary of the historical rankings of a game."""
 
         filters = {
             "game": pk,
             "ranking_type__in": clear_list(_extract_params(request, "ranking_type")),
-            "date__gte": parse_date(
-                request.query_params.get("date__gte"), tzinfo=timezone.utc
-            ),
-            "date__lte": parse_date(
-                request.query_params.get("date__lte"), tzinfo=timezone.utc
-            ),
         }
         filters = {k: v for k, v in filters.items() if v}
-        queryset = Ranking.objects.filter(**filters)
-        serializer = RankingSerializer(
+        # pylint: disable=no-member
+        queryset = RankingSummary.objects.filter(**filters)
+        serializer = RankingSummarySerializer(
             queryset, many=True, context=self.get_serializer_context()
         )
         return Response(serializer.data)
@@ -724,44 +808,40 @@ class GameViewSet(PermissionsModelViewSet):
     def history(self, request):
         """History of the top rankings."""
 
-        top = parse_int(request.query_params.get("top")) or 100
+        top = parse_int(request.query_params.get("top")) or DEFAULT_HISTORY_TOP
         ranking_type = request.query_params.get("ranking_type") or Ranking.BGG
+        date_gte = parse_date(
+            request.query_params.get("date__gte"), tzinfo=timezone.utc
+        )
+        date_lte = parse_date(
+            request.query_params.get("date__lte"), tzinfo=timezone.utc
+        )
 
-        filters = {
-            "ranking_type": ranking_type,
-            "date__gte": parse_date(
-                request.query_params.get("date__gte"), tzinfo=timezone.utc
-            ),
-            "date__lte": parse_date(
-                request.query_params.get("date__lte"), tzinfo=timezone.utc
-            ),
-        }
-        filters = {k: v for k, v in filters.items() if v}
-        queryset = Ranking.objects.filter(**filters)
-
-        last_date = queryset.filter(rank=1).dates("date", "day", order="ASC").last()
-        games = [
-            r.game
-            for r in queryset.filter(date=last_date, rank__lte=top)
-            .order_by("rank")
-            .select_related("game")
-        ]
+        history = _precomputed_history(
+            ranking_type=ranking_type, top=top, date_gte=date_gte, date_lte=date_lte
+        ) or history_matrix(
+            ranking_type=ranking_type, top=top, date_gte=date_gte, date_lte=date_lte
+        )
 
-        assert len(games) == top
+        games = _serialized_games(
+            history["games"], context=self.get_serializer_context()
+        )
 
-        game_ids = frozenset(g.bgg_id for g in games)
-        rankings = queryset.filter(game__in=game_ids).order_by("date")
+        if parse_bool(next(_extract_params(request, "compact"), None)):
+            return Response(
+                {
+                    "ranking_type": history["ranking_type"],
+                    "top": history["top"],
+                    "dates": history["dates"],
+                    "games": [games.get(game_id) for game_id in history["games"]],
+                    "ranks": history["ranks"],
+                }
+            )
 
         data = [
-            {
-                "game": self.get_serializer(game).data,
-                "rankings": RankingSerializer(
-                    rankings.filter(game=game.bgg_id),
-                    many=True,
-                    context=self.get_serializer_context(),
-                ).data,
-            }
-            for game in games
+            {"game": games[game_id], "rankings": rankings}
+            for game_id, rankings in expand_history(history)
+            if game_id in games
         ]
         return Response(data)
 
@@ -788,41 +868,29 @@ class GameViewSet(PermissionsModelViewSet):
     def stats(self, request):
         """ get games stats """
 
-        result = {"updated_at": model_updated_at()}
+        top_games = next(
+            _parse_ints(request.query_params.get("top_games")), DEFAULT_TOP_GAMES
+        )
+        top_items = next(
+            _parse_ints(request.query_params.get("top_items")), DEFAULT_TOP_ITEMS
+        )
 
-        top_games = next(_parse_ints(request.query_params.get("top_games")), 100)
-        top_items = next(_parse_ints(request.query_params.get("top_items")), 10)
+        precomputed = (
+            _precomputed_stats(top_games=top_games, top_items=top_items)
+            if all(key in self.stats_params for key in request.query_params)
+            else None
+        )
 
-        for site_key, site_rank in self.stats_sites.items():
-            site_filters = {f"{site_rank}__isnull": False}
-            games = frozenset(
-                self.filter_queryset(self.get_queryset())
-                .filter(**site_filters)
-                .order_by(site_rank)[:top_games]
-                .values_list("bgg_id", flat=True)
+        result = {"updated_at": model_updated_at()}
+        result.update(
+            precomputed["games"]
+            if precomputed
+            else games_stats(
+                queryset=self.filter_queryset(self.get_queryset()),
+                top_games=top_games,
+                top_items=top_items,
             )
-            total = len(games)
-            site_result = {"total": total}
-            result[site_key] = site_result
-
-            for key, (queryset, field, serializer_class) in self.stats_models.items():
-                filters = {f"{field}__in": games}
-                objs = (
-                    queryset.annotate(
-                        top=Count(field, filter=Q(**filters)),
-                        best=Min(f"{field}__{site_rank}"),
-                    )
-                    .filter(top__gt=0)
-                    .order_by("-top", "best")[:top_items]
-                )
-                serializer = serializer_class(
-                    objs, many=True, context=self.get_serializer_context()
-                )
-                for d, obj in zip(serializer.data, objs):
-                    d["count"] = obj.top
-                    d["pct"] = 100 * obj.top / total if total else 0
-                    d["best"] = obj.best
-                site_result[key] = serializer.data
+        )
 
         return Response(result)
 
@@ -901,10 +969,16 @@ class UserViewSet(PermissionsModelViewSet):
     # pylint: disable=no-member
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    lookup_field = "name__iexact"
+    lookup_field = "name_normalized"
     lookup_url_kwarg = "pk"
     stats_sites = GameViewSet.stats_sites
 
+    def get_object(self):
+        self.kwargs[self.lookup_url_kwarg] = normalize_user_name(
+            self.kwargs.get(self.lookup_url_kwarg)
+        )
+        return super().get_object()
+
     # pylint: disable=unused-argument,invalid-name
     @action(detail=True)
     def stats(self, request, pk=None):
@@ -913,24 +987,56 @@ class UserViewSet(PermissionsModelViewSet):
 
         data = {"user": user.name, "updated_at": user.updated_at}
 
-        top_games = next(_parse_ints(request.query_params.get("top_games")), 100)
+        top_games = next(
+            _parse_ints(request.query_params.get("top_games")), DEFAULT_TOP_GAMES
+        )
 
-        for key, rank in self.stats_sites.items():
-            games = frozenset(
-                Game.objects.filter(**{f"{rank}__lte": top_games})
-                .order_by()
-                .values_list("bgg_id", flat=True)
+        precomputed = _precomputed_stats(top_games=top_games)
+        stats = (
+            user_stats_precomputed(user.name, precomputed.get("user_totals"))
+            if precomputed
+            else None
+        ) or user_stats(user.name, top_games)
+        data.update(stats)
+
+        return Response(data)
+
+    @action(
+        detail=False,
+        methods=("GET", "POST"),
+        permission_classes=(AlwaysAllowAny,),
+    )
+    def bulk_stats(self, request):
+        """ get stats for many users at once """
+
+        names = frozenset(
+            filter(
+                None, map(normalize_user_name, _extract_params(request, "user", str))
             )
-            filters = {"game__in": games}
-            collection = user.collection_set.filter(**filters)
-            result = {
-                "total": len(games),
-                "owned": collection.filter(owned=True).count(),
-                "played": collection.filter(play_count__gt=0).count(),
-                "rated": collection.filter(rating__isnull=False).count(),
-            }
-            data[key] = result
+        )
+        users = tuple(
+            self.get_queryset()
+            .filter(name_normalized__in=names)
+            .values_list("name", "updated_at")
+        )
+
+        top_games = next(
+            _parse_ints(request.query_params.get("top_games")), DEFAULT_TOP_GAMES
+        )
+
+        precomputed = _precomputed_stats(top_games=top_games)
+        stats = (
+            users_stats_precomputed(
+                (name for name, _ in users), precomputed.get("user_totals")
+            )
+            if precomputed
+            else None
+        ) or users_stats((name for name, _ in users), top_games)
 
+        data = [
+            {"user": name, "updated_at": updated_at, **stats[name]}
+            for name, updated_at in users
+        ]
         return Response(data)
 
 
@@ -989,17 +1095,110 @@ class RankingViewSet(PermissionsModelViewSet):
         "date",
     )
 
+    def _packed_rankings(self, request):
+        params = request.query_params
+        lookups = ("exact", "gt", "gte", "lt", "lte")
+
+        ranking_types = clear_list(
+            (params.get("ranking_type"), to_str(params.get("ranking_type__iexact")))
+        )
+        ranking_types = [t.lower() for t in ranking_types if t]
+
+        date_filters = {}
+        for lookup in lookups:
+            key = "date" if lookup == "exact" else f"date__{lookup}"
+            value = parse_date(params.get(key), tzinfo=timezone.utc)
+            if value:
+                date_filters[f"date__{lookup}"] = value
+
+        rank_filters = {}
+        for lookup in lookups:
+            key = "rank" if lookup == "exact" else f"rank__{lookup}"
+            value = parse_int(params.get(key))
+            if value is not None:
+                rank_filters[lookup] = value
+
+        game_filters = {
+            "bgg_id": parse_int(params.get("game")),
+            "name": params.get("game__name"),
+            "name__iexact": params.get("game__name__iexact"),
+        }
+        game_filters = {k: v for k, v in game_filters.items() if v}
+        game_ids = (
+            list(Game.objects.filter(**game_filters).values_list("bgg_id", flat=True))
+            if game_filters
+            else None
+        )
+
+        ordering = clear_list(
+            term.strip() for term in (params.get("ordering") or "").split(",")
+        )
+
+        return PackedRankings.from_snapshots(
+            snapshots=iter_snapshots(
+                ranking_types=ranking_types, date_filters=date_filters
+            )
+            if game_ids is None
+            else iter_game_snapshots(
+                game_ids=game_ids,
+                ranking_types=ranking_types,
+                date_filters=date_filters,
+            ),
+            game_ids=game_ids,
+            rank_filters=rank_filters,
+            ordering=ordering or self.ordering,
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not is_packed():
+            return super().list(request, *args, **kwargs)
+        rankings = self._packed_rankings(request)
+        page = self.paginate_queryset(rankings)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(rankings))
+
+    @action(detail=False)
+    def movers(self, request):
+        """Movers, new entries and exits between two ranking dates (by default
+        the latest two) within the top ranks."""
+
+        ranking_type = request.query_params.get("ranking_type") or Ranking.BGG
+        date = parse_date(request.query_params.get("date"), tzinfo=timezone.utc)
+        previous = parse_date(request.query_params.get("previous"), tzinfo=timezone.utc)
+        top = parse_int(request.query_params.get("top")) or DEFAULT_MOVERS_TOP
+
+        diff = (
+            _precomputed_movers(ranking_type)
+            if not date and not previous and top == DEFAULT_MOVERS_TOP
+            else None
+        ) or ranking_diff(
+            ranking_type=ranking_type, date=date, previous=previous, top=top
+        )
+
+        if not diff:
+            raise NotFound(f"unable to find rankings of type <{ranking_type}>")
+
+        keys = ("movers", "entries", "exits")
+        result = dict(diff)
+        result.update({key: [dict(row) for row in diff[key]] for key in keys})
+        _add_games(
+            chain.from_iterable(result[key] for key in keys),
+            (row["game"] for key in keys for row in diff[key]),
+        )
+        return Response(result)
+
     @action(detail=False)
     def dates(self, request):
         """Find all available dates with rankings."""
 
-        query_set = self.get_queryset().order_by("ranking_type", "date")
+        query_set = RankingDate.objects.order_by("ranking_type", "date")
 
         ranking_types = clear_list(_extract_params(request, "ranking_type"))
         if ranking_types:
             query_set = query_set.filter(ranking_type__in=ranking_types)
 
-        return Response(query_set.values("ranking_type", "date").distinct())
+        return Response(query_set.values("ranking_type", "date"))
 
     # pylint: disable=unused-argument
     @action(detail=False)
@@ -1008,6 +1207,23 @@ class RankingViewSet(PermissionsModelViewSet):
 
         fat = parse_bool(next(_extract_params(request, "fat"), None))
 
+        if is_packed():
+            rankings = self._packed_rankings(request)
+            page = self.paginate_queryset(rankings)
+            data = list(rankings) if page is None else page
+            if fat:
+                games = Game.objects.in_bulk({item["game"] for item in data})
+                for item in data:
+                    game = games.get(item["game"])
+                    item["game"] = GameSerializer(game).data if game else None
+            else:
+                data = _add_games(data, (item["game"] for item in data))
+            return (
+                self.get_paginated_response(data)
+                if page is not None
+                else Response(data)
+            )
+
         query_set = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(query_set)
 
@@ -4,6 +4,8 @@
 
 import os
 
+from urllib.parse import quote
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -87,13 +89,26 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+DATABASE_FILE = os.path.join(DATA_DIR, "db.sqlite3")
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(DATA_DIR, "db.sqlite3"),
+        "NAME": DATABASE_FILE,
     }
 }
 
+# The database file never changes under a running production instance: open it
+# read-only and immutable, and keep the (per thread) connections alive
+DATABASE_IMMUTABLE = bool(os.getenv("DATABASE_IMMUTABLE"))
+DATABASE_MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE") or 1_073_741_824)  # bytes
+DATABASE_CACHE_SIZE = int(os.getenv("DATABASE_CACHE_SIZE") or 65_536)  # KiB
+
+if DATABASE_IMMUTABLE:
+    DATABASES["default"].update(
+        NAME=f"file:{quote(DATABASE_FILE)}?mode=ro&immutable=1",
+        CONN_MAX_AGE=None,
+    )
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -159,6 +174,17 @@ PUBSUB_QUEUE_PROJECT = os.getenv("PUBSUB_QUEUE_PROJECT") or os.getenv("GC_PROJEC
 PUBSUB_QUEUE_TOPIC = os.getenv("PUBSUB_QUEUE_TOPIC")
 
 MODEL_UPDATED_FILE = os.path.join(DATA_DIR, "updated_at")
+STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
+MOVERS_FILE = os.path.join(DATA_DIR, "movers.json")
+# indexes chosen by the indexadvisor command, created by finalizedb
+INDEXES_FILE = os.path.join(BASE_DIR, "indexes.json")
+# columnar copies of the scraped JSON lines files, see games.jlcache
+JL_CACHE_DIR = os.getenv("JL_CACHE_DIR") or os.path.join(BASE_DIR, ".cache", "jl")
+# "rows": one Ranking row per game and date; "packed": one RankingSnapshot per date
+# (packed reads of a single game still decode every snapshot in the date range
+# in which the game was ranked; keep "rows" if per game histories dominate)
+RANKINGS_STORAGE = os.getenv("RANKINGS_STORAGE") or "rows"
 PROJECT_VERSION_FILE = os.path.join(BASE_DIR, "VERSION")
 
 MIN_VOTES_ANCHOR_DATE = "2020-08-01"